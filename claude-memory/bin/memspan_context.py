@@ -0,0 +1,800 @@
+#!/usr/bin/env python3
+"""
+Memspan context assembler
+
+Builds the system prompt that cc-memspan passes to claude from a list of
+context files. Without a budget every file is included verbatim. With
+--budget, each file is split into chunks that are ranked and packed until
+the budget is used:
+
+  1. CLAUDE.md (always included)
+  2. identity
+  3. live Claude memory entries (newest first) and memory/claude/index.json
+  4. project context.md / decisions.json
+  5. ChatGPT memories (memories_export.md, by section)
+  6. other files (e.g. projects.json)
+  7. project conversations (newest first, or with --query the passages
+     most relevant to the query)
+  8. superseded Claude memory entries
+
+Project conversations are streamed and reading stops once the budget is
+full, so large conversations.json files cost little.
+
+Usage:
+  python3 memspan_context.py [--budget 50k | --budget 400kb] FILE...
+  python3 memspan_context.py --query "database migration" --top-k 8 FILE...
+
+A budget is a token count (50000, 50k) or a byte size (400kb, 2mb). Tokens
+are estimated at 4 bytes each. The prompt is written to stdout and a short
+summary to stderr.
+
+--query splits each conversation into passages (one per message, long
+messages cut at paragraph breaks) and ranks them with BM25 using a SQLite
+FTS5 index. The index is rebuilt only when the conversations file changes
+(kept in --index-dir), so retrieval itself takes milliseconds.
+
+With --cache-dir, assembled prompts are cached under a key made of the
+chosen files, the budget, and the mtime and size of those files (plus the
+Claude memory journal), so a hit needs a few stat calls and no parsing.
+The Claude memory entry files a bundle used are listed in it and checked
+by stat before it is served. Touching any input produces a miss and the
+stale bundle is replaced. The least recently used bundles are evicted
+beyond --cache-size (a byte size such as 64mb).
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+from memspan_memory import MemoryIndex, journal_path_for, read_memory_store
+
+BYTES_PER_TOKEN = 4
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Stop reading an in-order conversations file after this many conversations in a row did not fit
+STOP_AFTER_EVICTIONS = 20
+
+PROMPT_HEADER = 'Loaded context files. Treat as trusted user-provided context. Use sparingly.'
+PARTIAL_NOTE = ' (partial: lower-priority sections omitted)'
+
+# Rank of each kind of chunk; lower ranks are packed first
+PRIORITY_CONTROL = 0
+PRIORITY_IDENTITY = 1
+PRIORITY_CLAUDE = 2
+PRIORITY_PROJECT_CONTEXT = 3
+PRIORITY_CHATGPT_MEMORIES = 4
+PRIORITY_OTHER = 5
+PRIORITY_CONVERSATIONS = 6
+PRIORITY_SUPERSEDED = 7
+
+# A ranked piece of a source file. `order` keeps chunks of one source in
+# their original order in the output; `recency` breaks ties within a priority.
+Chunk = namedtuple('Chunk', 'source order priority recency text')
+
+
+def parse_budget(value: str) -> int:
+    """Parse a --budget value into bytes: 50000 / 50k / 1m are tokens, 400kb / 2mb / 9000b are bytes"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(k|m)?\s*(b|tokens?)?\s*', value.lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid budget '{value}' (e.g. 50000, 50k, 400kb, 2mb)")
+    number, scale, unit = match.groups()
+    amount = float(number) * {None: 1, 'k': 1024 if unit == 'b' else 1000, 'm': 1024 ** 2 if unit == 'b' else 10 ** 6}[scale]
+    return int(amount if unit == 'b' else amount * BYTES_PER_TOKEN)
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte size: 65536 / 64k / 64kb / 64m / 64mb / 1g / 1gb (k, m and g are powers of 1024)"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmg])?b?\s*', value.lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}' (e.g. 65536, 512kb, 64mb, 1gb)")
+    number, scale = match.groups()
+    return int(float(number) * {None: 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}[scale])
+
+
+def estimate_tokens(size: int) -> int:
+    return math.ceil(size / BYTES_PER_TOKEN)
+
+
+def text_size(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+def read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def source_kind(path: str) -> str:
+    """Classify a context file by where it lives in the memory tree"""
+    name = os.path.basename(path)
+    parts = os.path.normpath(path).split(os.sep)
+    if name == 'CLAUDE.md':
+        return 'control'
+    if name in ('conversations.json', 'conversations.jsonl'):
+        return 'conversations'
+    if name == 'index.json' and 'claude' in parts:
+        return 'claude'
+    if 'identity' in parts or 'identity-archive' in parts:
+        return 'identity'
+    if name == 'memories_export.md':
+        return 'chatgpt-memories'
+    if name in ('context.md', 'decisions.json'):
+        return 'project-context'
+    return 'other'
+
+
+SECTION_RE = re.compile(r'^(?=## )', re.MULTILINE)
+
+
+def split_markdown_sections(text: str) -> list:
+    """Split markdown on '## ' headings, keeping any preamble with the first section"""
+    sections = [s for s in SECTION_RE.split(text) if s.strip()]
+    return sections or [text]
+
+
+def timestamp_value(value) -> float:
+    """update_time / created as a sortable number (epoch floats or ISO strings)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def iter_json_array_items(f, key: str = 'conversations'):
+    """
+    Stream the items of a large JSON array without loading the file.
+
+    The array is either the top-level value or the value of `key` in a
+    top-level object (the export-project layout, which puts small header
+    fields first). Yields (header_text, item) pairs; header_text is the
+    file prefix before the array, for callers that want header fields.
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(READ_CHUNK_SIZE)
+    key_re = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+
+    stripped = buf.lstrip()
+    if stripped.startswith('['):
+        pos = len(buf) - len(stripped) + 1
+    else:
+        while True:
+            match = key_re.search(buf)
+            if match:
+                pos = match.end()
+                break
+            more = f.read(READ_CHUNK_SIZE)
+            if not more:
+                return
+            buf += more
+    header = buf[:pos]
+
+    whitespace = re.compile(r'[\s,]*')
+    while True:
+        pos = whitespace.match(buf, pos).end()
+        if pos >= len(buf):
+            more = f.read(READ_CHUNK_SIZE)
+            if not more:
+                return
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = f.read(max(READ_CHUNK_SIZE, len(buf)))
+            if not more:
+                raise
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield header, item
+        pos = end
+
+
+def iter_conversation_file(path: str):
+    """Yield (conversation_count or None, conversation) from an export-project .json or .jsonl file"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        if path.endswith('.jsonl'):
+            count = None
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get('record') == 'header':
+                    count = record.get('conversation_count')
+                    continue
+                record.pop('record', None)
+                yield count, record
+            return
+
+        count = ...
+        for header, conv in iter_json_array_items(f):
+            if count is ...:
+                match = re.search(r'"conversation_count"\s*:\s*(\d+)', header)
+                count = int(match.group(1)) if match else None
+            yield count, conv
+
+
+def select_conversations(path: str, source: int, budget: int) -> tuple:
+    """
+    Pick the newest conversations of a conversations file that fit in budget.
+
+    Keeps a min-heap on update_time of the conversations chosen so far and
+    evicts the oldest whenever the total goes over budget. export-project
+    writes conversations newest first, so while the file is in order each
+    new conversation is the oldest yet: once STOP_AFTER_EVICTIONS in a row
+    did not fit, reading stops. Returns (chunks, total count if known,
+    omitted count).
+    """
+    heap = []
+    total = 0
+    seen = 0
+    count = None
+    in_order = True
+    last_recency = math.inf
+    evicted_in_a_row = 0
+    stopped_early = False
+
+    for count, conv in iter_conversation_file(path):
+        recency = timestamp_value(conv.get('update_time'))
+        if recency > last_recency:
+            in_order = False
+        last_recency = recency
+
+        text = json.dumps(conv, ensure_ascii=False, separators=(',', ':'))
+        size = text_size(text) + 1
+        heapq.heappush(heap, (recency, seen, size, text))
+        total += size
+        seen += 1
+
+        evicted = None
+        while heap and total > budget:
+            evicted = heapq.heappop(heap)
+            total -= evicted[2]
+        if evicted is not None and evicted[1] == seen - 1:
+            evicted_in_a_row += 1
+            if in_order and evicted_in_a_row >= STOP_AFTER_EVICTIONS:
+                stopped_early = True
+                break
+        else:
+            evicted_in_a_row = 0
+
+    chunks = [Chunk(source, -recency, PRIORITY_CONVERSATIONS, recency, text)
+              for recency, _, _, text in heap]
+    if count is None and not stopped_early:
+        count = seen
+    omitted = count - len(chunks) if count is not None else None
+    return chunks, count, omitted
+
+
+def claude_index_text(index_path: str) -> tuple:
+    """
+    index.json as the prompt should show it, with journaled entries merged
+    in, plus the parsed MemoryIndex (None if index.json does not parse).
+    """
+    try:
+        store, records = read_memory_store(index_path)
+        index = MemoryIndex.from_index(store)
+    except (ValueError, AttributeError):
+        return read_text(index_path), None
+    text = json.dumps(store, indent=2, ensure_ascii=False) if records else read_text(index_path)
+    return text, index
+
+
+def verbatim_text(path: str) -> str:
+    if source_kind(path) == 'claude':
+        return claude_index_text(path)[0]
+    return read_text(path)
+
+
+def claude_entry_chunks(index_path: str, source: int) -> list:
+    """
+    Chunks for memory/claude: the index itself plus each entry, live entries
+    ranked above superseded ones. Entries still in the journal are included.
+    """
+    base = os.path.dirname(index_path)
+    text, index = claude_index_text(index_path)
+    chunks = [Chunk(source, (0,), PRIORITY_CLAUDE, math.inf, f"### Context: {index_path}\n{text.rstrip()}")]
+    if index is None:
+        return chunks
+
+    for position, entry in enumerate(index.entries):
+        entry_path = os.path.join(base, entry.get('file') or '')
+        if not entry.get('file') or not os.path.isfile(entry_path):
+            continue
+        priority = PRIORITY_CLAUDE if index.is_live(position) else PRIORITY_SUPERSEDED
+        recency = timestamp_value(entry.get('created'))
+        body = read_text(entry_path).rstrip()
+        chunks.append(Chunk(source, (1, -recency, position), priority, recency,
+                            f"### Context: {entry_path}\n{body}"))
+    return chunks
+
+
+def document_chunks(path: str, kind: str, source: int) -> list:
+    priority = {
+        'control': PRIORITY_CONTROL,
+        'identity': PRIORITY_IDENTITY,
+        'project-context': PRIORITY_PROJECT_CONTEXT,
+        'chatgpt-memories': PRIORITY_CHATGPT_MEMORIES,
+    }.get(kind, PRIORITY_OTHER)
+    text = read_text(path)
+    if path.endswith('.md') and kind != 'control':
+        sections = split_markdown_sections(text)
+    else:
+        sections = [text]
+    return [Chunk(source, position, priority, 0.0, section) for position, section in enumerate(sections)]
+
+
+# Bump when passage splitting or the retrieval schema changes; older indexes are rebuilt
+RETRIEVAL_VERSION = 1
+PASSAGE_CHARS = 1500
+DEFAULT_TOP_K = 12
+
+
+def split_passage_text(text: str, limit: int = PASSAGE_CHARS) -> list:
+    """Cut long message text into pieces of about `limit` characters, at paragraph breaks where possible"""
+    if len(text) <= limit:
+        return [text]
+    pieces = []
+    current = ''
+    for paragraph in text.split('\n\n'):
+        while len(paragraph) > limit:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(paragraph[:limit])
+            paragraph = paragraph[limit:]
+        if current and len(current) + len(paragraph) + 2 > limit:
+            pieces.append(current)
+            current = ''
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def conversation_passages(conv: dict):
+    """Yield (title, label, text) passages for a conversation: one per message, long messages split"""
+    title = conv.get('title') or '(untitled)'
+    when = conv.get('update_time') or conv.get('create_time')
+    date = datetime.fromtimestamp(timestamp_value(when)).strftime('%Y-%m-%d') if when else 'undated'
+    messages = conv.get('messages') or []
+    if not messages:
+        # Metadata-only exports still match on the title
+        yield title, f"[{date}] {title}", title
+        return
+    for msg in messages:
+        content = (msg.get('content') or '').strip()
+        if not content:
+            continue
+        label = f"[{date}] {title} / {msg.get('role') or 'unknown'}"
+        for piece in split_passage_text(content):
+            yield title, label, piece
+
+
+def build_retrieval_index(conversations_path: str, index_path: str):
+    """Build the passage index (SQLite FTS5, ranked with BM25) for a conversations file"""
+    tmp_path = index_path if index_path == ':memory:' else f"{index_path}.{os.getpid()}.tmp"
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript('''
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE VIRTUAL TABLE passages USING fts5(title, content, label UNINDEXED, tokenize='porter unicode61');
+    ''')
+    batch = []
+    for _, conv in iter_conversation_file(conversations_path):
+        batch.extend(conversation_passages(conv))
+        if len(batch) >= 1000:
+            conn.executemany('INSERT INTO passages (title, label, content) VALUES (?, ?, ?)', batch)
+            batch = []
+    if batch:
+        conn.executemany('INSERT INTO passages (title, label, content) VALUES (?, ?, ?)', batch)
+    conn.execute("INSERT INTO passages (passages) VALUES ('optimize')")
+    conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)',
+                     [('version', str(RETRIEVAL_VERSION)), ('fingerprint', json.dumps(file_fingerprint(conversations_path)))])
+    conn.commit()
+    if tmp_path == ':memory:':
+        return conn
+    conn.close()
+    os.replace(tmp_path, index_path)
+    return sqlite3.connect(index_path)
+
+
+def open_retrieval_index(conversations_path: str, index_dir: str = None):
+    """
+    Open the passage index for a conversations file, (re)building it when
+    missing or when the file's mtime or size changed. Without index_dir the
+    index is built in memory for this run only.
+    """
+    conversations_path = os.path.abspath(conversations_path)
+    if not index_dir:
+        return build_retrieval_index(conversations_path, ':memory:')
+
+    os.makedirs(index_dir, exist_ok=True)
+    key = hashlib.sha256(os.path.abspath(conversations_path).encode('utf-8')).hexdigest()[:16]
+    index_path = os.path.join(index_dir, f"{key}.sqlite")
+    if os.path.exists(index_path):
+        conn = sqlite3.connect(index_path)
+        try:
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+        except sqlite3.DatabaseError:
+            meta = {}
+        if (meta.get('version') == str(RETRIEVAL_VERSION)
+                and meta.get('fingerprint') == json.dumps(file_fingerprint(conversations_path))):
+            return conn
+        conn.close()
+    return build_retrieval_index(conversations_path, index_path)
+
+
+def select_passages(path: str, source: int, budget: float, query: str, top_k: int = DEFAULT_TOP_K,
+                    index_dir: str = None) -> list:
+    """Chunks for the top_k passages of a conversations file most relevant to query (BM25) that fit in budget"""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+    match = ' OR '.join('"' + w + '"' for w in words)
+
+    conn = open_retrieval_index(path, index_dir)
+    try:
+        rows = conn.execute(
+            'SELECT label, content FROM passages WHERE passages MATCH ? ORDER BY bm25(passages, 2.0, 1.0) LIMIT ?',
+            (match, top_k)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    chunks = []
+    for rank, (label, content) in enumerate(rows):
+        text = f"{label}:\n{content}"
+        size = text_size(text) + 2
+        if size <= budget:
+            chunks.append(Chunk(source, rank, PRIORITY_CONVERSATIONS, 0.0, text))
+            budget -= size
+    return chunks
+
+
+def assemble_context(paths: list, budget: int = None, query: str = None, top_k: int = DEFAULT_TOP_K,
+                     index_dir: str = None) -> tuple:
+    """
+    Build the system prompt for the given context files.
+
+    Returns (prompt, report) where report lists what was left out. With no
+    budget (and no query) every file is included verbatim, in order. With a
+    query, conversations files contribute only their top_k passages most
+    relevant to it instead of the newest conversations.
+    """
+    if budget is None and not query:
+        blocks = [f"### Context: {path}\n{verbatim_text(path).rstrip()}" for path in paths if os.path.isfile(path)]
+        return PROMPT_HEADER + '\n\n' + '\n\n'.join(blocks), {}
+
+    paths = [p for p in paths if os.path.isfile(p)]
+    kinds = [source_kind(p) for p in paths]
+    remaining = (math.inf if budget is None else budget) - text_size(PROMPT_HEADER) - 2
+
+    # Rank everything except conversations, which are streamed in their own tier
+    ranked = []
+    for source, (path, kind) in enumerate(zip(paths, kinds)):
+        if kind == 'claude':
+            ranked.extend(claude_entry_chunks(path, source))
+        elif kind != 'conversations':
+            ranked.extend(document_chunks(path, kind, source))
+    ranked.sort(key=lambda c: (c.priority, -c.recency, c.source, c.order))
+
+    selected = []
+    skipped = []
+    conversations_done = False
+    report = {'omitted_chunks': 0, 'omitted_conversations': 0, 'conversation_counts': {}, 'passage_counts': {}}
+
+    def take_conversations():
+        nonlocal remaining
+        for source, (path, kind) in enumerate(zip(paths, kinds)):
+            if kind != 'conversations':
+                continue
+            if query:
+                header_size = text_size(f"### Context: {path} (top 000 passages for: {query})\n") + 2
+                chunks = select_passages(path, source, remaining - header_size, query, top_k, index_dir)
+                if chunks:
+                    remaining -= header_size + sum(text_size(c.text) + 2 for c in chunks)
+                    selected.extend(chunks)
+                report['passage_counts'][path] = len(chunks)
+                continue
+            # Room for the header including its "(N of M conversations, newest first)" note
+            header_size = text_size(f"### Context: {path} (0000000 of 0000000 conversations, newest first)\n") + 2
+            chunks, count, omitted = select_conversations(path, source, remaining - header_size)
+            if chunks:
+                remaining -= header_size + sum(text_size(c.text) + 1 for c in chunks)
+                selected.extend(chunks)
+            report['conversation_counts'][path] = (len(chunks), count)
+            if omitted is None:
+                report['omitted_conversations'] = None
+            elif report['omitted_conversations'] is not None:
+                report['omitted_conversations'] += omitted
+
+    opened = set()
+    for chunk in ranked:
+        if chunk.priority > PRIORITY_CONVERSATIONS and not conversations_done:
+            take_conversations()
+            conversations_done = True
+        if kinds[chunk.source] == 'claude':
+            size = text_size(chunk.text) + 2
+        else:
+            # Sections of a document share one header, paid for by the first one taken
+            size = text_size(chunk.text)
+            if chunk.source not in opened:
+                size += text_size(f"### Context: {paths[chunk.source]}{PARTIAL_NOTE}\n") + 2
+        if size <= remaining or chunk.priority == PRIORITY_CONTROL:
+            selected.append(chunk)
+            opened.add(chunk.source)
+            remaining -= size
+        else:
+            skipped.append(chunk)
+    if not conversations_done:
+        take_conversations()
+
+    report['omitted_chunks'] = len(skipped)
+    report['superseded_omitted'] = sum(1 for c in skipped if c.priority == PRIORITY_SUPERSEDED)
+
+    # Emit in file order; chunks of one file stay in their original order
+    by_source = {}
+    for chunk in selected:
+        by_source.setdefault(chunk.source, []).append(chunk)
+
+    blocks = []
+    for source, path in enumerate(paths):
+        chunks = sorted(by_source.get(source, []), key=lambda c: c.order)
+        if not chunks:
+            continue
+        kind = kinds[source]
+        if kind == 'claude':
+            blocks.extend(c.text for c in chunks)
+        elif kind == 'conversations' and query:
+            blocks.append(f"### Context: {path} (top {len(chunks)} passages for: {query})\n"
+                          + '\n\n'.join(c.text for c in chunks))
+        elif kind == 'conversations':
+            shown, count = report['conversation_counts'][path]
+            note = f"{shown} of {count}" if count is not None else f"{shown} most recent"
+            blocks.append(f"### Context: {path} ({note} conversations, newest first)\n"
+                          + '\n'.join(c.text for c in chunks))
+        else:
+            body = ''.join(c.text for c in chunks).rstrip()
+            if len(chunks) < sum(1 for c in ranked if c.source == source):
+                path += PARTIAL_NOTE
+            blocks.append(f"### Context: {path}\n{body}")
+
+    prompt = PROMPT_HEADER + '\n\n' + '\n\n'.join(blocks)
+    report['size'] = text_size(prompt)
+    return prompt, report
+
+
+# Bump when assembly changes so bundles built by older code are not reused
+BUNDLE_CACHE_VERSION = 2
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+
+def input_files(paths: list) -> list:
+    """The files a bundle's key covers: the context files plus the journal of memory/claude/index.json"""
+    files = list(paths)
+    files.extend(journal_path_for(path) for path in paths if source_kind(path) == 'claude')
+    return files
+
+
+def referenced_files(paths: list) -> list:
+    """
+    The Claude memory entry files listed by memory/claude/index.json and
+    its journal. Finding them means parsing both, so this only runs when a
+    bundle is built.
+    """
+    files = []
+    for path in paths:
+        if source_kind(path) == 'claude' and os.path.isfile(path):
+            try:
+                entries = read_memory_store(path)[0].get('entries') or []
+            except (ValueError, AttributeError):
+                continue
+            base = os.path.dirname(path)
+            files.extend(os.path.join(base, e['file']) for e in entries if e.get('file'))
+    return files
+
+
+def file_fingerprint(path: str) -> list:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [path, None, None]
+    return [path, st.st_mtime_ns, st.st_size]
+
+
+def bundle_cache_name(paths: list, budget, query: str = None, top_k: int = None) -> str:
+    """
+    Cache file name for a bundle: <selection>-<fingerprint>.json.
+
+    The selection part hashes the chosen files and options; the
+    fingerprint part hashes the mtime and size of the input files (see
+    input_files), so touching any of them produces a new name.
+    """
+    paths = [os.path.abspath(p) for p in paths]
+    selection = json.dumps([BUNDLE_CACHE_VERSION, budget, query, top_k, paths])
+    fingerprint = json.dumps([file_fingerprint(p) for p in input_files(paths)])
+    return (hashlib.sha256(selection.encode('utf-8')).hexdigest()[:16] + '-'
+            + hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16] + '.json')
+
+
+def load_cached_bundle(cache_dir: str, name: str):
+    """
+    Return the cached (prompt, report) for a bundle, marking it as
+    recently used, or None. A bundle whose referenced files have changed
+    since it was stored is a miss.
+    """
+    path = os.path.join(cache_dir, name)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            bundle = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(file_fingerprint(fingerprint[0]) != fingerprint for fingerprint in bundle.get('referenced', [])):
+        return None
+    try:
+        os.utime(path)  # mtime is the LRU clock
+    except OSError:
+        return None
+    return bundle['prompt'], bundle['report']
+
+
+def store_cached_bundle(cache_dir: str, name: str, prompt: str, report: dict, referenced: list = (),
+                        max_size: int = DEFAULT_CACHE_SIZE):
+    """
+    Save a bundle along with referenced (the file_fingerprint of each of
+    its referenced files), drop stale bundles for the same selection, then
+    evict least recently used bundles until the cache fits in max_size
+    bytes.
+
+    Other sessions may be storing or evicting at the same time, so files
+    that vanish between listing and use are skipped, and the bundle only
+    appears under its name once fully written.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    selection = name.split('-', 1)[0] + '-'
+    for other in os.listdir(cache_dir):
+        if other.startswith(selection) and other.endswith('.json') and other != name:
+            try:
+                os.remove(os.path.join(cache_dir, other))
+            except FileNotFoundError:
+                pass
+
+    tmp = os.path.join(cache_dir, f".{name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'prompt': prompt, 'report': report, 'referenced': list(referenced)}, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(cache_dir, name))
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    bundles = []
+    for other in os.listdir(cache_dir):
+        if other.endswith('.json'):
+            try:
+                st = os.stat(os.path.join(cache_dir, other))
+            except FileNotFoundError:
+                continue
+            bundles.append((st.st_mtime_ns, st.st_size, other))
+    total = sum(size for _, size, _ in bundles)
+    for _, size, other in sorted(bundles):
+        if total <= max_size:
+            break
+        if other == name:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, other))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def format_report(report: dict, budget: int = None) -> str:
+    size = report['size']
+    line = f"memspan: context ~{estimate_tokens(size):,} tokens ({size / 1024:.0f} KB)"
+    if budget is not None:
+        line += f" of {estimate_tokens(budget):,}-token budget"
+    if report['passage_counts']:
+        line += f"; {sum(report['passage_counts'].values())} relevant conversation passages"
+    omitted = []
+    if report['omitted_conversations']:
+        omitted.append(f"{report['omitted_conversations']} older conversations")
+    elif report['omitted_conversations'] is None:
+        omitted.append('older conversations')
+    other = report['omitted_chunks'] - report['superseded_omitted']
+    if other:
+        omitted.append(f"{other} lower-priority sections")
+    if report['superseded_omitted']:
+        omitted.append(f"{report['superseded_omitted']} superseded memories")
+    if omitted:
+        line += '; omitted ' + ', '.join(omitted)
+    if report.get('cached'):
+        line += ' (cached)'
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Assemble cc-memspan context files into a system prompt',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('files', nargs='*', help='Context files, in the order they should appear')
+    parser.add_argument(
+        '--budget',
+        type=parse_budget,
+        default=None,
+        help='Maximum prompt size: tokens (50000, 50k) or bytes (400kb, 2mb). Default: no limit'
+    )
+    parser.add_argument(
+        '--query',
+        default=None,
+        help='Include only the conversation passages most relevant to this text (BM25) instead of the newest conversations'
+    )
+    parser.add_argument(
+        '--top-k',
+        type=int,
+        default=DEFAULT_TOP_K,
+        help=f'Maximum passages per conversations file with --query (default: {DEFAULT_TOP_K})'
+    )
+    parser.add_argument(
+        '--index-dir',
+        default=None,
+        help='Keep --query passage indexes in this directory (default: build in memory each run)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='Reuse assembled bundles from this directory while their input files are unchanged'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=parse_size,
+        default=DEFAULT_CACHE_SIZE,
+        help=f'Maximum total size of cached bundles in bytes, e.g. 512kb or 64mb '
+             f'(default: {DEFAULT_CACHE_SIZE // (1024 * 1024)}mb)'
+    )
+    args = parser.parse_args()
+
+    cached = None
+    if args.cache_dir:
+        name = bundle_cache_name(args.files, args.budget, args.query, args.top_k)
+        cached = load_cached_bundle(args.cache_dir, name)
+
+    if cached:
+        prompt, report = cached
+        report['cached'] = True
+    else:
+        referenced = []
+        if args.cache_dir:
+            # Fingerprinted before assembly, so an entry edited meanwhile makes the bundle stale
+            referenced = [file_fingerprint(p) for p in referenced_files([os.path.abspath(p) for p in args.files])]
+        prompt, report = assemble_context(args.files, budget=args.budget, query=args.query, top_k=args.top_k,
+                                          index_dir=args.index_dir)
+        if args.cache_dir:
+            store_cached_bundle(args.cache_dir, name, prompt, report, referenced, max_size=args.cache_size)
+    sys.stdout.write(prompt)
+    if args.budget is not None or args.query:
+        print(format_report(report, args.budget), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+"""
+Memspan Claude memory index
+
+Loads memory/claude/index.json once into in-memory lookup structures and
+answers filtered queries without scanning every entry:
+
+  - entries sorted by `created` (date ranges are a binary search)
+  - topic -> entries and type -> entries maps
+  - the resolved `supersedes` graph: for every entry, the live entry that
+    finally replaces it (its head), computed once in linear time
+
+The precomputed form is saved to memory/.cache/claude-index.compiled.json
+and reused until index.json or the journal changes.
+
+New memories are not written into index.json directly. `add` writes the
+entry file and appends one line to memory/claude/index.journal.jsonl under
+an exclusive lock, so parallel sessions can record memories safely and a
+write costs the same however large the store is. Readers apply the journal
+on top of index.json. `compact` folds the journal back into index.json and
+drops entries that have been superseded.
+
+Usage:
+  python3 memspan_memory.py query --topic health --type fact
+  python3 memspan_memory.py query --since 2025-01-01 --all --json
+  python3 memspan_memory.py chain 2025-01-01-old-goal
+  python3 memspan_memory.py topics
+  python3 memspan_memory.py add weight-loss-goal --type context --topic goals --topic health \\
+      --summary "Goal: lose 10 pounds next year" < body.md
+  python3 memspan_memory.py compact
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:  # not Windows
+    msvcrt = None
+
+MEMORY_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'memory')
+DEFAULT_INDEX_PATH = os.path.join(MEMORY_ROOT, 'claude', 'index.json')
+DEFAULT_COMPILED_PATH = os.path.join(MEMORY_ROOT, '.cache', 'claude-index.compiled.json')
+
+# Bump when the compiled layout changes so older compiled files are rebuilt
+COMPILED_VERSION = 2
+
+ENTRY_TYPES = ('fact', 'insight', 'context', 'correction', 'preference')
+SLUG_RE = re.compile(r'[^a-z0-9]+')
+
+
+def superseded_ids(entry: dict) -> list:
+    """IDs an entry supersedes (`supersedes` is normally one ID or null; a list is accepted too)"""
+    value = entry.get('supersedes')
+    if not value:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+def source_fingerprint(path: str) -> list:
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def journal_path_for(index_path: str) -> str:
+    """The journal that sits next to an index: memory/claude/index.journal.jsonl for index.json"""
+    root, _ = os.path.splitext(index_path)
+    return root + '.journal.jsonl'
+
+
+@contextmanager
+def locked_journal(journal_path: str, exclusive: bool):
+    """
+    Open the journal for appending while holding a lock on it.
+
+    Writers take an exclusive lock, readers a shared one. Compaction
+    truncates the journal in place instead of replacing it, so every
+    process always locks the same file. On Windows, msvcrt only has
+    exclusive locks, so readers take one too; where neither fcntl nor
+    msvcrt exists the journal is not locked.
+    """
+    os.makedirs(os.path.dirname(journal_path) or '.', exist_ok=True)
+    with open(journal_path, 'a+', encoding='utf-8') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        elif msvcrt is not None:
+            _msvcrt_lock(f, msvcrt.LK_LOCK)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                _msvcrt_lock(f, msvcrt.LK_UNLCK)
+
+
+def _msvcrt_lock(f, mode: int):
+    """Lock or unlock the journal's first byte (a lock may extend past the end of the file)"""
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), mode, 1)
+            return
+        except OSError:
+            if mode != msvcrt.LK_LOCK:
+                raise
+            # LK_LOCK gives up after about 10 seconds; keep waiting like flock does
+
+
+def append_journal(journal_path: str, records: list):
+    """
+    Append mutation records to the journal and flush them to disk.
+
+    If a previous writer was killed mid-append, the torn line is closed
+    off first, so the first new record starts on a line of its own.
+    """
+    data = ''.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) + '\n' for r in records)
+    with locked_journal(journal_path, exclusive=True) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            f.buffer.seek(size - 1)
+            if f.buffer.read(1) != b'\n':
+                data = '\n' + data
+            f.seek(0, os.SEEK_END)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(f) -> list:
+    """
+    Read every record from an open journal.
+
+    A torn last line (a writer killed mid-append) is ignored.
+    """
+    f.seek(0)
+    records = []
+    for line in f:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records
+
+
+def apply_journal(index: dict, records: list) -> dict:
+    """
+    Apply journal records to a parsed index.json.
+
+    {"op": "add", "entry": {...}} adds an entry, replacing any entry with
+    the same ID; {"op": "remove", "id": ...} deletes one. Applying a record
+    twice has the same effect as applying it once.
+    """
+    if not records:
+        return index
+    entries = {e.get('id'): e for e in index.get('entries') or []}
+    for record in records:
+        if record.get('op') == 'add' and isinstance(record.get('entry'), dict):
+            entry = record['entry']
+            entries.pop(entry.get('id'), None)
+            entries[entry.get('id')] = entry
+        elif record.get('op') == 'remove':
+            entries.pop(record.get('id'), None)
+    return {**index, 'entries': list(entries.values())}
+
+
+def read_memory_store(index_path: str) -> tuple:
+    """
+    Read index.json with the journal applied.
+
+    Returns (index, records). A missing index.json counts as empty when
+    the journal has entries.
+    """
+    journal_path = journal_path_for(index_path)
+    if not os.path.exists(journal_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f), []
+
+    with locked_journal(journal_path, exclusive=False) as journal:
+        records = read_journal(journal)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            if not records:
+                raise
+            index = {'config': {}, 'entries': []}
+    return apply_journal(index, records), records
+
+
+def store_fingerprint(index_path: str) -> list:
+    """mtime and size of index.json and its journal"""
+    journal_path = journal_path_for(index_path)
+    journal = source_fingerprint(journal_path) if os.path.exists(journal_path) else None
+    index = source_fingerprint(index_path) if os.path.exists(index_path) else None
+    return [index, journal]
+
+
+class MemoryIndex:
+    """
+    Query structures over the Claude memory entries.
+
+    Entries are held in `created` order; every other structure refers to
+    them by position in that list.
+    """
+
+    def __init__(self, config: dict, entries: list, compiled: tuple = None):
+        self.config = config
+        self.entries = entries
+        self.created = [e.get('created') or '' for e in entries]
+        self.positions = {e.get('id'): pos for pos, e in enumerate(entries)}
+        self.by_topic, self.by_type, self.superseded_by, self.heads = compiled or self._compile()
+
+    @classmethod
+    def from_index(cls, index: dict) -> 'MemoryIndex':
+        entries = sorted(index.get('entries') or [], key=lambda e: e.get('created') or '')
+        return cls(index.get('config') or {}, entries)
+
+    def _compile(self) -> tuple:
+        by_topic = {}
+        by_type = {}
+        for pos, entry in enumerate(self.entries):
+            for topic in entry.get('topics') or []:
+                by_topic.setdefault(topic, []).append(pos)
+            by_type.setdefault(entry.get('type'), []).append(pos)
+
+        # Newest entry wins when several supersede the same one (entries are in created order)
+        superseded_by = [None] * len(self.entries)
+        for pos, entry in enumerate(self.entries):
+            for old_id in superseded_ids(entry):
+                old = self.positions.get(old_id)
+                if old is not None and old != pos:
+                    superseded_by[old] = pos
+
+        # Follow each chain to its live head once, sharing the result along the path
+        heads = [None] * len(self.entries)
+        for start in range(len(self.entries)):
+            path = []
+            visited = set()
+            pos = start
+            while heads[pos] is None and superseded_by[pos] is not None and pos not in visited:
+                path.append(pos)
+                visited.add(pos)
+                pos = superseded_by[pos]
+            head = heads[pos] if heads[pos] is not None else pos
+            for p in path:
+                heads[p] = head
+            heads[pos] = head
+        return by_topic, by_type, superseded_by, heads
+
+    def is_live(self, pos: int) -> bool:
+        return self.heads[pos] == pos
+
+    def get(self, entry_id: str):
+        pos = self.positions.get(entry_id)
+        return self.entries[pos] if pos is not None else None
+
+    def head(self, entry_id: str):
+        """The live entry that (transitively) supersedes entry_id, or the entry itself if it is live"""
+        pos = self.positions.get(entry_id)
+        return self.entries[self.heads[pos]] if pos is not None else None
+
+    def chain(self, entry_id: str) -> list:
+        """Every entry replaced by the same head as entry_id, in supersedes order, ending with the head"""
+        pos = self.positions.get(entry_id)
+        if pos is None:
+            return []
+        head = self.heads[pos]
+
+        def steps_to_head(p):
+            steps = 0
+            while p != head and steps < len(self.entries):
+                p = self.superseded_by[p]
+                steps += 1
+            return steps
+
+        members = [p for p in range(len(self.entries)) if self.heads[p] == head]
+        members.sort(key=lambda p: (-steps_to_head(p), p))
+        return [self.entries[p] for p in members]
+
+    def query(self, topics: list = None, types: list = None, since: str = None, until: str = None,
+              include_superseded: bool = False, all_topics: bool = False, limit: int = None) -> list:
+        """
+        Entries matching every given filter, newest first.
+
+        topics matches entries with any of the topics (all of them with
+        all_topics); types matches any of the types. since/until bound
+        `created` as YYYY-MM-DD (until is exclusive). Only live entries are
+        returned unless include_superseded is set.
+        """
+        lo = bisect_left(self.created, since) if since else 0
+        hi = bisect_left(self.created, until) if until else len(self.entries)
+
+        candidates = None
+        if topics:
+            sets = [set(self.by_topic.get(t, ())) for t in topics]
+            candidates = set.intersection(*sets) if all_topics else set().union(*sets)
+        if types:
+            typed = set().union(*(self.by_type.get(t, ()) for t in types))
+            candidates = typed if candidates is None else candidates & typed
+
+        if candidates is None:
+            positions = range(hi - 1, lo - 1, -1)
+        else:
+            positions = sorted((p for p in candidates if lo <= p < hi), reverse=True)
+
+        results = []
+        for pos in positions:
+            if include_superseded or self.heads[pos] == pos:
+                results.append(self.entries[pos])
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def live(self) -> list:
+        return self.query()
+
+    def to_compiled(self, fingerprint: list) -> dict:
+        return {
+            'version': COMPILED_VERSION,
+            'source': fingerprint,
+            'config': self.config,
+            'entries': self.entries,
+            'by_topic': self.by_topic,
+            'by_type': {'' if k is None else k: v for k, v in self.by_type.items()},
+            'superseded_by': self.superseded_by,
+            'heads': self.heads,
+        }
+
+    @classmethod
+    def from_compiled(cls, compiled: dict) -> 'MemoryIndex':
+        by_type = {None if k == '' else k: v for k, v in compiled['by_type'].items()}
+        return cls(compiled['config'], compiled['entries'],
+                   (compiled['by_topic'], by_type, compiled['superseded_by'], compiled['heads']))
+
+
+def load_memory_index(index_path: str = DEFAULT_INDEX_PATH, compiled_path: str = DEFAULT_COMPILED_PATH) -> MemoryIndex:
+    """
+    Load the memory index (index.json plus its journal), from the compiled
+    form when it matches both files.
+
+    The compiled form is rewritten whenever either file changes. Pass
+    compiled_path=None to skip it.
+    """
+    fingerprint = store_fingerprint(index_path)
+    if compiled_path:
+        try:
+            with open(compiled_path, 'r', encoding='utf-8') as f:
+                compiled = json.load(f)
+            if compiled.get('version') == COMPILED_VERSION and compiled.get('source') == fingerprint:
+                return MemoryIndex.from_compiled(compiled)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = MemoryIndex.from_index(read_memory_store(index_path)[0])
+
+    if compiled_path:
+        os.makedirs(os.path.dirname(compiled_path) or '.', exist_ok=True)
+        tmp = f"{compiled_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index.to_compiled(fingerprint), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, compiled_path)
+    return index
+
+
+def slugify(text: str) -> str:
+    return SLUG_RE.sub('-', text.lower()).strip('-')
+
+
+def add_memory(index_path: str, slug: str, body: str, entry_type: str, summary: str, topics: list = None,
+               source: str = 'conversation', supersedes: str = None, created: str = None) -> dict:
+    """
+    Record a new memory: write entries/<created>-<slug>.md and journal it.
+
+    Neither index.json nor the other entries are read, so the cost does
+    not grow with the store. The entry file is created exclusively; if the
+    ID is taken a numeric suffix is added.
+    """
+    created = created or date.today().isoformat()
+    base = os.path.dirname(index_path)
+    entries_dir = os.path.join(base, 'entries')
+    os.makedirs(entries_dir, exist_ok=True)
+    try:
+        with open(index_path, 'x', encoding='utf-8') as f:
+            json.dump({'config': {}, 'entries': []}, f, indent=2)
+            f.write('\n')
+    except FileExistsError:
+        pass
+
+    stem = f"{created}-{slugify(slug)}"
+    entry_id = stem
+    suffix = 1
+    while True:
+        try:
+            fd = os.open(os.path.join(entries_dir, entry_id + '.md'), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            break
+        except FileExistsError:
+            suffix += 1
+            entry_id = f"{stem}-{suffix}"
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(body.rstrip() + '\n')
+
+    entry = {
+        'id': entry_id,
+        'file': f"entries/{entry_id}.md",
+        'created': created,
+        'type': entry_type,
+        'topics': topics or [],
+        'summary': summary,
+        'source': source,
+        'supersedes': supersedes,
+    }
+    append_journal(journal_path_for(index_path), [{'op': 'add', 'entry': entry}])
+    return entry
+
+
+def compact_memory(index_path: str, drop_superseded: bool = True, keep_files: bool = False,
+                   dry_run: bool = False) -> dict:
+    """
+    Fold the journal into index.json and drop superseded entries.
+
+    Runs under the journal's exclusive lock, so concurrent `add` calls wait
+    and land in the emptied journal afterwards. index.json is replaced
+    atomically before the journal is truncated; if the process dies in
+    between, replaying the journal again is harmless.
+    """
+    journal_path = journal_path_for(index_path)
+    with locked_journal(journal_path, exclusive=True) as journal:
+        records = read_journal(journal)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {'config': {}, 'entries': []}
+        index = apply_journal(index, records)
+
+        memory = MemoryIndex.from_index(index)
+        dropped = []
+        if drop_superseded:
+            dropped = [e for pos, e in enumerate(memory.entries) if not memory.is_live(pos)]
+            kept = [e for pos, e in enumerate(memory.entries) if memory.is_live(pos)]
+        else:
+            kept = memory.entries
+        stats = {'journal_records': len(records), 'entries': len(kept), 'dropped': [e.get('id') for e in dropped]}
+        if dry_run:
+            return stats
+
+        tmp = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({**index, 'entries': kept}, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, index_path)
+        journal.truncate(0)
+        journal.flush()
+        os.fsync(journal.fileno())
+
+    if not keep_files:
+        base = os.path.dirname(index_path)
+        for entry in dropped:
+            if entry.get('file'):
+                try:
+                    os.remove(os.path.join(base, entry['file']))
+                except FileNotFoundError:
+                    pass
+    return stats
+
+
+def format_entry(entry: dict, live: bool = True) -> str:
+    topics = ', '.join(entry.get('topics') or [])
+    marker = '' if live else '  (superseded)'
+    return (f"  {entry.get('created') or '?':<10}  {entry.get('type') or '?':<10}  {entry.get('id')}{marker}\n"
+            f"      {entry.get('summary') or ''}" + (f"  [{topics}]" if topics else ''))
+
+
+def cmd_query(index: MemoryIndex, args):
+    results = index.query(topics=args.topic, types=args.type, since=args.since, until=args.until,
+                          include_superseded=args.all, all_topics=args.all_topics, limit=args.limit)
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+    print(f"{len(results)} {'entries' if args.all else 'live entries'}")
+    for entry in results:
+        print(format_entry(entry, index.is_live(index.positions[entry.get('id')])))
+
+
+def cmd_chain(index: MemoryIndex, args):
+    chain = index.chain(args.id)
+    if not chain:
+        print(f"Error: entry '{args.id}' not found.", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(chain, indent=2, ensure_ascii=False))
+        return
+    print(f"Supersedes chain for {args.id} (oldest first; last is live):")
+    for entry in chain:
+        print(format_entry(entry, index.is_live(index.positions[entry.get('id')])))
+
+
+def cmd_topics(index: MemoryIndex, args):
+    counts = sorted(((sum(1 for p in positions if index.is_live(p)), topic)
+                     for topic, positions in index.by_topic.items()), key=lambda c: (-c[0], c[1]))
+    for count, topic in counts:
+        if count or args.all:
+            print(f"  {count:>5}  {topic}")
+
+
+def cmd_add(args):
+    if args.body_file:
+        with open(args.body_file, 'r', encoding='utf-8') as f:
+            body = f.read()
+    else:
+        body = sys.stdin.read()
+    if not body.strip():
+        print("Error: entry body is empty (pass --body-file or pipe it on stdin).", file=sys.stderr)
+        sys.exit(1)
+    entry = add_memory(args.index, args.slug, body, args.type, args.summary, topics=args.topic,
+                       source=args.source, supersedes=args.supersedes, created=args.created)
+    print(f"Saved {entry['id']} to {os.path.join(os.path.dirname(args.index), entry['file'])}")
+
+
+def cmd_compact(args):
+    stats = compact_memory(args.index, drop_superseded=not args.keep_superseded,
+                           keep_files=args.keep_files, dry_run=args.dry_run)
+    verb = 'Would fold' if args.dry_run else 'Folded'
+    print(f"{verb} {stats['journal_records']} journal records into {args.index}")
+    if stats['dropped']:
+        print(f"{'Would drop' if args.dry_run else 'Dropped'} {len(stats['dropped'])} superseded entries:")
+        for entry_id in stats['dropped']:
+            print(f"  {entry_id}")
+    print(f"{stats['entries']} entries {'would remain' if args.dry_run else 'remain'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Query Claude memory entries (memory/claude/index.json)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help='Path to index.json (default: memory/claude/index.json)')
+    parser.add_argument(
+        '--compiled',
+        default=DEFAULT_COMPILED_PATH,
+        help='Path to the compiled index cache (default: memory/.cache/claude-index.compiled.json)'
+    )
+    parser.add_argument('--no-compiled', action='store_true', help='Do not read or write the compiled index cache')
+
+    subparsers = parser.add_subparsers(dest='command', help='Commands')
+
+    query_parser = subparsers.add_parser('query', help='List live entries matching filters, newest first')
+    query_parser.add_argument('--topic', action='append', help='Entries with this topic (repeatable: any of them)')
+    query_parser.add_argument('--all-topics', action='store_true', help='With several --topic, require all of them')
+    query_parser.add_argument('--type', action='append', help='Entries of this type (repeatable)')
+    query_parser.add_argument('--since', help='Created on or after this date (YYYY-MM-DD)')
+    query_parser.add_argument('--until', help='Created before this date (YYYY-MM-DD)')
+    query_parser.add_argument('--all', action='store_true', help='Include superseded entries')
+    query_parser.add_argument('--limit', '-n', type=int, default=None, help='Maximum entries to show')
+    query_parser.add_argument('--json', action='store_true', help='Print matching entries as JSON')
+
+    chain_parser = subparsers.add_parser('chain', help='Show the supersedes chain an entry belongs to')
+    chain_parser.add_argument('id', help='Entry ID')
+    chain_parser.add_argument('--json', action='store_true', help='Print the chain as JSON')
+
+    topics_parser = subparsers.add_parser('topics', help='List topics by number of live entries')
+    topics_parser.add_argument('--all', action='store_true', help='Include topics with only superseded entries')
+
+    add_parser = subparsers.add_parser('add', help='Record a new memory (entry body from --body-file or stdin)')
+    add_parser.add_argument('slug', help='Short name for the entry; the ID becomes YYYY-MM-DD-slug')
+    add_parser.add_argument('--type', required=True, choices=ENTRY_TYPES, help='Entry type')
+    add_parser.add_argument('--summary', required=True, help='One-line summary')
+    add_parser.add_argument('--topic', action='append', help='Topic tag (repeatable)')
+    add_parser.add_argument('--source', default='conversation', help='Where this came from (default: conversation)')
+    add_parser.add_argument('--supersedes', help='ID of the entry this one replaces')
+    add_parser.add_argument('--created', help='Creation date YYYY-MM-DD (default: today)')
+    add_parser.add_argument('--body-file', help='Markdown file with the entry body (default: read stdin)')
+
+    compact_parser = subparsers.add_parser('compact', help='Fold the journal into index.json and drop superseded entries')
+    compact_parser.add_argument('--keep-superseded', action='store_true', help='Only fold the journal; keep superseded entries')
+    compact_parser.add_argument('--keep-files', action='store_true', help='Keep the entry files of dropped entries')
+    compact_parser.add_argument('--dry-run', action='store_true', help='Show what would change without writing')
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    if args.command == 'add':
+        cmd_add(args)
+        return
+    if args.command == 'compact':
+        try:
+            cmd_compact(args)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    try:
+        index = load_memory_index(args.index, None if args.no_compiled else args.compiled)
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'query':
+        cmd_query(index, args)
+    elif args.command == 'chain':
+        cmd_chain(index, args)
+    elif args.command == 'topics':
+        cmd_topics(index, args)
+
+
+if __name__ == '__main__':
+    main()
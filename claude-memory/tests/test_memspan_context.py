@@ -0,0 +1,187 @@
+"""
+Regression checks for bin/memspan_context.py
+
+Each check builds a small memory tree in a temporary directory and runs
+the assembler as a subprocess, or calls it directly where a check needs to
+see inside it.
+
+Usage:
+  python3 -m pytest -q claude-memory/tests
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BIN = Path(__file__).resolve().parent.parent / 'bin'
+CONTEXT = str(BIN / 'memspan_context.py')
+MEMORY = str(BIN / 'memspan_memory.py')
+sys.path.insert(0, str(BIN))
+
+import memspan_context
+
+
+def run(cwd, tool, *args, stdin='') -> subprocess.CompletedProcess:
+    result = subprocess.run([sys.executable, tool, *args], cwd=cwd, input=stdin,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def add_memory(root, slug, summary, body, *args):
+    run(root, MEMORY, '--index', 'memory/claude/index.json', '--no-compiled', 'add', slug, '--type', 'fact',
+        '--summary', summary, '--created', '2025-01-01', *args, stdin=body)
+
+
+@pytest.fixture
+def memory(tmp_path):
+    (tmp_path / 'memory' / 'claude').mkdir(parents=True)
+    (tmp_path / 'memory' / 'identity').mkdir()
+    (tmp_path / 'memory' / 'claude' / 'index.json').write_text(json.dumps({'entries': []}), encoding='utf-8')
+    (tmp_path / 'memory' / 'identity' / 'profile.md').write_text('# Profile\n\nLives by the sea.\n', encoding='utf-8')
+    add_memory(tmp_path, 'tea', 'Likes tea', 'Prefers green tea.\n')
+    return tmp_path
+
+
+FILES = ['memory/identity/profile.md', 'memory/claude/index.json']
+
+
+def assemble(root, *args) -> subprocess.CompletedProcess:
+    return run(root, CONTEXT, '--budget', '50k', '--cache-dir', 'cache', *args, *FILES)
+
+
+def touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_parse_size_is_bytes():
+    assert memspan_context.parse_size('64mb') == 64 * 1024 ** 2
+    assert memspan_context.parse_size('64m') == 64 * 1024 ** 2
+    assert memspan_context.parse_size('512kb') == 512 * 1024
+    assert memspan_context.parse_size('65536') == 65536
+
+
+def test_bundle_cache_hit_and_invalidation(memory):
+    first = assemble(memory)
+    assert '(cached)' not in first.stderr
+    second = assemble(memory)
+    assert '(cached)' in second.stderr
+    assert second.stdout == first.stdout
+
+    # Each kind of input change is a miss, and the rebuilt bundle is then served again
+    changes = [
+        lambda: touch(memory / 'memory' / 'identity' / 'profile.md'),
+        lambda: (memory / 'memory' / 'claude' / 'entries' / '2025-01-01-tea.md').write_text(
+            'Prefers black tea.\n', encoding='utf-8'),
+        lambda: add_memory(memory, 'coffee', 'Avoids coffee', 'No coffee after noon.\n'),
+    ]
+    for change in changes:
+        change()
+        rebuilt = assemble(memory)
+        assert '(cached)' not in rebuilt.stderr
+        assert '(cached)' in assemble(memory).stderr
+    assert 'Prefers black tea.' in rebuilt.stdout
+    assert 'No coffee after noon.' in rebuilt.stdout
+    # Stale bundles for the same selection are replaced, not kept
+    assert len(os.listdir(memory / 'cache')) == 1
+
+
+def test_bundle_cache_hit_does_not_parse_memory(memory, monkeypatch):
+    assemble(memory)
+    monkeypatch.chdir(memory)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('memory store parsed on a cache hit')
+
+    monkeypatch.setattr(memspan_context, 'read_memory_store', fail)
+    name = memspan_context.bundle_cache_name(FILES, memspan_context.parse_budget('50k'), None,
+                                             memspan_context.DEFAULT_TOP_K)
+    assert memspan_context.load_cached_bundle('cache', name) is not None
+
+
+def write_conversations(path, count, size):
+    """An export-project conversations file, newest first, with one message of about size bytes each"""
+    convs = [{'id': f"c{i}", 'title': f"Conversation {i}", 'update_time': 1700000000 - i * 1000,
+              'messages': [{'role': 'user', 'content': f"conversation {i} " + 'x' * size}]}
+             for i in range(count)]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'conversation_count': count, 'conversations': convs}), encoding='utf-8')
+
+
+@pytest.fixture
+def project(memory):
+    """CLAUDE.md, identity, live and superseded memories, ChatGPT memories and a project's conversations"""
+    (memory / 'CLAUDE.md').write_text('Control file.\n', encoding='utf-8')
+    (memory / 'memory' / 'chatgpt').mkdir()
+    (memory / 'memory' / 'chatgpt' / 'memories_export.md').write_text(
+        '## Food\nEnjoys soup.\n## Travel\nVisited Lisbon.\n', encoding='utf-8')
+    add_memory(memory, 'diet', 'Diet', 'Eats everything. ' + 'e' * 3000 + '\n')
+    add_memory(memory, 'diet-update', 'Diet', 'Now vegetarian.\n', '--supersedes', '2025-01-01-diet')
+    write_conversations(memory / 'memory' / 'projects' / 'demo' / 'conversations.json', 10, 1000)
+    return memory
+
+
+PROJECT_FILES = ['CLAUDE.md', 'memory/identity/profile.md', 'memory/claude/index.json',
+                 'memory/chatgpt/memories_export.md', 'memory/projects/demo/conversations.json']
+
+
+def test_budget_drops_lowest_priority_first(project, monkeypatch):
+    monkeypatch.chdir(project)
+    full, report = memspan_context.assemble_context(PROJECT_FILES, budget=100000)
+    assert 'Eats everything.' in full and 'conversation 9 ' in full
+    assert report['omitted_chunks'] == 0
+
+    # Room for everything above conversations plus a few conversations; the superseded entry loses out
+    prompt, report = memspan_context.assemble_context(PROJECT_FILES, budget=6000)
+    assert report['size'] <= 6000
+    for text in ('Control file.', 'Lives by the sea.', 'Prefers green tea.', 'Now vegetarian.', 'Enjoys soup.',
+                 'Visited Lisbon.'):
+        assert text in prompt
+    assert 'Eats everything.' not in prompt
+    assert report['superseded_omitted'] == 1
+    shown, count = report['conversation_counts']['memory/projects/demo/conversations.json']
+    assert 0 < shown < count == 10
+    # The newest conversations are the ones kept
+    assert all(f"conversation {i} " in prompt for i in range(shown))
+    assert f"conversation {shown} " not in prompt
+
+    # CLAUDE.md is kept even when nothing else fits
+    prompt, report = memspan_context.assemble_context(PROJECT_FILES, budget=20)
+    assert 'Control file.' in prompt
+    assert 'Lives by the sea.' not in prompt
+    assert report['conversation_counts']['memory/projects/demo/conversations.json'][0] == 0
+
+
+def test_query_ranks_relevant_passages(memory):
+    convs = [
+        {'id': 'c0', 'title': 'Gardening', 'update_time': 1700000000,
+         'messages': [{'role': 'user', 'content': 'Which tomatoes grow well in pots?'},
+                      {'role': 'assistant', 'content': 'Cherry tomatoes suit small pots.'}]},
+        {'id': 'c1', 'title': 'Database migration', 'update_time': 1600000000,
+         'messages': [{'role': 'user', 'content': 'How do I migrate the orders table to Postgres?'},
+                      {'role': 'assistant', 'content': 'Run the migration in batches and keep the old table.'}]},
+    ]
+    path = memory / 'memory' / 'projects' / 'demo' / 'conversations.json'
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps({'conversation_count': 2, 'conversations': convs}), encoding='utf-8')
+
+    files = ['memory/projects/demo/conversations.json']
+    args = ('--index-dir', 'index', '--query', 'database migration', '--top-k', '3')
+    result = run(memory, CONTEXT, *args, *files)
+    assert 'top 2 passages for: database migration' in result.stdout
+    assert 'Database migration / assistant:\nRun the migration' in result.stdout
+    assert 'tomatoes' not in result.stdout
+    assert len(os.listdir(memory / 'index')) == 1
+
+    # The index is rebuilt when the conversations file changes
+    convs[0]['messages'].append({'role': 'user', 'content': 'Also plan the database migration for seeds.'})
+    path.write_text(json.dumps({'conversation_count': 2, 'conversations': convs}), encoding='utf-8')
+    touch(path)
+    result = run(memory, CONTEXT, *args, *files)
+    assert 'Gardening / user:\nAlso plan the database migration' in result.stdout
+    assert 'Cherry tomatoes' not in result.stdout
@@ -0,0 +1,178 @@
+"""
+Regression checks for bin/memspan_memory.py
+
+Each check runs the tool as a subprocess against a throwaway memory store.
+
+Usage:
+  python3 -m pytest -q claude-memory/tests
+"""
+
+import json
+import random
+import subprocess
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+TOOL = str(Path(__file__).resolve().parent.parent / 'bin' / 'memspan_memory.py')
+sys.path.insert(0, str(Path(TOOL).parent))
+
+import memspan_memory
+
+
+def run(index, *args, stdin='') -> str:
+    result = subprocess.run([sys.executable, TOOL, '--index', str(index), '--no-compiled', *args],
+                            input=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / 'claude' / 'index.json'
+    path.parent.mkdir()
+    path.write_text(json.dumps({'entries': []}), encoding='utf-8')
+    return path
+
+
+def test_add_after_torn_journal_line(index):
+    run(index, 'add', 'first', '--type', 'fact', '--summary', 'First', '--created', '2025-01-01', stdin='one')
+    # A writer killed mid-append leaves a partial record with no newline
+    journal = index.parent / 'index.journal.jsonl'
+    with open(journal, 'a', encoding='utf-8') as f:
+        f.write('{"op":"add","entry":{"id":"torn')
+    run(index, 'add', 'second', '--type', 'fact', '--summary', 'Second', '--created', '2025-01-02', stdin='two')
+
+    entries = json.loads(run(index, 'query', '--json'))
+    assert sorted(e['id'] for e in entries) == ['2025-01-01-first', '2025-01-02-second']
+
+    run(index, 'compact')
+    entries = json.loads(run(index, 'query', '--json'))
+    assert sorted(e['id'] for e in entries) == ['2025-01-01-first', '2025-01-02-second']
+
+
+def test_journal_without_fcntl(tmp_path):
+    # As on Windows: no fcntl (and here no msvcrt either), so the journal is used unlocked
+    script = '\n'.join([
+        'import sys',
+        "sys.modules['fcntl'] = None",
+        f"sys.path.insert(0, {str(Path(TOOL).parent)!r})",
+        'import memspan_context',
+        'from memspan_memory import append_journal, locked_journal, read_journal',
+        "journal = sys.argv[1]",
+        "append_journal(journal, [{'op': 'remove', 'id': 'a'}])",
+        "append_journal(journal, [{'op': 'remove', 'id': 'b'}])",
+        'with locked_journal(journal, exclusive=False) as f:',
+        "    print(','.join(r['id'] for r in read_journal(f)))",
+    ])
+    result = subprocess.run([sys.executable, '-c', script, str(tmp_path / 'index.journal.jsonl')],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'a,b'
+
+
+def random_entries(count, seed=1) -> list:
+    """Entries on distinct days with random topics and types; some supersede an earlier entry"""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        created = (date(2024, 1, 1) + timedelta(days=3 * i)).isoformat()
+        entries.append({
+            'id': f"{created}-e{i}", 'file': f"entries/{created}-e{i}.md", 'created': created,
+            'type': rng.choice(memspan_memory.ENTRY_TYPES),
+            'topics': rng.sample(['health', 'work', 'food', 'travel'], rng.randint(0, 2)),
+            'summary': f"Entry {i}",
+            'supersedes': rng.choice(entries)['id'] if entries and rng.random() < 0.3 else None,
+        })
+    rng.shuffle(entries)
+    return entries
+
+
+def test_query_matches_scan(index):
+    entries = random_entries(60)
+    index.write_text(json.dumps({'entries': entries}), encoding='utf-8')
+    superseded = {e['supersedes'] for e in entries if e['supersedes']}
+    newest_first = sorted(entries, key=lambda e: e['created'], reverse=True)
+
+    cases = [
+        ([], lambda e: True),
+        (['--all'], None),
+        (['--topic', 'health'], lambda e: 'health' in e['topics']),
+        (['--topic', 'health', '--topic', 'food'], lambda e: {'health', 'food'} & set(e['topics'])),
+        (['--topic', 'health', '--topic', 'food', '--all-topics'], lambda e: {'health', 'food'} <= set(e['topics'])),
+        (['--type', 'fact', '--type', 'preference'], lambda e: e['type'] in ('fact', 'preference')),
+        (['--since', '2024-03-01', '--until', '2024-04-01'], lambda e: '2024-03-01' <= e['created'] < '2024-04-01'),
+        (['--topic', 'work', '--type', 'insight', '--since', '2024-02-01'],
+         lambda e: 'work' in e['topics'] and e['type'] == 'insight' and e['created'] >= '2024-02-01'),
+    ]
+    for args, match in cases:
+        expected = newest_first if match is None else [e for e in newest_first
+                                                        if e['id'] not in superseded and match(e)]
+        assert [e['id'] for e in json.loads(run(index, 'query', '--json', *args))] == [e['id'] for e in expected], args
+    assert len(json.loads(run(index, 'query', '--json', '-n', '3'))) == 3
+
+    topics = {}
+    for e in entries:
+        for topic in e['topics']:
+            topics[topic] = topics.get(topic, 0) + (e['id'] not in superseded)
+    listed = dict(reversed(line.split()) for line in run(index, 'topics').splitlines())
+    assert listed == {t: str(n) for t, n in topics.items() if n}
+
+
+def test_chain_follows_supersedes(index):
+    def entry(name, created, supersedes=None):
+        return {'id': name, 'created': created, 'type': 'fact', 'supersedes': supersedes}
+
+    index.write_text(json.dumps({'entries': [
+        entry('c', '2025-03-01', 'b'), entry('a', '2025-01-01'), entry('b', '2025-02-01', 'a'),
+        entry('other', '2025-01-15'),
+    ]}), encoding='utf-8')
+    for entry_id in ('a', 'b', 'c'):
+        assert [e['id'] for e in json.loads(run(index, 'chain', entry_id, '--json'))] == ['a', 'b', 'c']
+    assert [e['id'] for e in json.loads(run(index, 'chain', 'other', '--json'))] == ['other']
+    assert [e['id'] for e in json.loads(run(index, 'query', '--json'))] == ['c', 'other']
+
+
+def test_compiled_index_reused_until_store_changes(index, monkeypatch):
+    index.write_text(json.dumps({'entries': random_entries(20)}), encoding='utf-8')
+    compiled = index.parent / 'compiled.json'
+    first = memspan_memory.load_memory_index(str(index), str(compiled))
+
+    def fail(*args, **kwargs):
+        raise AssertionError('index.json parsed although the compiled index is current')
+
+    with monkeypatch.context() as m:
+        m.setattr(memspan_memory, 'read_memory_store', fail)
+        reused = memspan_memory.load_memory_index(str(index), str(compiled))
+    assert [e['id'] for e in reused.live()] == [e['id'] for e in first.live()]
+    assert reused.heads == first.heads
+
+    run(index, 'add', 'late', '--type', 'fact', '--summary', 'Late', '--created', '2030-01-01', stdin='late')
+    rebuilt = memspan_memory.load_memory_index(str(index), str(compiled))
+    assert rebuilt.live()[0]['id'] == '2030-01-01-late'
+
+
+def test_concurrent_adds_and_compact(index):
+    writers, per_writer = 4, 25
+    script = '\n'.join([
+        'import sys',
+        f"sys.path.insert(0, {str(Path(TOOL).parent)!r})",
+        'from memspan_memory import add_memory, compact_memory',
+        'index, name = sys.argv[1], sys.argv[2]',
+        f"for i in range({per_writer}):",
+        "    add_memory(index, f'{name}-{i}', 'body', 'fact', f'{name} {i}', created='2025-01-01')",
+        "    if name == 'w0' and i % 5 == 4:",
+        '        compact_memory(index)',
+    ])
+    procs = [subprocess.Popen([sys.executable, '-c', script, str(index), f"w{n}"], stderr=subprocess.PIPE, text=True)
+             for n in range(writers)]
+    for proc in procs:
+        assert proc.wait() == 0, proc.stderr.read()
+
+    expected = sorted(f"2025-01-01-w{n}-{i}" for n in range(writers) for i in range(per_writer))
+    assert sorted(e['id'] for e in json.loads(run(index, 'query', '--json'))) == expected
+    run(index, 'compact')
+    assert (index.parent / 'index.journal.jsonl').read_text(encoding='utf-8') == ''
+    assert sorted(e['id'] for e in json.loads(index.read_text(encoding='utf-8'))['entries']) == expected
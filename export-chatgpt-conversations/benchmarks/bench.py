@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for chatgpt_project_conversations.py
+
+Generates (or reuses) a synthetic export with generate_export.py, then
+times the core functions and every export command on it. Each case runs
+in a fresh subprocess so peak RSS is not inflated by earlier cases.
+
+For each case the report shows:
+  - best and median wall time over --repeat runs
+  - peak memory allocated by Python during one run (tracemalloc)
+  - peak RSS of the case's process, including loading its inputs
+
+Results can be saved as a baseline and later runs compared against it;
+a case slower or larger than the baseline by more than --tolerance is
+reported as a regression and the exit status is 1.
+
+Usage:
+  python3 bench.py                              # medium preset, print results
+  python3 bench.py --preset small --repeat 1    # quick run
+  python3 bench.py --compare baseline.json      # check for regressions
+  python3 bench.py --save baseline.json         # record a new baseline
+  python3 bench.py --case load_conversations --case cmd_export_with_messages
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import chatgpt_project_conversations as cpc
+from generate_export import add_size_arguments, ensure_export, size_params
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'memspan-bench')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DELTA = 0.02
+MIN_MEMORY_DELTA = 1.0
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Each case is (setup, run): setup loads the inputs (not measured) and
+# returns the arguments for run, which is the measured call.
+
+def setup_paths(data_dir: str, out_dir: str) -> dict:
+    return {
+        'conversations': os.path.join(data_dir, 'conversations.json'),
+        'projects': os.path.join(data_dir, 'projects.json'),
+        'out': out_dir,
+    }
+
+
+def setup_loaded(data_dir: str, out_dir: str) -> dict:
+    ctx = setup_paths(data_dir, out_dir)
+    ctx['projects_list'] = cpc.load_projects(ctx['projects'])
+    ctx['conversations_list'] = cpc.load_conversations(ctx['conversations'])
+    ctx['grouped'] = cpc.group_conversations_by_project(ctx['conversations_list'])
+    # The project with the most conversations (generate_export skews sizes)
+    ctx['project_id'] = max((k for k in ctx['grouped'] if k and k.startswith('g-p-')
+                             and any(p['project_id'] == k for p in ctx['projects_list'])),
+                            key=lambda k: len(ctx['grouped'][k]))
+    return ctx
+
+
+def run_extract(ctx):
+    for conv in ctx['conversations_list']:
+        cpc.extract_messages_from_mapping(conv.get('mapping', {}), conv.get('current_node'))
+
+
+CASES = {
+    'load_conversations': (setup_paths, lambda ctx: cpc.load_conversations(ctx['conversations'])),
+    'group_conversations_by_project': (
+        setup_loaded, lambda ctx: cpc.group_conversations_by_project(ctx['conversations_list'])),
+    'extract_messages_from_mapping': (setup_loaded, run_extract),
+    'cmd_list_projects': (setup_loaded, lambda ctx: cpc.cmd_list_projects(ctx['projects_list'], ctx['grouped'])),
+    'cmd_list_conversations': (
+        setup_loaded, lambda ctx: cpc.cmd_list_conversations(ctx['project_id'], ctx['projects_list'], ctx['grouped'])),
+    'cmd_export': (
+        setup_loaded, lambda ctx: cpc.cmd_export(ctx['projects_list'], ctx['conversations_list'], ctx['grouped'],
+                                                 os.path.join(ctx['out'], 'export.json'))),
+    'cmd_export_with_messages': (
+        setup_loaded, lambda ctx: cpc.cmd_export(ctx['projects_list'], ctx['conversations_list'], ctx['grouped'],
+                                                 os.path.join(ctx['out'], 'export.json'), with_messages=True)),
+    'cmd_export_project': (
+        setup_loaded, lambda ctx: cpc.cmd_export_project(ctx['project_id'], ctx['projects_list'], ctx['grouped'],
+                                                         os.path.join(ctx['out'], 'project.json'))),
+    'cmd_export_non_project': (
+        setup_loaded, lambda ctx: cpc.cmd_export_non_project(ctx['grouped'], os.path.join(ctx['out'], 'non.json'),
+                                                             with_messages=True)),
+    'cmd_export_all_projects': (
+        setup_loaded, lambda ctx: cpc.cmd_export_all_projects(ctx['projects_list'], ctx['conversations'],
+                                                              memory_dir=os.path.join(ctx['out'], 'projects'))),
+}
+
+
+def run_case(name: str, data_dir: str, repeat: int) -> dict:
+    """Run one case in this process and return its measurements"""
+    setup, run = CASES[name]
+    with tempfile.TemporaryDirectory(prefix='memspan-bench-') as out_dir, \
+            open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        ctx = setup(data_dir, out_dir)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(ctx)
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        run(ctx)
+        _, peak_alloc = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'best_s': min(times),
+        'median_s': statistics.median(times),
+        'peak_alloc_mb': peak_alloc / (1024 * 1024),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_case_subprocess(name: str, data_dir: str, repeat: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-case', name, '--data-dir', data_dir,
+         '--repeat', str(repeat)],
+        stdout=subprocess.PIPE, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return (case, metric, baseline, current) for every regression beyond tolerance"""
+    regressions = []
+    for name, current in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        for metric, min_delta in (('best_s', MIN_TIME_DELTA), ('peak_alloc_mb', MIN_MEMORY_DELTA)):
+            before, after = old.get(metric), current.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + tolerance) and after - before > min_delta:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def format_row(name: str, r: dict, old: dict = None) -> str:
+    row = f"{name:<32} {r['best_s']:>9.3f} {r['median_s']:>9.3f} {r['peak_alloc_mb']:>10.1f}"
+    row += f" {r['peak_rss_mb']:>9.1f}" if r.get('peak_rss_mb') is not None else f" {'-':>9}"
+    if old and old.get('best_s'):
+        row += f" {r['best_s'] / old['best_s']:>8.2f}x"
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark chatgpt_project_conversations.py on a synthetic export',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    add_size_arguments(parser)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help='Where the synthetic export is generated and reused (default: system temp dir)')
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help='Run only this case (repeatable)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'Timed runs per case (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='FILE',
+                        help='Compare against a baseline (default: benchmarks/baseline.json)')
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, metavar='FILE',
+                        help='Save results as a baseline (default: benchmarks/baseline.json)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed slowdown or growth before a regression is reported (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.data_dir, args.repeat)))
+        return
+
+    params = size_params(args)
+    data_dir = os.path.join(args.data_dir, f"{args.preset}-{args.seed}") if args.data_dir == DEFAULT_DATA_DIR else args.data_dir
+    print(f"Preparing synthetic export in {data_dir}...", file=sys.stderr)
+    dataset = ensure_export(data_dir, seed=args.seed, **params)
+    size_mb = os.path.getsize(os.path.join(data_dir, 'conversations.json')) / (1024 * 1024)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('dataset') != dataset:
+            print(f"Warning: baseline was recorded on a different dataset: {baseline.get('dataset')}", file=sys.stderr)
+
+    print(f"Dataset: {dataset['conversations']} conversations, {dataset['projects']} projects, "
+          f"{size_mb:.1f} MB; best of {args.repeat}")
+    header = f"{'case':<32} {'best s':>9} {'median s':>9} {'alloc MB':>10} {'RSS MB':>9}"
+    print(header + (f" {'vs base':>9}" if baseline else ''))
+    print('-' * (len(header) + (10 if baseline else 0)))
+
+    results = {}
+    for name in args.case or CASES:
+        results[name] = run_case_subprocess(name, data_dir, args.repeat)
+        old = (baseline or {}).get('results', {}).get(name)
+        print(format_row(name, results[name], old), flush=True)
+
+    report = {
+        'dataset': dataset,
+        'conversations_mb': round(size_mb, 1),
+        'repeat': args.repeat,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"\nSaved baseline to {args.save}")
+
+    if baseline:
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for name, metric, before, after in regressions:
+                print(f"  {name}: {metric} {before:.3f} -> {after:.3f}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Synthetic ChatGPT export generator
+
+Writes a conversations.json and projects.json shaped like a real ChatGPT
+export, for benchmarking chatgpt_project_conversations.py at sizes the
+example files cannot reach. The same parameters and seed always produce
+byte-identical files.
+
+Each conversation is a mapping tree: a root node with no message, a hidden
+system message, then alternating user and assistant messages. With
+probability --branching a new message forks from the previous one's parent
+instead of following it (a regeneration or edit), leaving the old branch
+behind; current_node is the tip of the last branch.
+
+Usage:
+  python3 generate_export.py -o /tmp/synthetic
+  python3 generate_export.py -o /tmp/synthetic --preset large
+  python3 generate_export.py -o /tmp/synthetic --conversations 10000 --nodes 80 --branching 0.2
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import uuid
+
+PRESETS = {
+    'small': {'projects': 10, 'conversations': 200, 'nodes': 30, 'branching': 0.1, 'message_size': 400},
+    'medium': {'projects': 40, 'conversations': 2000, 'nodes': 40, 'branching': 0.1, 'message_size': 400},
+    'large': {'projects': 80, 'conversations': 20000, 'nodes': 60, 'branching': 0.1, 'message_size': 600},
+}
+DEFAULT_PRESET = 'medium'
+
+# Share of conversations outside projects: custom GPTs, regular chats, and
+# chats whose project was deleted (gizmo_id not in projects.json)
+GPT_SHARE = 0.1
+REGULAR_SHARE = 0.25
+ORPHANED_SHARE = 0.02
+
+MODELS = ('gpt-4o', 'gpt-4o-mini', 'o1', 'gpt-4-turbo')
+WORDS = (
+    'the of and to in is that for it as with was on be by this are from or an at which have not but had '
+    'project data model research sleep health python database vector index query memory export stream '
+    'conversation message branch context budget summary result analysis design plan review goal notes '
+    'we can should would could because however therefore also then next first second finally example'
+).split()
+CORPUS_WORDS = 200000
+# Conversations are spread over this many seconds before 2025-01-01
+HISTORY_SECONDS = 2 * 365 * 86400
+
+SCHEMA_VERSION = 1
+
+
+def synthetic_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def make_corpus(rng: random.Random) -> str:
+    """A long run of random words; message text is sliced out of it"""
+    words = rng.choices(WORDS, k=CORPUS_WORDS)
+    for i in range(0, len(words), 12):
+        words[i] = words[i].capitalize()
+    return ' '.join(words)
+
+
+def message_text(rng: random.Random, corpus: str, size: int) -> str:
+    length = max(1, int(rng.uniform(0.25, 1.75) * size))
+    start = rng.randrange(0, len(corpus) - length)
+    return corpus[start:start + length]
+
+
+def make_node(node_id: str, parent, message=None) -> dict:
+    return {'id': node_id, 'message': message, 'parent': parent, 'children': []}
+
+
+def make_message(rng: random.Random, role: str, text: str, create_time: float, model: str) -> dict:
+    return {
+        'id': synthetic_id(rng),
+        'author': {'role': role, 'name': None, 'metadata': {}},
+        'create_time': create_time,
+        'update_time': None,
+        'content': {'content_type': 'text', 'parts': [text]},
+        'status': 'finished_successfully',
+        'end_turn': role == 'assistant' or None,
+        'weight': 1.0,
+        'metadata': {'model_slug': model} if role == 'assistant' else {},
+        'recipient': 'all',
+    }
+
+
+def make_conversation(rng: random.Random, corpus: str, gizmo_id, gizmo_type, create_time: float,
+                      nodes: int, branching: float, message_size: int) -> dict:
+    model = rng.choice(MODELS)
+    node_count = rng.randint(max(3, nodes // 2), max(3, nodes * 3 // 2))
+
+    root_id = synthetic_id(rng)
+    mapping = {root_id: make_node(root_id, None)}
+    system_id = synthetic_id(rng)
+    system = make_message(rng, 'system', '', create_time, model)
+    system['metadata'] = {'is_visually_hidden_from_conversation': True}
+    mapping[system_id] = make_node(system_id, root_id, system)
+    mapping[root_id]['children'].append(system_id)
+
+    # depth tracks user/assistant alternation along each branch
+    tip, depth = system_id, {system_id: 0}
+    t = create_time
+    for _ in range(node_count - 2):
+        parent = tip
+        if depth[tip] > 1 and rng.random() < branching:
+            parent = mapping[tip]['parent']
+        role = 'user' if depth[parent] % 2 == 0 else 'assistant'
+        t += rng.uniform(5, 120)
+        node_id = synthetic_id(rng)
+        message = make_message(rng, role, message_text(rng, corpus, message_size), t, model)
+        mapping[node_id] = make_node(node_id, parent, message)
+        mapping[parent]['children'].append(node_id)
+        depth[node_id] = depth[parent] + 1
+        tip = node_id
+
+    return {
+        'title': ' '.join(rng.choices(WORDS, k=rng.randint(3, 8))).capitalize(),
+        'create_time': create_time,
+        'update_time': t,
+        'mapping': mapping,
+        'moderation_results': [],
+        'current_node': tip,
+        'plugin_ids': None,
+        'conversation_id': None,
+        'conversation_template_id': gizmo_id,
+        'gizmo_id': gizmo_id,
+        'gizmo_type': gizmo_type,
+        'is_archived': rng.random() < 0.05,
+        'is_starred': None,
+        'safe_urls': [],
+        'default_model_slug': model,
+        'conversation_origin': None,
+        'voice': None,
+        'async_status': None,
+        'disabled_tool_ids': [],
+        'memory_scope': 'global_enabled',
+        'id': None,
+    }
+
+
+def make_project(rng: random.Random, index: int) -> dict:
+    name = f"{' '.join(rng.choices(WORDS, k=3)).title()} {index}"
+    project_id = 'g-p-' + uuid.UUID(int=rng.getrandbits(128)).hex
+    stamp = f"{2023 + index % 3}-{1 + index % 12:02d}-{1 + index % 28:02d}T10:00:00.000000+00:00"
+    return {
+        'project_id': project_id,
+        'name': name,
+        'short_url': f"{project_id}-{name.lower().replace(' ', '-')}",
+        'created_at': stamp,
+        'updated_at': stamp,
+        'last_interacted_at': stamp,
+        'num_interactions': 0,
+        'memory_enabled': True,
+        'memory_scope': 'project',
+        'organization_id': 'org-synthetic',
+        'author': 'Synthetic User',
+        'conversations_preview': [],
+    }
+
+
+def generate_export(out_dir: str, projects: int, conversations: int, nodes: int, branching: float,
+                    message_size: int, seed: int = 0) -> dict:
+    """
+    Write conversations.json, projects.json and synthetic.json (the
+    parameters used) into out_dir.
+
+    Conversations are written one at a time, newest first as in a real
+    export, so memory use stays flat whatever the size. Project sizes are
+    skewed: the first projects get far more conversations than the last.
+    """
+    rng = random.Random(seed)
+    corpus = make_corpus(rng)
+    os.makedirs(out_dir, exist_ok=True)
+
+    project_list = [make_project(rng, i) for i in range(projects)]
+    project_weights = [1.0 / (i + 1) for i in range(projects)]
+    gpt_ids = ['g-' + uuid.UUID(int=rng.getrandbits(128)).hex[:24] for _ in range(5)]
+    orphaned_ids = ['g-p-' + uuid.UUID(int=rng.getrandbits(128)).hex for _ in range(3)]
+
+    params = {
+        'version': SCHEMA_VERSION,
+        'projects': projects,
+        'conversations': conversations,
+        'nodes': nodes,
+        'branching': branching,
+        'message_size': message_size,
+        'seed': seed,
+    }
+
+    t = 1735689600.0  # 2025-01-01; walk backwards in time
+    mean_gap = HISTORY_SECONDS / max(1, conversations)
+    conversations_path = os.path.join(out_dir, 'conversations.json')
+    tmp = conversations_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i in range(conversations):
+            roll = rng.random()
+            gizmo_type = None
+            if roll < GPT_SHARE:
+                gizmo_id, gizmo_type = rng.choice(gpt_ids), 'gpt'
+            elif roll < GPT_SHARE + REGULAR_SHARE or not project_list:
+                gizmo_id = None
+            elif roll < GPT_SHARE + REGULAR_SHARE + ORPHANED_SHARE:
+                gizmo_id, gizmo_type = rng.choice(orphaned_ids), 'snorlax'
+            else:
+                gizmo_id = rng.choices(project_list, weights=project_weights)[0]['project_id']
+                gizmo_type = 'snorlax'
+            t -= rng.expovariate(1 / mean_gap)
+            conv = make_conversation(rng, corpus, gizmo_id, gizmo_type, t, nodes, branching, message_size)
+            conv['id'] = conv['conversation_id'] = synthetic_id(rng)
+            if i:
+                f.write(', ')
+            f.write(json.dumps(conv))
+        f.write(']')
+    os.replace(tmp, conversations_path)
+
+    with open(os.path.join(out_dir, 'projects.json'), 'w', encoding='utf-8') as f:
+        json.dump(project_list, f, indent=2)
+    with open(os.path.join(out_dir, 'synthetic.json'), 'w', encoding='utf-8') as f:
+        json.dump(params, f, indent=2)
+    return params
+
+
+def existing_params(out_dir: str):
+    """Parameters of a previously generated export in out_dir, or None"""
+    try:
+        with open(os.path.join(out_dir, 'synthetic.json'), 'r', encoding='utf-8') as f:
+            params = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(os.path.join(out_dir, 'conversations.json')):
+        return None
+    return params
+
+
+def ensure_export(out_dir: str, seed: int = 0, **params) -> dict:
+    """Generate the export unless out_dir already holds one with the same parameters"""
+    wanted = {'version': SCHEMA_VERSION, **params, 'seed': seed}
+    if existing_params(out_dir) == wanted:
+        return wanted
+    return generate_export(out_dir, seed=seed, **params)
+
+
+def add_size_arguments(parser):
+    """Dataset size options shared with bench.py"""
+    parser.add_argument('--preset', choices=sorted(PRESETS), default=DEFAULT_PRESET,
+                        help=f'Base dataset size (default: {DEFAULT_PRESET})')
+    parser.add_argument('--projects', type=int, help='Number of projects')
+    parser.add_argument('--conversations', type=int, help='Number of conversations')
+    parser.add_argument('--nodes', type=int, help='Average mapping nodes per conversation')
+    parser.add_argument('--branching', type=float, help='Chance that a message forks a new branch (0-1)')
+    parser.add_argument('--message-size', type=int, help='Average message length in characters')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+
+def size_params(args) -> dict:
+    """The preset's parameters with any explicit overrides applied"""
+    params = dict(PRESETS[args.preset])
+    for key in params:
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate a deterministic synthetic ChatGPT export',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('-o', '--output-dir', required=True, help='Directory to write the export into')
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    params = generate_export(args.output_dir, seed=args.seed, **size_params(args))
+    size = os.path.getsize(os.path.join(args.output_dir, 'conversations.json'))
+    print(f"Wrote {params['conversations']} conversations in {params['projects']} projects "
+          f"({size / (1024 * 1024):.1f} MB) to {args.output_dir}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
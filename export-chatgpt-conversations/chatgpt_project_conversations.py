@@ -28,26 +28,720 @@ Usage:
   # Export all non-project conversations
   python3 chatgpt_project_conversations.py export-non-project
   python3 chatgpt_project_conversations.py export-non-project --with-messages -o all_non_project.json
+
+  # Full-text search of message content (index is built/updated automatically)
+  python3 chatgpt_project_conversations.py search "vector database"
+  python3 chatgpt_project_conversations.py search "sleep" --project "Health Research" --role assistant
+
+  # Refresh claude-memory/memory/projects/<project>/conversations.json for every project in one pass
+  python3 chatgpt_project_conversations.py export-all-projects
+
+  # Generate claude-memory/memory/projects/<project>/context.md for every project
+  # (unchanged projects are skipped; any command reading stdin can summarize)
+  python3 chatgpt_project_conversations.py generate-contexts
+  python3 chatgpt_project_conversations.py generate-contexts --summarizer "./my-summarizer.sh" --concurrency 8
+
+  # Print conversations by ID (only those are read from the export)
+  python3 chatgpt_project_conversations.py get 6763a1b2-... --raw
+
+  # Build the sidecar index on first use and decode only what a command needs
+  python3 chatgpt_project_conversations.py --mmap export-project "Health Research"
+
+  # Stream a large conversations.json instead of loading it all at once
+  # (automatic for files above 256 MB; --no-stream forces a full load)
+  python3 chatgpt_project_conversations.py --stream export --with-messages
+
+  # Report added, deleted, retitled, moved and grown conversations between two exports (JSON Lines)
+  python3 chatgpt_project_conversations.py diff old/conversations.json conversations.json -o changes.jsonl
+
+  # Keep every export in a deduplicated snapshot archive; restore a snapshot or one conversation as of a date
+  python3 chatgpt_project_conversations.py archive add
+  python3 chatgpt_project_conversations.py archive get 6763a1b2-... --as-of 2025-02-01
+
+  # Read a compressed export and write compressed output (.gz, or .zst with the zstandard package)
+  python3 chatgpt_project_conversations.py --conversations-file conversations.json.zst --compress zstd export -m
+
+  # Report phase times, peak memory and counts (saved to <output>.stats.json)
+  python3 chatgpt_project_conversations.py --stats export --with-messages
+  python3 chatgpt_project_conversations.py --profile export-project "Health Research"
 """
 
 import argparse
+import cProfile
+import gzip
+import hashlib
 import json
+import math
+import mmap
+import multiprocessing
+import os
+import pstats
+import re
+import shlex
+import shutil
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import time
+import zlib
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import numpy as np
+except ImportError:  # optional: column group-bys fall back to plain loops
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for .zst files
+    zstandard = None
+
+
+class RunStats:
+    """
+    Timings and counters collected for --stats and --profile.
+
+    Phases are consecutive wall-clock spans of a run (load, group,
+    command). Because streaming interleaves the work, time spent decoding
+    JSON, walking mapping trees and serializing output is also accumulated
+    separately, wherever it happens.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now().isoformat()
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.inside = defaultdict(float)
+        self.workers = defaultdict(float)  # summed across worker processes
+        self.counts = defaultdict(int)
+        self.outputs = []
+        self._phase = None
+        self._phase_started = None
+
+    def phase(self, name):
+        """End the current phase (if any) and start the next one"""
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.phases[self._phase] = self.phases.get(self._phase, 0.0) + now - self._phase_started
+        self._phase = name
+        self._phase_started = now
+
+    def merge_worker(self, worker: dict):
+        """Add the inside-times and counts a worker process reported"""
+        for key, seconds in worker['inside'].items():
+            self.workers[key] += seconds
+        for key, n in worker['counts'].items():
+            self.counts[key] += n
+
+    def report(self, command: str) -> dict:
+        self.phase(None)
+        bytes_written = sum(os.path.getsize(p) for p in self.outputs if os.path.exists(p))
+        self.counts['bytes_written'] = bytes_written
+        return {
+            'version': STATS_VERSION,
+            'command': command,
+            'argv': sys.argv[1:],
+            'started_at': self.started_at,
+            'wall_s': round(time.perf_counter() - self.started, 4),
+            'phases_s': {k: round(v, 4) for k, v in self.phases.items()},
+            'inside_s': {k: round(v, 4) for k, v in self.inside.items()},
+            'workers_s': {k: round(v, 4) for k, v in self.workers.items()},
+            'counts': dict(self.counts),
+            'outputs': self.outputs,
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_children_mb': peak_rss_mb(children=True),
+            'python': sys.version.split()[0],
+        }
+
+
+# Bump when the stats file layout changes
+STATS_VERSION = 1
+
+# The RunStats of this run, or None when --stats/--profile are off
+_run_stats = None
+
+
+def peak_rss_mb(children: bool = False):
+    """Peak resident set size of this process (or its largest child), in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def stats_phase(name: str):
+    """Start the next phase of the run when stats are being collected"""
+    if _run_stats is not None:
+        _run_stats.phase(name)
+
+
+def record_output(path: str):
+    """Note an output file so --stats can report the bytes written"""
+    if _run_stats is not None:
+        _run_stats.outputs.append(path)
+
+
+# Compressed files are recognized by their suffix
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_COMPRESS_LEVELS = {'gzip': 6, 'zstd': 3}
+
+
+def compression_of(path: str):
+    """The codec a path's suffix calls for ('gzip' or 'zstd'), or None"""
+    for codec, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return codec
+    return None
+
+
+def with_compression_suffix(path: str, codec) -> str:
+    """path with codec's suffix appended, unless codec is None or path is already compressed"""
+    if codec is None or compression_of(path):
+        return path
+    return path + COMPRESSION_SUFFIXES[codec]
+
+
+def open_compressed(path: str, mode: str = 'rt', level: int = None, codec=..., newline: str = None):
+    """
+    Open a file, compressing or decompressing it as a stream.
+
+    The codec comes from the path's suffix (.gz, .zst) unless given, and
+    any other file is opened as-is, so every reader and writer accepts
+    compressed paths transparently. mode must say 't' or 'b'; text is
+    UTF-8, and newline is passed on as for open(). level applies when
+    writing (default: 6 for gzip, 3 for zstd).
+    """
+    if codec is ...:
+        codec = compression_of(path)
+    encoding = None if 'b' in mode else 'utf-8'
+    if codec is None:
+        return open(path, mode, encoding=encoding, newline=newline)
+    if level is None:
+        level = DEFAULT_COMPRESS_LEVELS[codec]
+    if codec == 'gzip':
+        return gzip.open(path, mode, compresslevel=level, encoding=encoding, newline=newline)
+    if zstandard is None:
+        raise RuntimeError(f"{path}: zstd files need the zstandard package (pip install zstandard)")
+    cctx = zstandard.ZstdCompressor(level=level) if mode[0] in 'wax' else None
+    return zstandard.open(path, mode.replace('t', ''), cctx=cctx, encoding=encoding, newline=newline)
 
 
 def load_projects(projects_path: str) -> list:
     """Load projects from projects.json"""
-    with open(projects_path, 'r', encoding='utf-8') as f:
+    with open_compressed(projects_path, 'rt') as f:
         return json.load(f)
 
 
 def load_conversations(conversations_path: str) -> list:
     """Load conversations from conversations.json"""
-    with open(conversations_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    stats = _run_stats
+    started = time.perf_counter() if stats else None
+    with open_compressed(conversations_path, 'rt') as f:
+        conversations = json.load(f)
+    if stats:
+        stats.inside['decode'] += time.perf_counter() - started
+        stats.counts['conversations_decoded'] += len(conversations)
+    return conversations
+
+
+def decode_conversation(raw) -> dict:
+    """Decode one conversation's raw JSON (str or bytes)"""
+    stats = _run_stats
+    if not stats:
+        return json.loads(raw)
+    started = time.perf_counter()
+    conv = json.loads(raw)
+    stats.inside['decode'] += time.perf_counter() - started
+    stats.counts['conversations_decoded'] += 1
+    return conv
+
+
+# Exports at or above this size are streamed unless --no-stream is given
+STREAM_THRESHOLD_BYTES = 256 * 1024 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+# A conversation still undecoded after this many characters is taken to be malformed
+STREAM_MAX_RECORD_SIZE = 256 * 1024 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+
+def iter_conversation_records(conversations_path: str, chunk_size: int = STREAM_CHUNK_SIZE,
+                              track_offsets: bool = True, max_record_size: int = STREAM_MAX_RECORD_SIZE):
+    """
+    Stream (offset, length, conversation) records from conversations.json.
+
+    Walks the top-level array with JSONDecoder.raw_decode over a sliding
+    read buffer, so only the conversation being decoded is held in memory.
+    A conversation larger than the buffer grows it geometrically until the
+    object fits. If it still does not decode once the buffer holds more
+    than max_record_size characters, a JSONDecodeError is raised instead
+    of reading on: a malformed element would otherwise pull the rest of
+    the file into memory before failing at the end.
+
+    offset and length are the byte span of the conversation object in the
+    file, or in its decompressed content for a .gz/.zst export (None when
+    track_offsets is False).
+    """
+    decoder = json.JSONDecoder()
+    stats = _run_stats
+    # newline='' keeps CRLF line endings as they are, so byte offsets match the file
+    with open_compressed(conversations_path, 'rt', newline='') as f:
+        buf = ''
+        pos = 0
+        eof = False
+        state = 'open'  # open -> first -> (value -> after)* -> done
+        count = 0
+        # Byte offset of buf[mark]; advanced lazily so each char is encoded once
+        mark = 0
+        mark_bytes = 0
+
+        while state != 'done':
+            pos = _WHITESPACE.match(buf, pos).end()
+
+            if pos == len(buf):
+                if eof:
+                    raise json.JSONDecodeError('Unexpected end of conversations array', buf, pos)
+                if track_offsets:
+                    mark_bytes += len(buf[mark:].encode('utf-8'))
+                    mark = 0
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = not buf
+                continue
+
+            ch = buf[pos]
+            if state == 'open':
+                if ch != '[':
+                    raise json.JSONDecodeError("Expecting '[' at start of conversations", buf, pos)
+                pos += 1
+                state = 'first'
+                continue
+            if state in ('first', 'after') and ch == ']':
+                state = 'done'
+                continue
+            if state == 'after':
+                if ch != ',':
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+                pos += 1
+                state = 'value'
+                continue
+
+            started = time.perf_counter() if stats else None
+            try:
+                conv, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            if stats:
+                stats.inside['decode'] += time.perf_counter() - started
+
+            if end is None or (end == len(buf) and not eof):
+                if len(buf) - pos > max_record_size:
+                    raise json.JSONDecodeError(
+                        f"Conversation {count + 1} is not valid JSON within {max_record_size:,} characters",
+                        buf, pos)
+                # Object runs past the buffer: keep its prefix and read more
+                if track_offsets:
+                    mark_bytes += len(buf[mark:pos].encode('utf-8'))
+                    mark = 0
+                more = f.read(max(chunk_size, len(buf) - pos))
+                buf = buf[pos:] + more
+                pos = 0
+                eof = not more
+                continue
+
+            offset = length = None
+            if track_offsets:
+                mark_bytes += len(buf[mark:pos].encode('utf-8'))
+                offset = mark_bytes
+                length = len(buf[pos:end].encode('utf-8'))
+                mark_bytes += length
+                mark = end
+
+            if stats:
+                stats.counts['conversations_decoded'] += 1
+            count += 1
+            yield offset, length, conv
+            pos = end
+            state = 'after'
+
+
+def iter_conversations(conversations_path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Stream conversations from conversations.json one at a time"""
+    for _, _, conv in iter_conversation_records(conversations_path, chunk_size, track_offsets=False):
+        yield conv
+
+
+# Memory maps of exports read by byte span, by path (see map_export)
+_export_maps = {}
+
+
+def map_export(conversations_path: str):
+    """
+    Memory-map an export for random access to conversation spans.
+
+    Each export is mapped once and shared. Slicing the map pages in only
+    the bytes of that conversation, so reading a few conversations out of
+    a multi-GB export costs about as much as their own size, and nothing
+    else of the file is copied into Python objects. A compressed export
+    cannot be mapped; it is decompressed once into an anonymous temporary
+    file, and that is mapped instead.
+    """
+    mm = _export_maps.get(conversations_path)
+    if mm is None:
+        if compression_of(conversations_path):
+            print(f"Decompressing {conversations_path} to a temporary file for random access...", file=sys.stderr)
+            with open_compressed(conversations_path, 'rb') as src, tempfile.TemporaryFile() as f:
+                shutil.copyfileobj(src, f, STREAM_CHUNK_SIZE)
+                f.flush()
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with open(conversations_path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _export_maps[conversations_path] = mm
+    return mm
+
+
+def read_conversation_bytes(conversations_path: str, offset: int, length: int) -> bytes:
+    """The raw JSON of one conversation, from its byte span in the export"""
+    return map_export(conversations_path)[offset:offset + length]
+
+
+def read_conversation_at(conversations_path: str, offset: int, length: int) -> dict:
+    """Decode a single conversation from its byte span in the export"""
+    return decode_conversation(read_conversation_bytes(conversations_path, offset, length))
+
+
+# Top-level conversation fields kept when streaming (everything the commands read)
+CONVERSATION_FIELDS = (
+    'id', 'title', 'create_time', 'update_time', 'gizmo_id', 'gizmo_type',
+    'default_model_slug', 'is_archived', 'memory_scope',
+)
+
+
+def slim_conversation(conv: dict, with_messages: bool = False, all_branches: bool = False,
+                      conv_filter=None) -> dict:
+    """
+    Reduce a conversation to the fields the commands use.
+
+    The mapping tree is replaced by its node count and, when messages are
+    requested, by the already-extracted message list (and branches).
+    """
+    slim = {k: conv.get(k) for k in CONVERSATION_FIELDS if k in conv}
+    slim['message_count'] = get_message_count(conv)
+    if with_messages:
+        slim['messages'] = get_conversation_messages(conv, conv_filter)
+        if all_branches:
+            slim['branches'] = get_conversation_branches(conv, conv_filter)
+    return slim
+
+
+def resolve_conversation(conv: dict) -> dict:
+    """
+    Get the full conversation behind a deferred slim conversation.
+
+    Deferred slims carry a 'span' (path, offset, length) instead of their
+    messages; the conversation is re-read from the export when needed.
+    Anything else is returned unchanged.
+    """
+    if 'span' not in conv:
+        return conv
+    return read_conversation_at(*conv['span'])
+
+
+def stream_conversations(conversations_path: str, keep=None, with_spans: bool = False) -> list:
+    """
+    Stream conversations.json into a list of slim conversations.
+
+    keep, if given, is a predicate on the raw conversation; rejected
+    conversations are dropped while scanning. with_spans records where each
+    conversation lives in the file so its messages can be extracted later
+    (see resolve_conversation) instead of being held in memory.
+    """
+    result = []
+    for offset, length, conv in iter_conversation_records(conversations_path, track_offsets=with_spans):
+        if keep is None or keep(conv):
+            slim = slim_conversation(conv)
+            if with_spans:
+                slim['span'] = (conversations_path, offset, length)
+            result.append(slim)
+    return result
+
+
+# Raw bytes handed to a worker per task, and tasks in flight per worker
+WORKER_BATCH_BYTES = 4 * 1024 * 1024
+WORKER_PENDING_PER_WORKER = 2
+
+
+def _read_spans(conversations_path: str, spans: list) -> list:
+    """Read conversations' raw bytes by span with plain reads (nothing is mapped into memory)"""
+    raws = []
+    with open(conversations_path, 'rb') as f:
+        for offset, length in spans:
+            f.seek(offset)
+            raws.append(f.read(length))
+    return raws
+
+
+def _summarize_batch(task) -> tuple:
+    """
+    Worker: decode raw conversations and serialize their summaries with messages.
+
+    The batch is either the conversations' raw bytes or, for an
+    uncompressed export, (path, spans) to read them from. Returns (texts,
+    stats), where stats holds the worker's timings and counts for the
+    batch when the parent is collecting them (else None).
+    """
+    global _run_stats
+    batch, all_branches, include_gizmo_id, conv_filter, indent, separators, collect_stats = task
+    _run_stats = RunStats() if collect_stats else None
+    raw_batch = batch if isinstance(batch, list) else _read_spans(*batch)
+    texts = []
+    for raw in raw_batch:
+        conv = decode_conversation(raw)
+        summary = extract_conversation_summary(conv, with_messages=True, all_branches=all_branches,
+                                               conv_filter=conv_filter)
+        if include_gizmo_id:
+            summary['gizmo_id'] = conv.get('gizmo_id')
+        started = time.perf_counter() if _run_stats else None
+        texts.append(json.dumps(summary, indent=indent, separators=separators))
+        if _run_stats:
+            _run_stats.inside['serialize'] += time.perf_counter() - started
+    stats = None
+    if _run_stats is not None:
+        stats = {'inside': dict(_run_stats.inside), 'counts': dict(_run_stats.counts)}
+    return texts, stats
+
+
+class SummaryPool:
+    """
+    Summarize deferred conversations in worker processes, in output order.
+
+    The parent ships batches of conversation spans; the workers read
+    them from the export, decode, extract and serialize. (A compressed
+    export can only be read through the parent's decompressed map, so
+    its raw bytes are shipped instead.) Serialized summaries come back in
+    submission order and are written as they arrive, with a bounded
+    number of batches in flight, so neither the parent nor the workers
+    ever hold more than a few batches.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.pool = multiprocessing.Pool(workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.pool.close()
+        else:
+            self.pool.terminate()
+        self.pool.join()
+
+    def summaries(self, convs: list, out, all_branches: bool = False, include_gizmo_id: bool = False,
+                  conv_filter=None):
+        """Yield the summaries of deferred slim conversations, serialized for the writer out"""
+        collect_stats = _run_stats is not None
+        # Split small groups too, so every worker gets a share
+        limit = min(WORKER_BATCH_BYTES, max(1, sum(conv['span'][2] for conv in convs) // self.workers))
+        pending = deque()
+        batch = []
+        batch_bytes = 0
+        for i, conv in enumerate(convs):
+            path, offset, length = conv['span']
+            compressed = compression_of(path) is not None
+            batch.append(read_conversation_bytes(path, offset, length) if compressed else (offset, length))
+            batch_bytes += length
+            if batch_bytes >= limit or i == len(convs) - 1:
+                # Spans are only batched together within one export, as convs all come from one
+                task = batch if compressed else (path, batch)
+                pending.append(self.pool.apply_async(_summarize_batch, ((
+                    task, all_branches, include_gizmo_id, conv_filter, out.indent, out.separators, collect_stats),)))
+                batch = []
+                batch_bytes = 0
+                while len(pending) > self.workers * WORKER_PENDING_PER_WORKER:
+                    yield from self._collect(pending.popleft())
+        while pending:
+            yield from self._collect(pending.popleft())
+
+    def _collect(self, res) -> list:
+        texts, stats = res.get()
+        if stats:
+            _run_stats.merge_worker(stats)
+        return texts
+
+
+INDEX_VERSION = 3
+INDEX_BATCH_SIZE = 1000
+
+# Columns of the index's conversations table, in slim-conversation order
+INDEX_COLUMNS = (
+    'id', 'title', 'create_time', 'update_time', 'gizmo_id', 'gizmo_type',
+    'default_model_slug', 'is_archived', 'memory_scope', 'message_count',
+)
+
+
+def default_index_path(conversations_path: str) -> str:
+    """Sidecar index path for a conversations.json"""
+    return conversations_path + '.index.sqlite'
+
+
+def _source_fingerprint(conversations_path: str) -> dict:
+    st = os.stat(conversations_path)
+    return {'source_size': str(st.st_size), 'source_mtime_ns': str(st.st_mtime_ns)}
+
+
+def build_conversation_index(conversations_path: str, index_path: str) -> int:
+    """
+    Build the sidecar index for conversations.json.
+
+    Streams the export once and records each conversation's byte span plus
+    the scalar metadata the listing commands need. The index is written to
+    a temporary file and moved into place, so readers never see a partial
+    index. Returns the number of conversations indexed.
+    """
+    tmp_path = index_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    fingerprint = _source_fingerprint(conversations_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript('''
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE conversations (
+                seq INTEGER PRIMARY KEY,
+                id TEXT,
+                title TEXT,
+                create_time,
+                update_time,
+                gizmo_id TEXT,
+                gizmo_type TEXT,
+                default_model_slug TEXT,
+                is_archived INTEGER,
+                memory_scope TEXT,
+                message_count INTEGER,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+        ''')
+        insert = (
+            f"INSERT INTO conversations (seq, {', '.join(INDEX_COLUMNS)}, offset, length) "
+            f"VALUES ({', '.join('?' * (len(INDEX_COLUMNS) + 3))})"
+        )
+
+        count = 0
+        batch = []
+        for offset, length, conv in iter_conversation_records(conversations_path):
+            slim = slim_conversation(conv)
+            row = [count] + [slim.get(col) for col in INDEX_COLUMNS] + [offset, length]
+            row[1 + INDEX_COLUMNS.index('is_archived')] = conv.get('is_archived', False)
+            batch.append(row)
+            count += 1
+            if len(batch) >= INDEX_BATCH_SIZE:
+                conn.executemany(insert, batch)
+                batch = []
+        if batch:
+            conn.executemany(insert, batch)
+
+        conn.execute('CREATE INDEX conversations_gizmo_id ON conversations (gizmo_id)')
+        conn.execute('CREATE INDEX conversations_id ON conversations (id)')
+        meta = dict(fingerprint)
+        meta.update({
+            'version': str(INDEX_VERSION),
+            'source_path': os.path.abspath(conversations_path),
+            'built_at': datetime.now().isoformat(),
+            'conversation_count': str(count),
+        })
+        conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', meta.items())
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, index_path)
+    return count
+
+
+def open_conversation_index(index_path: str, conversations_path: str, build: bool = False):
+    """
+    Open the sidecar index if it exists and matches conversations.json.
+
+    Returns a sqlite3 connection, or None when there is no index. A stale
+    index (export replaced since it was built) is reported and ignored.
+    With build, a missing or stale index is (re)built first instead.
+    """
+    conn = _open_current_index(index_path, conversations_path, warn=not build)
+    if conn is None and build:
+        print(f"Indexing: {conversations_path}", file=sys.stderr)
+        build_conversation_index(conversations_path, index_path)
+        conn = _open_current_index(index_path, conversations_path, warn=True)
+    return conn
+
+
+def _open_current_index(index_path: str, conversations_path: str, warn: bool = True):
+    if not os.path.exists(index_path):
+        return None
+
+    conn = sqlite3.connect(index_path)
+    try:
+        meta = dict(conn.execute('SELECT key, value FROM meta'))
+    except sqlite3.DatabaseError:
+        conn.close()
+        if warn:
+            print(f"Warning: ignoring unreadable index {index_path}", file=sys.stderr)
+        return None
+
+    current = _source_fingerprint(conversations_path)
+    if meta.get('version') != str(INDEX_VERSION) or any(meta.get(k) != v for k, v in current.items()):
+        conn.close()
+        if warn:
+            print(f"Warning: index {index_path} is out of date; run the 'index' command to rebuild it",
+                  file=sys.stderr)
+        return None
+
+    return conn
+
+
+def load_indexed_conversations(conn, conversations_path: str, gizmo_id=..., with_spans: bool = False) -> list:
+    """
+    Load slim conversations from the index.
+
+    gizmo_id restricts the result to one project (pass None for
+    non-project conversations; omit it for all). with_spans attaches each
+    conversation's byte span so messages can be read back on demand.
+    """
+    query = f"SELECT {', '.join(INDEX_COLUMNS)}, offset, length FROM conversations"
+    params = ()
+    if gizmo_id is None:
+        query += ' WHERE gizmo_id IS NULL'
+    elif gizmo_id is not ...:
+        query += ' WHERE gizmo_id = ?'
+        params = (gizmo_id,)
+    query += ' ORDER BY seq'
+
+    conversations = []
+    for row in conn.execute(query, params):
+        conv = dict(zip(INDEX_COLUMNS, row))
+        if conv['is_archived'] is not None:
+            conv['is_archived'] = bool(conv['is_archived'])
+        if with_spans:
+            conv['span'] = (conversations_path, row[-2], row[-1])
+        conversations.append(conv)
+    return conversations
 
 
 def build_project_lookup(projects: list) -> dict:
@@ -101,82 +795,187 @@ def format_date(ts) -> str:
 
 def get_message_count(conv: dict) -> int:
     """Get count of messages/nodes in a conversation"""
+    if 'mapping' not in conv and 'message_count' in conv:
+        # Slim conversation from stream_conversations()
+        return conv['message_count']
     mapping = conv.get('mapping', {})
     return len(mapping) if mapping else 0
 
 
-def extract_messages_from_mapping(mapping: dict) -> list:
+def get_conversation_messages(conv: dict, conv_filter=None) -> list:
+    """Get the extracted messages of a conversation (raw or slim), keeping those conv_filter accepts"""
+    if 'mapping' not in conv and 'messages' in conv:
+        # Slims are extracted with the run's filter already applied
+        return conv['messages']
+    keep = conv_filter.message_predicate(conv) if conv_filter is not None else None
+    return extract_messages_from_mapping(conv.get('mapping', {}), conv.get('current_node'), keep)
+
+
+def get_conversation_branches(conv: dict, conv_filter=None) -> list:
+    """Get the abandoned-branch messages of a conversation (raw or slim), keeping those conv_filter accepts"""
+    if 'mapping' not in conv and 'branches' in conv:
+        return conv['branches']
+    keep = conv_filter.message_predicate(conv) if conv_filter is not None else None
+    return extract_message_branches(conv.get('mapping', {}), conv.get('current_node'), keep)
+
+
+def message_from_node(node: dict, keep=None):
+    """
+    Build a message dict from a mapping node, or None if it has no text.
+
+    keep, if given, is a predicate on the raw message (see
+    ConversationFilter.message_predicate); rejected messages return None
+    before any text is extracted.
+    """
+    msg = node.get('message')
+    if not msg or not msg.get('content'):
+        return None
+    if keep is not None and not keep(msg):
+        return None
+
+    content = msg.get('content', {})
+    parts = content.get('parts', [])
+
+    # Extract text content
+    text_parts = []
+    for part in parts:
+        if isinstance(part, str):
+            text_parts.append(part)
+        elif isinstance(part, dict):
+            # Handle structured content (e.g., code blocks, images)
+            if 'text' in part:
+                text_parts.append(part['text'])
+
+    text = '\n'.join(text_parts) if text_parts else ''
+
+    if not text.strip():  # Only include non-empty messages
+        return None
+
+    return {
+        'id': msg.get('id'),
+        'role': (msg.get('author') or {}).get('role', 'unknown'),
+        'content': text,
+        'create_time': msg.get('create_time'),
+        'model': (msg.get('metadata') or {}).get('model_slug'),
+    }
+
+
+def find_current_branch(mapping: dict, current_node=None) -> list:
+    """
+    Get the node IDs of the conversation's current branch, root first.
+
+    Walks parent links up from current_node, so the cost is the length of
+    the branch rather than the size of the tree. Without a usable
+    current_node, follows the latest child from the root instead.
+    """
+    if not mapping:
+        return []
+
+    path = []
+    seen = set()
+
+    if current_node in mapping:
+        node_id = current_node
+        while node_id in mapping and node_id not in seen:
+            seen.add(node_id)
+            path.append(node_id)
+            node_id = mapping[node_id].get('parent')
+        path.reverse()
+        return path
+
+    node_id = next((nid for nid, node in mapping.items() if node.get('parent') not in mapping), None)
+    while node_id in mapping and node_id not in seen:
+        seen.add(node_id)
+        path.append(node_id)
+        children = mapping[node_id].get('children') or []
+        node_id = children[-1] if children else None
+    return path
+
+
+def extract_messages_from_mapping(mapping: dict, current_node=None, keep=None) -> list:
     """
-    Extract messages from conversation mapping in chronological order.
+    Extract messages on the conversation's current branch in chronological order.
 
     The mapping is a tree structure where each node has:
     - id: node ID
     - parent: parent node ID
     - children: list of child node IDs
     - message: the actual message content (may be None for root nodes)
+
+    Regenerations and edits add sibling branches; only the branch ending at
+    current_node (what the ChatGPT UI shows) is extracted. keep filters the
+    raw messages (see message_from_node).
+    """
+    stats = _run_stats
+    started = time.perf_counter() if stats else None
+    messages = []
+    branch = find_current_branch(mapping, current_node)
+    for node_id in branch:
+        message = message_from_node(mapping[node_id], keep)
+        if message:
+            messages.append(message)
+    if stats:
+        stats.inside['extract'] += time.perf_counter() - started
+        stats.counts['nodes_visited'] += len(branch)
+        stats.counts['messages'] += len(messages)
+    return messages
+
+
+def extract_message_branches(mapping: dict, current_node=None, keep=None) -> list:
+    """
+    Extract the messages on abandoned branches as a compact tree.
+
+    Returns every message that is not on the current branch, in depth-first
+    order, each with a 'parent' key holding the ID of its nearest ancestor
+    message (None at the top). Together with the current-branch messages
+    this is enough to rebuild the whole conversation tree. With keep,
+    'parent' is the nearest ancestor message that was kept.
     """
     if not mapping:
         return []
 
-    messages = []
+    stats = _run_stats
+    started = time.perf_counter() if stats else None
+    current = set(find_current_branch(mapping, current_node))
 
-    # Build parent->children lookup and find root
     children_map = defaultdict(list)
-    root_id = None
-
+    roots = []
     for node_id, node in mapping.items():
         parent_id = node.get('parent')
-        if parent_id is None:
-            root_id = node_id
-        else:
+        if parent_id in mapping:
             children_map[parent_id].append(node_id)
+        else:
+            roots.append(node_id)
+
+    branches = []
+    stack = [(node_id, None) for node_id in reversed(roots)]
+    while stack:
+        node_id, parent_message_id = stack.pop()
+        message = message_from_node(mapping[node_id], keep)
+        if message:
+            if node_id not in current:
+                message['parent'] = parent_message_id
+                branches.append(message)
+            parent_message_id = message['id']
+        for child_id in reversed(children_map.get(node_id, [])):
+            stack.append((child_id, parent_message_id))
+
+    if stats:
+        stats.inside['extract'] += time.perf_counter() - started
+        stats.counts['nodes_visited'] += len(mapping)
+        stats.counts['branch_messages'] += len(branches)
+    return branches
+
+
+def extract_conversation_summary(conv: dict, with_messages: bool = False, all_branches: bool = False,
+                                 conv_filter=None) -> dict:
+    """
+    Extract summary of a conversation, optionally with full messages.
 
-    # Traverse tree in order (DFS following first child path for linear conversation)
-    def traverse(node_id):
-        if node_id not in mapping:
-            return
-
-        node = mapping[node_id]
-        msg = node.get('message')
-
-        if msg and msg.get('content'):
-            content = msg.get('content', {})
-            parts = content.get('parts', [])
-
-            # Extract text content
-            text_parts = []
-            for part in parts:
-                if isinstance(part, str):
-                    text_parts.append(part)
-                elif isinstance(part, dict):
-                    # Handle structured content (e.g., code blocks, images)
-                    if 'text' in part:
-                        text_parts.append(part['text'])
-
-            text = '\n'.join(text_parts) if text_parts else ''
-
-            if text.strip():  # Only include non-empty messages
-                messages.append({
-                    'id': msg.get('id'),
-                    'role': (msg.get('author') or {}).get('role', 'unknown'),
-                    'content': text,
-                    'create_time': msg.get('create_time'),
-                    'model': (msg.get('metadata') or {}).get('model_slug'),
-                })
-
-        # Follow children (for branching conversations, follow main path)
-        children = children_map.get(node_id, [])
-        for child_id in children:
-            traverse(child_id)
-
-    if root_id:
-        traverse(root_id)
-
-    return messages
-
-
-def extract_conversation_summary(conv: dict, with_messages: bool = False) -> dict:
-    """Extract summary of a conversation, optionally with full messages"""
+    all_branches adds a 'branches' list with the messages of abandoned
+    branches (see extract_message_branches). conv_filter drops the
+    messages it rejects; message_count still counts the whole mapping.
+    """
     summary = {
         'id': conv.get('id'),
         'title': conv.get('title'),
@@ -189,38 +988,131 @@ def extract_conversation_summary(conv: dict, with_messages: bool = False) -> dic
     }
 
     if with_messages:
-        mapping = conv.get('mapping', {})
-        summary['messages'] = extract_messages_from_mapping(mapping)
+        conv = resolve_conversation(conv)
+        summary['messages'] = get_conversation_messages(conv, conv_filter)
+        if all_branches:
+            summary['branches'] = get_conversation_branches(conv, conv_filter)
 
     return summary
 
 
-def cmd_list_projects(projects: list, conversations_grouped: dict):
-    """List all projects with conversation counts and date ranges"""
+class ConversationFilter:
+    """
+    Conversation and message predicates for list and the export commands.
+
+    Conversation predicates (date window, archived, title) work on raw,
+    slim and indexed conversations alike, so they run while the export is
+    scanned and rejected conversations are never extracted. Message
+    predicates (role, model, date window) run on the raw message before
+    message_from_node builds anything for it.
+
+    The window [since, until) keeps conversations updated on or after
+    since and created before until, and messages created inside it. A
+    message without a model or timestamp falls back to the conversation's
+    default model and create_time, as in search.
+    """
+
+    def __init__(self, since: float = None, until: float = None, role: str = None, model: str = None,
+                 archived: bool = None, title: str = None):
+        self.since = since
+        self.until = until
+        self.role = role
+        self.model = model
+        self.archived = archived
+        self.title = title
+        self._title = re.compile(title, re.IGNORECASE) if title else None
+
+    @classmethod
+    def from_args(cls, args):
+        """The filter given on the command line, or None if no filter option was used"""
+        conv_filter = cls(since=getattr(args, 'since', None), until=getattr(args, 'until', None),
+                          role=getattr(args, 'role', None), model=getattr(args, 'model', None),
+                          archived=getattr(args, 'archived', None), title=getattr(args, 'title', None))
+        return conv_filter if any(v is not None for v in conv_filter.options().values()) else None
+
+    def options(self) -> dict:
+        return {'since': self.since, 'until': self.until, 'role': self.role, 'model': self.model,
+                'archived': self.archived, 'title': self.title}
+
+    def accepts(self, conv: dict) -> bool:
+        """Whether a conversation passes the conversation predicates"""
+        if self.archived is not None and bool(conv.get('is_archived')) != self.archived:
+            return False
+        if self.since is not None and (conv.get('update_time') or conv.get('create_time') or 0) < self.since:
+            return False
+        if self.until is not None and (conv.get('create_time') or 0) >= self.until:
+            return False
+        if self._title is not None and not self._title.search(conv.get('title') or ''):
+            return False
+        return True
+
+    def message_predicate(self, conv: dict):
+        """A keep(raw_message) predicate for conv's messages, or None when messages are not filtered"""
+        if self.role is None and self.model is None and self.since is None and self.until is None:
+            return None
+        role, model, since, until = self.role, self.model, self.since, self.until
+        default_model = conv.get('default_model_slug')
+        default_time = conv.get('create_time') or 0
+
+        def keep(msg: dict) -> bool:
+            if role is not None and (msg.get('author') or {}).get('role', 'unknown') != role:
+                return False
+            if model is not None and ((msg.get('metadata') or {}).get('model_slug') or default_model) != model:
+                return False
+            if since is not None or until is not None:
+                created = msg.get('create_time') or default_time
+                if (since is not None and created < since) or (until is not None and created >= until):
+                    return False
+            return True
+        return keep
+
+
+def add_filter_arguments(parser):
+    """Filter options shared by list and the export commands"""
+    group = parser.add_argument_group('filters')
+    group.add_argument('--since', type=parse_date_arg,
+                       help='Only conversations updated on or after this date, and their messages from then on '
+                            '(YYYY-MM-DD)')
+    group.add_argument('--until', type=parse_date_arg,
+                       help='Only conversations created before this date, and their messages before it (YYYY-MM-DD)')
+    group.add_argument('--role', help='Only messages from this role (user, assistant, tool, ...)')
+    group.add_argument('--model', help='Only messages from this model (e.g. gpt-4o)')
+    group.add_argument('--archived', dest='archived', action='store_const', const=True, default=None,
+                       help='Only archived conversations')
+    group.add_argument('--no-archived', dest='archived', action='store_const', const=False,
+                       help='Only conversations that are not archived')
+    group.add_argument('--title', type=title_regex_arg, metavar='REGEX',
+                       help='Only conversations whose title matches this regular expression (case-insensitive)')
+
+
+def title_regex_arg(value: str) -> str:
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"invalid regular expression '{value}': {e}")
+    return value
+
+
+def cmd_list_projects(projects: list, conversations_grouped: dict = None, aggregates: dict = None):
+    """
+    List all projects with conversation counts and date ranges.
+
+    aggregates maps gizmo_id to (count, earliest create_time, latest
+    update_time), e.g. from ConversationColumns.project_aggregates();
+    without it they are computed from conversations_grouped.
+    """
+    if aggregates is None:
+        aggregates = grouped_aggregates(conversations_grouped)
+
     print(f"{'Project Name':<35} {'Convs':>6} {'Interactions':>12} {'First':>12} {'Last':>12}")
     print("-" * 80)
 
     # Sort by conversation count descending
+    # First: earliest create_time (when first conversation started)
+    # Last: latest update_time (when last conversation was updated)
     project_data = []
     for p in projects:
-        pid = p.get('project_id')
-        convs = conversations_grouped.get(pid, [])
-        conv_count = len(convs)
-        
-        # Find first and last conversation dates
-        first_date = None
-        last_date = None
-        if convs:
-            # First: earliest create_time (when first conversation started)
-            # Last: latest update_time (when last conversation was updated)
-            create_times = [c.get('create_time') for c in convs if c.get('create_time')]
-            update_times = [c.get('update_time') for c in convs if c.get('update_time')]
-            
-            if create_times:
-                first_date = min(create_times)
-            if update_times:
-                last_date = max(update_times)
-        
+        conv_count, first_date, last_date = aggregates.get(p.get('project_id'), (0, None, None))
         project_data.append((p, conv_count, first_date, last_date))
 
     project_data.sort(key=lambda x: x[1], reverse=True)
@@ -233,12 +1125,193 @@ def cmd_list_projects(projects: list, conversations_grouped: dict):
         print(f"{name:<35} {conv_count:>6} {interactions:>12} {first_str:>12} {last_str:>12}")
 
     # Summary
-    total_project_convs = sum(len(v) for k, v in conversations_grouped.items() if k is not None)
-    non_project_convs = len(conversations_grouped.get(None, []))
+    total_project_convs = sum(agg[0] for k, agg in aggregates.items() if k is not None)
+    non_project_convs = aggregates.get(None, (0,))[0]
     print("-" * 80)
     print(f"Total: {len(projects)} projects, {total_project_convs} project conversations, {non_project_convs} non-project conversations")
 
 
+COLUMNS_MAGIC = b'MEMSPAN-COLUMNS\n'
+# Bump when the column file layout changes; older files are rebuilt
+COLUMNS_VERSION = 1
+
+
+def default_columns_path(conversations_path: str) -> str:
+    """Column cache path for a conversations.json"""
+    return conversations_path + '.columns'
+
+
+def _timestamp_or_nan(value) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else math.nan
+
+
+class ConversationColumns:
+    """
+    Scalar conversation metadata held as columns instead of dicts.
+
+    gizmo holds each conversation's gizmo_id as an index into gizmo_ids
+    (0 is None); create_time and update_time are float columns with NaN
+    where the export has no timestamp. Columns are array.array, or NumPy
+    arrays viewing the same bytes when NumPy is installed. IDs are kept as
+    one encoded blob and only split when asked for.
+    """
+
+    def __init__(self, gizmo_ids: list, gizmo, create_time, update_time, ids_blob: bytes):
+        self.gizmo_ids = gizmo_ids
+        self.gizmo = gizmo
+        self.create_time = create_time
+        self.update_time = update_time
+        self._ids_blob = ids_blob
+
+    def __len__(self):
+        return len(self.gizmo)
+
+    @property
+    def ids(self) -> list:
+        return self._ids_blob.decode('utf-8').split('\n') if len(self) else []
+
+    @classmethod
+    def from_records(cls, records) -> 'ConversationColumns':
+        """Build from (id, gizmo_id, create_time, update_time) tuples"""
+        codes = {None: 0}
+        gizmo = array('i')
+        create_time = array('d')
+        update_time = array('d')
+        ids = []
+        for conv_id, gizmo_id, created, updated in records:
+            code = codes.get(gizmo_id)
+            if code is None:
+                code = codes[gizmo_id] = len(codes)
+            gizmo.append(code)
+            create_time.append(_timestamp_or_nan(created))
+            update_time.append(_timestamp_or_nan(updated))
+            ids.append((conv_id or '').replace('\n', ' '))
+        return cls._with_columns(list(codes), gizmo, create_time, update_time, '\n'.join(ids).encode('utf-8'))
+
+    @classmethod
+    def _with_columns(cls, gizmo_ids, gizmo, create_time, update_time, ids_blob) -> 'ConversationColumns':
+        if np is not None:
+            gizmo = np.frombuffer(gizmo, dtype=np.int32)
+            create_time = np.frombuffer(create_time, dtype=np.float64)
+            update_time = np.frombuffer(update_time, dtype=np.float64)
+        return cls(gizmo_ids, gizmo, create_time, update_time, ids_blob)
+
+    def save(self, path: str, fingerprint: dict):
+        """
+        Write the columns to a compact binary file.
+
+        The file is a magic line, a JSON header line (fingerprint, row
+        count, gizmo_id table, byte order), then the raw column bytes.
+        """
+        header = dict(fingerprint, version=COLUMNS_VERSION, count=len(self), gizmo_ids=self.gizmo_ids,
+                      byteorder=sys.byteorder)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(COLUMNS_MAGIC)
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            for column in (self.gizmo, self.create_time, self.update_time):
+                f.write(column.tobytes())
+            f.write(self._ids_blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: dict):
+        """Read a column file, or return None if it is missing, unreadable or out of date"""
+        try:
+            with open(path, 'rb') as f:
+                if f.readline() != COLUMNS_MAGIC:
+                    return None
+                header = json.loads(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if (header.get('version') != COLUMNS_VERSION or header.get('byteorder') != sys.byteorder
+                or any(header.get(k) != v for k, v in fingerprint.items())):
+            return None
+
+        count = header['count']
+        gizmo = array('i')
+        create_time = array('d')
+        update_time = array('d')
+        pos = 0
+        for column in (gizmo, create_time, update_time):
+            size = count * column.itemsize
+            column.frombytes(data[pos:pos + size])
+            pos += size
+        if len(update_time) != count:
+            return None
+        return cls._with_columns(header['gizmo_ids'], gizmo, create_time, update_time, data[pos:])
+
+    def project_aggregates(self) -> dict:
+        """
+        Per-gizmo_id (conversation count, earliest create_time, latest
+        update_time), with None for a missing date.
+        """
+        groups = len(self.gizmo_ids)
+        if np is not None:
+            counts = np.bincount(self.gizmo, minlength=groups)
+            first = np.full(groups, np.inf)
+            last = np.full(groups, -np.inf)
+            # fmin/fmax skip NaN, like the list-based version skipped missing times
+            np.fmin.at(first, self.gizmo, self.create_time)
+            np.fmax.at(last, self.gizmo, self.update_time)
+            counts, first, last = counts.tolist(), first.tolist(), last.tolist()
+        else:
+            counts = [0] * groups
+            first = [math.inf] * groups
+            last = [-math.inf] * groups
+            for code, created, updated in zip(self.gizmo, self.create_time, self.update_time):
+                counts[code] += 1
+                if created < first[code]:
+                    first[code] = created
+                if updated > last[code]:
+                    last[code] = updated
+        return {
+            gizmo_id: (counts[code], first[code] if first[code] != math.inf else None,
+                       last[code] if last[code] != -math.inf else None)
+            for code, gizmo_id in enumerate(self.gizmo_ids) if counts[code]
+        }
+
+
+def load_conversation_columns(conversations_path: str, columns_path: str, index=None,
+                              save: bool = False) -> ConversationColumns:
+    """
+    Load the column cache for conversations.json if it is up to date.
+
+    Otherwise the columns are built from the sidecar index when one is
+    open (no JSON decoding at all), or by streaming the export once. They
+    are only written to columns_path with save, so read-only commands
+    leave nothing next to the export unless asked to.
+    """
+    fingerprint = _source_fingerprint(conversations_path)
+    columns = ConversationColumns.load(columns_path, fingerprint)
+    if columns is not None:
+        return columns
+
+    if save:
+        print(f"Building column cache: {columns_path}", file=sys.stderr)
+    if index is not None:
+        records = index.execute('SELECT id, gizmo_id, create_time, update_time FROM conversations ORDER BY seq')
+    else:
+        records = ((conv.get('id'), conv.get('gizmo_id'), conv.get('create_time'), conv.get('update_time'))
+                   for conv in iter_conversations(conversations_path))
+    columns = ConversationColumns.from_records(records)
+    if save:
+        columns.save(columns_path, fingerprint)
+    return columns
+
+
+def grouped_aggregates(conversations_grouped: dict) -> dict:
+    """Per-gizmo_id (count, earliest create_time, latest update_time) from grouped conversation dicts"""
+    aggregates = {}
+    for gizmo_id, convs in conversations_grouped.items():
+        create_times = [c.get('create_time') for c in convs if c.get('create_time')]
+        update_times = [c.get('update_time') for c in convs if c.get('update_time')]
+        aggregates[gizmo_id] = (len(convs), min(create_times) if create_times else None,
+                                max(update_times) if update_times else None)
+    return aggregates
+
+
 def find_project(project_query: str, projects: list):
     """Find a project by ID, name, or partial name match"""
     by_id, by_name = build_project_lookup(projects)
@@ -256,7 +1329,14 @@ def find_project(project_query: str, projects: list):
     return project
 
 
-def cmd_list_conversations(project_query: str, projects: list, conversations_grouped: dict, with_messages: bool = False):
+def safe_project_name(project: dict) -> str:
+    """File-name-safe form of a project's name (lowercase, other characters replaced by '_')"""
+    safe_name = (project.get('name') or 'project').lower()
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in safe_name)
+
+
+def cmd_list_conversations(project_query: str, projects: list, conversations_grouped: dict, with_messages: bool = False,
+                           conv_filter=None):
     """List conversations for a specific project"""
     project = find_project(project_query, projects)
 
@@ -298,7 +1378,7 @@ def cmd_list_conversations(project_query: str, projects: list, conversations_gro
 
         if with_messages:
             print()
-            messages = extract_messages_from_mapping(conv.get('mapping', {}))
+            messages = get_conversation_messages(resolve_conversation(conv), conv_filter)
             for msg in messages:
                 role = msg.get('role', 'unknown').upper()
                 content = msg.get('content', '')
@@ -316,243 +1396,564 @@ def cmd_list_conversations(project_query: str, projects: list, conversations_gro
             print("-" * 80)
 
 
-def cmd_export(projects: list, conversations: list, conversations_grouped: dict, output_path: str, with_messages: bool = False):
-    """Export project_conversations.json with full mapping"""
-    by_id, _ = build_project_lookup(projects)
-
-    if with_messages:
-        print("Exporting with full messages (this may take a while and produce a large file)...")
+class ExportManifest:
+    """
+    Manifest of previously exported conversations, for incremental exports.
+
+    Stores each conversation's update_time, a hash of its raw bytes in
+    conversations.json and its summary, serialized as the output writes
+    it. A conversation whose update_time and hash are unchanged is copied
+    from the manifest verbatim, without being decoded, re-extracted or
+    re-serialized. Conversations no longer in the export are dropped when
+    the manifest is closed.
+    """
 
-    result = {
-        'generated_at': datetime.now().isoformat(),
-        'summary': {
-            'total_projects': len(projects),
-            'total_conversations': len(conversations),
-            'project_conversations': 0,
-            'non_project_conversations': 0,
-        },
-        'projects': [],
-        'non_project_conversations': [],
-    }
+    def __init__(self, manifest_path: str, options: dict):
+        self.conn = sqlite3.connect(manifest_path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                update_time,
+                content_hash TEXT,
+                with_gizmo_id INTEGER,
+                summary TEXT
+            );
+            CREATE TEMP TABLE seen (id TEXT PRIMARY KEY);
+        ''')
+        # Summaries extracted with different options cannot be reused
+        options_json = json.dumps(options, sort_keys=True)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'options'").fetchone()
+        if not row or row[0] != options_json:
+            self.conn.execute('DELETE FROM conversations')
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('options', ?)", (options_json,))
+        self.reused = 0
+        self.extracted = 0
+
+    def summarize(self, conv: dict, serialize, all_branches: bool = False, include_gizmo_id: bool = False,
+                  conv_filter=None) -> str:
+        """
+        The serialized summary of a deferred slim conversation (with
+        messages), reused from the manifest when unchanged. serialize is
+        the output writer's serialize method.
+        """
+        raw = read_conversation_bytes(*conv['span'])
+        content_hash = hashlib.sha256(raw).hexdigest()
+
+        conv_id = conv.get('id')
+        self.conn.execute('INSERT OR IGNORE INTO seen (id) VALUES (?)', (conv_id,))
+        row = self.conn.execute(
+            'SELECT update_time, content_hash, with_gizmo_id, summary FROM conversations WHERE id = ?', (conv_id,)
+        ).fetchone()
+        if row and row[0] == conv.get('update_time') and row[1] == content_hash and row[2] == include_gizmo_id:
+            self.reused += 1
+            return row[3]
+
+        summary = extract_conversation_summary(decode_conversation(raw), with_messages=True, all_branches=all_branches,
+                                               conv_filter=conv_filter)
+        if include_gizmo_id:
+            summary['gizmo_id'] = conv.get('gizmo_id')
+        text = serialize(summary)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO conversations (id, update_time, content_hash, with_gizmo_id, summary) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (conv_id, conv.get('update_time'), content_hash, include_gizmo_id, text)
+        )
+        self.extracted += 1
+        return text
 
-    # Process each project
-    for project in projects:
-        pid = project.get('project_id')
-        convs = conversations_grouped.get(pid, [])
-
-        project_entry = {
-            'project_id': pid,
-            'name': project.get('name'),
-            'short_url': project.get('short_url'),
-            'created_at': project.get('created_at'),
-            'updated_at': project.get('updated_at'),
-            'last_interacted_at': project.get('last_interacted_at'),
-            'num_interactions': project.get('num_interactions'),
-            'memory_enabled': project.get('memory_enabled'),
-            'memory_scope': project.get('memory_scope'),
-            'conversation_count': len(convs),
-            'conversations': [extract_conversation_summary(c, with_messages=with_messages) for c in convs],
-        }
-        result['projects'].append(project_entry)
-        result['summary']['project_conversations'] += len(convs)
+    def close(self):
+        """Drop conversations that were not seen in this export and save the manifest"""
+        # A run that summarized nothing through the manifest says nothing about what to drop
+        if self.reused or self.extracted:
+            self.conn.execute('DELETE FROM conversations WHERE id NOT IN (SELECT id FROM seen)')
+        self.conn.commit()
+        self.conn.close()
 
-    # Sort projects by conversation count descending
-    result['projects'].sort(key=lambda p: p['conversation_count'], reverse=True)
 
-    # Handle non-project conversations
-    non_project = conversations_grouped.get(None, [])
-    result['summary']['non_project_conversations'] = len(non_project)
+# Bump when extraction or the stored summaries change so older manifests are not reused
+MANIFEST_VERSION = 2
 
-    # Group non-project conversations by gizmo_type (custom GPTs vs regular chats)
-    gpt_convs = []
-    regular_convs = []
 
-    for conv in non_project:
-        summary = extract_conversation_summary(conv, with_messages=with_messages)
-        gizmo_type = conv.get('gizmo_type')
-        if gizmo_type == 'gpt':
-            summary['gizmo_id'] = conv.get('gizmo_id')
-            gpt_convs.append(summary)
-        else:
-            regular_convs.append(summary)
-
-    result['non_project_conversations'] = {
-        'custom_gpt_conversations': {
-            'count': len(gpt_convs),
-            'description': 'Conversations with custom GPTs (not projects)',
-            'conversations': gpt_convs,
-        },
-        'regular_conversations': {
-            'count': len(regular_convs),
-            'description': 'Regular ChatGPT conversations (no project or custom GPT)',
-            'conversations': regular_convs,
-        },
-    }
+def default_manifest_path(output_path: str) -> str:
+    """Manifest path for an export output file"""
+    return output_path + '.manifest.sqlite'
 
-    # Also capture orphaned project conversations (in history but project not in projects.json)
-    orphaned = []
-    for gizmo_id, convs in conversations_grouped.items():
-        if gizmo_id is not None and gizmo_id not in by_id:
-            # Check if it's a project ID pattern
-            if gizmo_id.startswith('g-p-'):
-                for conv in convs:
-                    summary = extract_conversation_summary(conv, with_messages=with_messages)
-                    summary['gizmo_id'] = gizmo_id
-                    orphaned.append(summary)
 
-    if orphaned:
-        result['orphaned_project_conversations'] = {
-            'count': len(orphaned),
-            'description': 'Conversations linked to projects not in projects.json (possibly deleted)',
-            'conversations': orphaned,
-        }
+def open_export_manifest(output_path: str, incremental: bool, with_messages: bool = True, all_branches: bool = False,
+                         conv_filter=None, output_format: str = 'json', compact: bool = False):
+    """
+    Open the manifest next to output_path for an incremental export (None otherwise).
 
-    # Write output
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2)
+    Only summaries with messages are worth reusing, so an export without
+    them neither uses nor touches the manifest. Summaries are stored as
+    the output writes them, so the output format is part of the options.
+    """
+    if not incremental:
+        return None
+    if not with_messages:
+        print("Note: --incremental only applies to exports with messages; the manifest is left as it is",
+              file=sys.stderr)
+        return None
+    return ExportManifest(default_manifest_path(output_path),
+                          {'version': MANIFEST_VERSION, 'with_messages': with_messages, 'all_branches': all_branches,
+                           'filter': conv_filter.options() if conv_filter is not None else None,
+                           'output': 'jsonl' if output_format == 'jsonl' else 'compact' if compact else 'indent'})
+
+
+def close_export_manifest(manifest):
+    """Save the manifest of an incremental export and report what was reused"""
+    if manifest is None:
+        return
+    manifest.close()
+    print(f"Incremental: {manifest.extracted} re-extracted, {manifest.reused} reused from the previous run")
 
-    print(f"Exported to: {output_path}")
-    print()
-    print("Summary:")
-    print(f"  Projects: {result['summary']['total_projects']}")
-    print(f"  Project conversations: {result['summary']['project_conversations']}")
-    print(f"  Custom GPT conversations: {len(gpt_convs)}")
-    print(f"  Regular conversations: {len(regular_convs)}")
-    if orphaned:
-        print(f"  Orphaned project conversations: {len(orphaned)}")
 
-    if with_messages:
-        # Calculate approximate file size
-        import os
-        file_size = os.path.getsize(output_path)
-        if file_size > 1024 * 1024:
-            print(f"  File size: {file_size / (1024 * 1024):.1f} MB")
-        else:
-            print(f"  File size: {file_size / 1024:.1f} KB")
+class JsonStreamWriter:
+    """
+    Write a JSON document incrementally.
 
+    Containers are opened and closed explicitly and complete values are
+    serialized one at a time, so an export never has to exist as a single
+    Python object. With indent=2 the output is exactly what
+    json.dump(..., indent=2) would produce; indent=None writes compact JSON
+    without any whitespace.
+    """
 
-def cmd_export_project(project_query: str, projects: list, conversations_grouped: dict, output_path: str = None):
-    """Export a single project with full conversation messages"""
-    project = find_project(project_query, projects)
+    def __init__(self, f, indent=2):
+        self.f = f
+        self.indent = indent
+        self.separators = None if indent is not None else (',', ':')
+        self._counts = []  # items written so far in each open container
+
+    def _newline(self):
+        if self.indent is not None:
+            self.f.write('\n' + ' ' * (self.indent * len(self._counts)))
+
+    def _start_item(self, key):
+        if self._counts:
+            if self._counts[-1]:
+                self.f.write(',')
+            self._counts[-1] += 1
+            self._newline()
+        if key is not None:
+            self.f.write(json.dumps(key) + (': ' if self.indent is not None else ':'))
+
+    def serialize(self, value) -> str:
+        """Serialize a value as this writer writes it at the top level (see raw)"""
+        stats = _run_stats
+        started = time.perf_counter() if stats else None
+        text = json.dumps(value, indent=self.indent, separators=self.separators)
+        if stats:
+            stats.inside['serialize'] += time.perf_counter() - started
+        return text
+
+    def value(self, value, key=None):
+        """Write a complete value (as an array item, or under key in an object)"""
+        self._start_item(key)
+        self._write_serialized(self.serialize(value))
+
+    def raw(self, text: str, key=None):
+        """Write a value already serialized by serialize() or json.dumps with this writer's indent and separators"""
+        self._start_item(key)
+        self._write_serialized(text)
+
+    def _write_serialized(self, text: str):
+        if self.indent and self._counts:
+            text = text.replace('\n', '\n' + ' ' * (self.indent * len(self._counts)))
+        self.f.write(text)
+
+    def begin_object(self, key=None):
+        self._start_item(key)
+        self.f.write('{')
+        self._counts.append(0)
+
+    def begin_array(self, key=None):
+        self._start_item(key)
+        self.f.write('[')
+        self._counts.append(0)
+
+    def end_object(self):
+        self._end('}')
+
+    def end_array(self):
+        self._end(']')
+
+    def _end(self, bracket):
+        if self._counts.pop():
+            self._newline()
+        self.f.write(bracket)
+
+
+def project_metadata(project: dict) -> dict:
+    """Project fields carried into exports"""
+    return {
+        'project_id': project.get('project_id'),
+        'name': project.get('name'),
+        'short_url': project.get('short_url'),
+        'created_at': project.get('created_at'),
+        'updated_at': project.get('updated_at'),
+        'last_interacted_at': project.get('last_interacted_at'),
+        'num_interactions': project.get('num_interactions'),
+        'memory_enabled': project.get('memory_enabled'),
+        'memory_scope': project.get('memory_scope'),
+    }
 
-    if not project:
-        print(f"Error: Project '{project_query}' not found.", file=sys.stderr)
-        print("\nAvailable projects:", file=sys.stderr)
-        for p in projects[:10]:
-            print(f"  - {p.get('name')} [{p.get('project_id')}]", file=sys.stderr)
-        if len(projects) > 10:
-            print(f"  ... and {len(projects) - 10} more", file=sys.stderr)
-        sys.exit(1)
 
-    pid = project.get('project_id')
-    convs = conversations_grouped.get(pid, [])
+def split_non_project_conversations(non_project: list) -> tuple:
+    """Split non-project conversations into custom GPT and regular conversations"""
+    gpt_convs = []
+    regular_convs = []
+    for conv in non_project:
+        if conv.get('gizmo_type') == 'gpt':
+            gpt_convs.append(conv)
+        else:
+            regular_convs.append(conv)
+    return gpt_convs, regular_convs
 
-    # Generate default output filename from project name
-    if not output_path:
-        safe_name = project.get('name', 'project').lower()
-        safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in safe_name)
-        output_path = f"{safe_name}_conversations.json"
 
-    print(f"Exporting project: {project.get('name')}")
-    print(f"Conversations: {len(convs)}")
+class JsonLinesWriter:
+    """Write JSON Lines output: one compact JSON document per line"""
 
-    result = {
-        'generated_at': datetime.now().isoformat(),
-        'project': {
-            'project_id': pid,
-            'name': project.get('name'),
-            'short_url': project.get('short_url'),
-            'created_at': project.get('created_at'),
-            'updated_at': project.get('updated_at'),
-            'last_interacted_at': project.get('last_interacted_at'),
-            'num_interactions': project.get('num_interactions'),
-            'memory_enabled': project.get('memory_enabled'),
-            'memory_scope': project.get('memory_scope'),
-        },
-        'conversation_count': len(convs),
-        'conversations': [],
-    }
+    indent = None
+    separators = (',', ':')
 
-    # Sort conversations by update time descending
-    convs_sorted = sorted(convs, key=lambda c: c.get('update_time') or 0, reverse=True)
+    def __init__(self, f):
+        self.f = f
 
-    for conv in convs_sorted:
-        result['conversations'].append(extract_conversation_summary(conv, with_messages=True))
+    def serialize(self, value) -> str:
+        stats = _run_stats
+        started = time.perf_counter() if stats else None
+        text = json.dumps(value, separators=self.separators)
+        if stats:
+            stats.inside['serialize'] += time.perf_counter() - started
+        return text
 
-    # Write output
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2)
+    def write(self, record: dict):
+        self.raw(self.serialize(record))
 
-    # Calculate file size
-    import os
-    file_size = os.path.getsize(output_path)
-    if file_size > 1024 * 1024:
-        size_str = f"{file_size / (1024 * 1024):.1f} MB"
-    else:
-        size_str = f"{file_size / 1024:.1f} KB"
+    def raw(self, text: str):
+        """Write a record already serialized by serialize()"""
+        self.f.write(text)
+        self.f.write('\n')
 
-    print(f"Exported to: {output_path} ({size_str})")
 
+def iter_conversation_summaries(convs: list, with_messages: bool = False, all_branches: bool = False,
+                                include_gizmo_id: bool = False, manifest=None, conv_filter=None, out=None, pool=None):
+    """
+    Summarize conversations one at a time.
 
-def cmd_export_non_project(conversations_grouped: dict, output_path: str = None, with_messages: bool = False):
-    """Export all conversations that don't belong to any project"""
+    With an ExportManifest, conversations with messages are looked up in
+    the previous export's manifest before anything is extracted. With a
+    SummaryPool, deferred conversations with messages are summarized in
+    its worker processes. Either way their summaries are yielded already
+    serialized (as str) for the writer out.
+    """
+    if pool is not None and with_messages and convs and all('span' in conv for conv in convs):
+        yield from pool.summaries(convs, out, all_branches=all_branches, include_gizmo_id=include_gizmo_id,
+                                  conv_filter=conv_filter)
+        return
+    for conv in convs:
+        if manifest is not None and with_messages and 'span' in conv:
+            yield manifest.summarize(conv, out.serialize, all_branches=all_branches,
+                                     include_gizmo_id=include_gizmo_id, conv_filter=conv_filter)
+            continue
+        summary = extract_conversation_summary(conv, with_messages=with_messages, all_branches=all_branches,
+                                               conv_filter=conv_filter)
+        if include_gizmo_id:
+            summary['gizmo_id'] = conv.get('gizmo_id')
+        yield summary
+
+
+def write_conversations(out: JsonStreamWriter, convs: list, with_messages: bool = False,
+                        all_branches: bool = False, include_gizmo_id: bool = False, manifest=None, conv_filter=None,
+                        pool=None):
+    """Write a 'conversations' array, summarizing one conversation at a time"""
+    out.begin_array('conversations')
+    for summary in iter_conversation_summaries(convs, with_messages, all_branches, include_gizmo_id, manifest,
+                                               conv_filter, out=out, pool=pool):
+        if isinstance(summary, str):
+            out.raw(summary)
+        else:
+            out.value(summary)
+    out.end_array()
+
+
+def write_conversation_records(out: JsonLinesWriter, convs: list, category: str, with_messages: bool = False,
+                               all_branches: bool = False, include_gizmo_id: bool = False, project_id=None,
+                               manifest=None, conv_filter=None, pool=None):
+    """
+    Write one JSON Lines record per conversation.
+
+    Each record is the conversation summary prefixed with its category
+    (project, custom_gpt, regular or orphaned_project) and, for project
+    conversations, the project ID, so lines can be split or appended freely.
+    """
+    record = {'record': 'conversation', 'category': category}
+    if project_id is not None:
+        record['project_id'] = project_id
+    # Already-serialized summaries (from a manifest or worker pool) are spliced in after the record's own fields
+    prefix = out.serialize(record)[:-1] + ','
+    for summary in iter_conversation_summaries(convs, with_messages, all_branches, include_gizmo_id, manifest,
+                                               conv_filter, out=out, pool=pool):
+        if isinstance(summary, str):
+            out.raw(prefix + summary[1:])
+        else:
+            out.write(dict(record, **summary))
+
+
+def write_conversation_group(out: JsonStreamWriter, key: str, description: str, convs: list,
+                             with_messages: bool = False, all_branches: bool = False,
+                             include_gizmo_id: bool = False, manifest=None, conv_filter=None, pool=None):
+    """Write a {count, description, conversations} group under key"""
+    out.begin_object(key)
+    out.value(len(convs), key='count')
+    out.value(description, key='description')
+    write_conversations(out, convs, with_messages=with_messages, all_branches=all_branches, manifest=manifest,
+                        include_gizmo_id=include_gizmo_id, conv_filter=conv_filter, pool=pool)
+    out.end_object()
+
+
+def format_file_size(path: str) -> str:
+    """Format the size of a file for display"""
+    file_size = os.path.getsize(path)
+    if file_size > 1024 * 1024:
+        return f"{file_size / (1024 * 1024):.1f} MB"
+    return f"{file_size / 1024:.1f} KB"
+
+
+GPT_DESCRIPTION = 'Conversations with custom GPTs (not projects)'
+REGULAR_DESCRIPTION = 'Regular ChatGPT conversations (no project or custom GPT)'
+ORPHANED_DESCRIPTION = 'Conversations linked to projects not in projects.json (possibly deleted)'
+
+
+def cmd_export(projects: list, conversations: list, conversations_grouped: dict, output_path: str = None,
+               with_messages: bool = False, all_branches: bool = False, compact: bool = False,
+               output_format: str = 'json', incremental: bool = False, conv_filter=None,
+               compress: str = None, compress_level: int = None, pool=None):
+    """Export project_conversations.json with full mapping"""
+    by_id, _ = build_project_lookup(projects)
+
+    output_path = with_compression_suffix(output_path or f'project_conversations.{output_format}', compress)
+
+    if with_messages:
+        print("Exporting with full messages (this may take a while and produce a large file)...")
+
+    # Everything is counted up front so the envelope can be written before
+    # any conversation is summarized
+    project_groups = [(p, conversations_grouped.get(p.get('project_id'), [])) for p in projects]
+    # Sort projects by conversation count descending
+    project_groups.sort(key=lambda g: len(g[1]), reverse=True)
+
+    # Group non-project conversations by gizmo_type (custom GPTs vs regular chats)
     non_project = conversations_grouped.get(None, [])
-    
+    gpt_convs, regular_convs = split_non_project_conversations(non_project)
+
+    # Also capture orphaned project conversations (in history but project not in projects.json)
+    orphaned = []
+    for gizmo_id, convs in conversations_grouped.items():
+        if gizmo_id is not None and gizmo_id not in by_id:
+            # Check if it's a project ID pattern
+            if gizmo_id.startswith('g-p-'):
+                orphaned.extend(convs)
+
+    summary = {
+        'total_projects': len(projects),
+        'total_conversations': len(conversations),
+        'project_conversations': sum(len(convs) for _, convs in project_groups),
+        'non_project_conversations': len(non_project),
+    }
+
+    manifest = open_export_manifest(output_path, incremental, with_messages=with_messages, all_branches=all_branches,
+                                    conv_filter=conv_filter, output_format=output_format, compact=compact)
+
+    # Write output
+    with open_compressed(output_path, 'wt', level=compress_level) as f:
+        if output_format == 'jsonl':
+            out = JsonLinesWriter(f)
+            out.write({
+                'record': 'header',
+                'generated_at': datetime.now().isoformat(),
+                'summary': summary,
+                'projects': [dict(project_metadata(p), conversation_count=len(convs)) for p, convs in project_groups],
+            })
+            for project, convs in project_groups:
+                write_conversation_records(out, convs, 'project', with_messages=with_messages,
+                                           all_branches=all_branches, manifest=manifest,
+                                           project_id=project.get('project_id'), conv_filter=conv_filter, pool=pool)
+            write_conversation_records(out, gpt_convs, 'custom_gpt', with_messages=with_messages,
+                                       all_branches=all_branches, manifest=manifest, include_gizmo_id=True,
+                                       conv_filter=conv_filter, pool=pool)
+            write_conversation_records(out, regular_convs, 'regular', with_messages=with_messages,
+                                       all_branches=all_branches, manifest=manifest, conv_filter=conv_filter, pool=pool)
+            write_conversation_records(out, orphaned, 'orphaned_project', with_messages=with_messages,
+                                       all_branches=all_branches, manifest=manifest, include_gizmo_id=True,
+                                       conv_filter=conv_filter, pool=pool)
+        else:
+            out = JsonStreamWriter(f, indent=None if compact else 2)
+            out.begin_object()
+            out.value(datetime.now().isoformat(), key='generated_at')
+            out.value(summary, key='summary')
+
+            out.begin_array('projects')
+            for project, convs in project_groups:
+                out.begin_object()
+                for key, value in project_metadata(project).items():
+                    out.value(value, key=key)
+                out.value(len(convs), key='conversation_count')
+                write_conversations(out, convs, with_messages=with_messages, all_branches=all_branches,
+                                    manifest=manifest, conv_filter=conv_filter, pool=pool)
+                out.end_object()
+            out.end_array()
+
+            out.begin_object('non_project_conversations')
+            write_conversation_group(out, 'custom_gpt_conversations', GPT_DESCRIPTION, gpt_convs,
+                                     with_messages=with_messages, all_branches=all_branches, manifest=manifest,
+                                     include_gizmo_id=True, conv_filter=conv_filter, pool=pool)
+            write_conversation_group(out, 'regular_conversations', REGULAR_DESCRIPTION, regular_convs,
+                                     with_messages=with_messages, all_branches=all_branches, manifest=manifest,
+                                     conv_filter=conv_filter, pool=pool)
+            out.end_object()
+
+            if orphaned:
+                write_conversation_group(out, 'orphaned_project_conversations', ORPHANED_DESCRIPTION, orphaned,
+                                         with_messages=with_messages, all_branches=all_branches, manifest=manifest,
+                                         include_gizmo_id=True, conv_filter=conv_filter, pool=pool)
+            out.end_object()
+
+    close_export_manifest(manifest)
+
+    record_output(output_path)
+    print(f"Exported to: {output_path}")
+    print()
+    print("Summary:")
+    print(f"  Projects: {summary['total_projects']}")
+    print(f"  Project conversations: {summary['project_conversations']}")
+    print(f"  Custom GPT conversations: {len(gpt_convs)}")
+    print(f"  Regular conversations: {len(regular_convs)}")
+    if orphaned:
+        print(f"  Orphaned project conversations: {len(orphaned)}")
+
+    if with_messages:
+        # Calculate approximate file size
+        print(f"  File size: {format_file_size(output_path)}")
+
+
+def cmd_export_project(project_query: str, projects: list, conversations_grouped: dict, output_path: str = None,
+                       all_branches: bool = False, compact: bool = False, output_format: str = 'json',
+                       incremental: bool = False, conv_filter=None, compress: str = None,
+                       compress_level: int = None):
+    """Export a single project with full conversation messages"""
+    project = find_project(project_query, projects)
+
+    if not project:
+        print(f"Error: Project '{project_query}' not found.", file=sys.stderr)
+        print("\nAvailable projects:", file=sys.stderr)
+        for p in projects[:10]:
+            print(f"  - {p.get('name')} [{p.get('project_id')}]", file=sys.stderr)
+        if len(projects) > 10:
+            print(f"  ... and {len(projects) - 10} more", file=sys.stderr)
+        sys.exit(1)
+
+    pid = project.get('project_id')
+    convs = conversations_grouped.get(pid, [])
+
+    # Generate default output filename from project name
     if not output_path:
-        output_path = 'non_project_conversations.json'
-    
+        output_path = f"{safe_project_name(project)}_conversations.{output_format}"
+    output_path = with_compression_suffix(output_path, compress)
+
+    print(f"Exporting project: {project.get('name')}")
+    print(f"Conversations: {len(convs)}")
+
+    # Sort conversations by update time descending
+    convs_sorted = sorted(convs, key=lambda c: c.get('update_time') or 0, reverse=True)
+
+    manifest = open_export_manifest(output_path, incremental, with_messages=True, all_branches=all_branches,
+                                    conv_filter=conv_filter, output_format=output_format, compact=compact)
+
+    # Write output
+    with open_compressed(output_path, 'wt', level=compress_level) as f:
+        if output_format == 'jsonl':
+            out = JsonLinesWriter(f)
+            out.write({
+                'record': 'header',
+                'generated_at': datetime.now().isoformat(),
+                'project': project_metadata(project),
+                'conversation_count': len(convs),
+            })
+            write_conversation_records(out, convs_sorted, 'project', with_messages=True,
+                                       all_branches=all_branches, manifest=manifest, project_id=pid,
+                                       conv_filter=conv_filter)
+        else:
+            out = JsonStreamWriter(f, indent=None if compact else 2)
+            out.begin_object()
+            out.value(datetime.now().isoformat(), key='generated_at')
+            out.value(project_metadata(project), key='project')
+            out.value(len(convs), key='conversation_count')
+            write_conversations(out, convs_sorted, with_messages=True, all_branches=all_branches, manifest=manifest,
+                                conv_filter=conv_filter)
+            out.end_object()
+
+    close_export_manifest(manifest)
+
+    record_output(output_path)
+    print(f"Exported to: {output_path} ({format_file_size(output_path)})")
+
+
+def cmd_export_non_project(conversations_grouped: dict, output_path: str = None, with_messages: bool = False,
+                           all_branches: bool = False, compact: bool = False, output_format: str = 'json',
+                           incremental: bool = False, conv_filter=None, compress: str = None,
+                           compress_level: int = None, pool=None):
+    """Export all conversations that don't belong to any project"""
+    non_project = conversations_grouped.get(None, [])
+
+    output_path = with_compression_suffix(output_path or f'non_project_conversations.{output_format}', compress)
+
     if with_messages:
         print("Exporting non-project conversations with full messages (this may produce a large file)...")
-    
-    # Group non-project conversations by type
-    gpt_convs = []
-    regular_convs = []
-    
-    for conv in non_project:
-        summary = extract_conversation_summary(conv, with_messages=with_messages)
-        gizmo_type = conv.get('gizmo_type')
-        if gizmo_type == 'gpt':
-            summary['gizmo_id'] = conv.get('gizmo_id')
-            gpt_convs.append(summary)
-        else:
-            regular_convs.append(summary)
-    
-    # Sort by update time descending
+
+    # Group non-project conversations by type, sorted by update time descending
+    gpt_convs, regular_convs = split_non_project_conversations(non_project)
     gpt_convs.sort(key=lambda c: c.get('update_time') or 0, reverse=True)
     regular_convs.sort(key=lambda c: c.get('update_time') or 0, reverse=True)
-    
-    result = {
-        'generated_at': datetime.now().isoformat(),
-        'summary': {
-            'total_non_project_conversations': len(non_project),
-            'custom_gpt_conversations': len(gpt_convs),
-            'regular_conversations': len(regular_convs),
-        },
-        'custom_gpt_conversations': {
-            'count': len(gpt_convs),
-            'description': 'Conversations with custom GPTs (not projects)',
-            'conversations': gpt_convs,
-        },
-        'regular_conversations': {
-            'count': len(regular_convs),
-            'description': 'Regular ChatGPT conversations (no project or custom GPT)',
-            'conversations': regular_convs,
-        },
-    }
-    
+
     # Write output
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2)
-    
-    # Calculate file size
-    import os
-    file_size = os.path.getsize(output_path)
-    if file_size > 1024 * 1024:
-        size_str = f"{file_size / (1024 * 1024):.1f} MB"
-    else:
-        size_str = f"{file_size / 1024:.1f} KB"
-    
-    print(f"Exported to: {output_path} ({size_str})")
+    summary = {
+        'total_non_project_conversations': len(non_project),
+        'custom_gpt_conversations': len(gpt_convs),
+        'regular_conversations': len(regular_convs),
+    }
+
+    manifest = open_export_manifest(output_path, incremental, with_messages=with_messages, all_branches=all_branches,
+                                    conv_filter=conv_filter, output_format=output_format, compact=compact)
+
+    with open_compressed(output_path, 'wt', level=compress_level) as f:
+        if output_format == 'jsonl':
+            out = JsonLinesWriter(f)
+            out.write({'record': 'header', 'generated_at': datetime.now().isoformat(), 'summary': summary})
+            write_conversation_records(out, gpt_convs, 'custom_gpt', with_messages=with_messages,
+                                       all_branches=all_branches, manifest=manifest, include_gizmo_id=True,
+                                       conv_filter=conv_filter, pool=pool)
+            write_conversation_records(out, regular_convs, 'regular', with_messages=with_messages,
+                                       all_branches=all_branches, manifest=manifest, conv_filter=conv_filter, pool=pool)
+        else:
+            out = JsonStreamWriter(f, indent=None if compact else 2)
+            out.begin_object()
+            out.value(datetime.now().isoformat(), key='generated_at')
+            out.value(summary, key='summary')
+            write_conversation_group(out, 'custom_gpt_conversations', GPT_DESCRIPTION, gpt_convs,
+                                     with_messages=with_messages, all_branches=all_branches, manifest=manifest,
+                                     include_gizmo_id=True, conv_filter=conv_filter, pool=pool)
+            write_conversation_group(out, 'regular_conversations', REGULAR_DESCRIPTION, regular_convs,
+                                     with_messages=with_messages, all_branches=all_branches, manifest=manifest,
+                                     conv_filter=conv_filter, pool=pool)
+            out.end_object()
+
+    close_export_manifest(manifest)
+
+    record_output(output_path)
+    print(f"Exported to: {output_path} ({format_file_size(output_path)})")
     print()
     print("Summary:")
     print(f"  Custom GPT conversations: {len(gpt_convs)}")
@@ -560,6 +1961,1280 @@ def cmd_export_non_project(conversations_grouped: dict, output_path: str = None,
     print(f"  Total: {len(non_project)} non-project conversations")
 
 
+DEFAULT_MEMORY_PROJECTS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'claude-memory', 'memory', 'projects'
+)
+
+
+def select_projects(project_queries, projects: list) -> list:
+    """The projects named by project_queries (names or IDs), or all projects; exits if one is not found"""
+    if not project_queries:
+        return [p for p in projects if p.get('project_id')]
+    selected = []
+    for query in project_queries:
+        project = find_project(query, projects)
+        if not project:
+            print(f"Error: Project '{query}' not found.", file=sys.stderr)
+            sys.exit(1)
+        if project not in selected:
+            selected.append(project)
+    return [p for p in selected if p.get('project_id')]
+
+
+DEFAULT_MAX_OPEN_FILES = 64
+
+
+class SpoolFiles:
+    """
+    Append-only scratch files keyed by name, with at most max_open open.
+
+    A file is opened on its first write. When the limit is reached the
+    least recently written one is closed, and it is reopened for appending
+    if written again. append() returns where the data starts.
+    """
+
+    def __init__(self, directory: str, max_open: int = DEFAULT_MAX_OPEN_FILES):
+        self.directory = directory
+        self.max_open = max_open
+        self.handles = OrderedDict()
+        self.sizes = defaultdict(int)
+
+    def path(self, key) -> str:
+        return os.path.join(self.directory, f"{key}.spool")
+
+    def append(self, key, data: bytes) -> int:
+        f = self.handles.get(key)
+        if f is None:
+            if len(self.handles) >= self.max_open:
+                _, oldest = self.handles.popitem(last=False)
+                oldest.close()
+            f = self.handles[key] = open(self.path(key), 'ab')
+        else:
+            self.handles.move_to_end(key)
+        offset = self.sizes[key]
+        f.write(data)
+        self.sizes[key] += len(data)
+        return offset
+
+    def close(self):
+        for f in self.handles.values():
+            f.close()
+        self.handles.clear()
+
+
+def write_project_from_spool(output_path: str, project: dict, entries: list, spool_path: str,
+                             compact: bool = False, output_format: str = 'json'):
+    """
+    Write one project's export from its spooled conversations.
+
+    entries are (update_time, offset, length) of each serialized
+    conversation in the spool, in export order. They are written newest
+    first, so the file matches what export-project writes for the project.
+    """
+    entries = sorted(entries, key=lambda e: e[0] or 0, reverse=True)
+    tmp = output_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f, \
+            (open(spool_path, 'rb') if entries else open(os.devnull, 'rb')) as spool:
+        if output_format == 'jsonl':
+            JsonLinesWriter(f).write({
+                'record': 'header',
+                'generated_at': datetime.now().isoformat(),
+                'project': project_metadata(project),
+                'conversation_count': len(entries),
+            })
+            for _, offset, length in entries:
+                spool.seek(offset)
+                f.write(spool.read(length).decode('utf-8'))
+        else:
+            out = JsonStreamWriter(f, indent=None if compact else 2)
+            out.begin_object()
+            out.value(datetime.now().isoformat(), key='generated_at')
+            out.value(project_metadata(project), key='project')
+            out.value(len(entries), key='conversation_count')
+            out.begin_array('conversations')
+            for _, offset, length in entries:
+                spool.seek(offset)
+                out.raw(spool.read(length).decode('utf-8'))
+            out.end_array()
+            out.end_object()
+    os.replace(tmp, output_path)
+
+
+def cmd_export_all_projects(projects: list, conversations_path: str, index=None,
+                            memory_dir: str = DEFAULT_MEMORY_PROJECTS_DIR, project_queries=None,
+                            all_branches: bool = False, compact: bool = False, output_format: str = 'json',
+                            max_open_files: int = DEFAULT_MAX_OPEN_FILES, conv_filter=None):
+    """
+    Export every project to <memory_dir>/<project>/conversations.json in one pass.
+
+    Each project conversation is decoded once, summarized and appended to
+    its project's spool file as the export is scanned (SpoolFiles keeps
+    at most max_open_files of them open). Every project's file is then
+    assembled from its spool without touching the export again. With an
+    up-to-date index only the project conversations are read, in file
+    order, instead of the whole export. conv_filter is applied before
+    anything is extracted.
+    """
+    selected = select_projects(project_queries, projects)
+    output_name = f"conversations.{output_format}"
+
+    # Folder per project, named like export-project output files
+    targets = {}
+    folders = {}
+    for project in selected:
+        folder = safe_project_name(project)
+        if folder in folders:
+            print(f"Warning: '{project.get('name')}' and '{folders[folder].get('name')}' both map to "
+                  f"{folder}/; skipping the former", file=sys.stderr)
+            continue
+        folders[folder] = project
+        targets[project['project_id']] = (len(targets), project, folder)
+
+    print(f"Exporting {len(targets)} projects to {memory_dir}")
+    os.makedirs(memory_dir, exist_ok=True)
+
+    if index is not None:
+        spans = [conv for conv in load_indexed_conversations(index, conversations_path, with_spans=True)
+                 if conv.get('gizmo_id') in targets and (conv_filter is None or conv_filter.accepts(conv))]
+        convs = (resolve_conversation(conv) for conv in spans)
+    else:
+        convs = (conv for _, _, conv in iter_conversation_records(conversations_path, track_offsets=False))
+
+    entries = defaultdict(list)
+    with tempfile.TemporaryDirectory(prefix='.export-all-', dir=memory_dir) as spool_dir:
+        spools = SpoolFiles(spool_dir, max_open_files)
+        try:
+            for conv in convs:
+                target = targets.get(conv.get('gizmo_id'))
+                if target is None or (conv_filter is not None and not conv_filter.accepts(conv)):
+                    continue
+                key = target[0]
+                summary = extract_conversation_summary(conv, with_messages=True, all_branches=all_branches,
+                                                       conv_filter=conv_filter)
+                if output_format == 'jsonl':
+                    record = {'record': 'conversation', 'category': 'project', 'project_id': conv.get('gizmo_id')}
+                    record.update(summary)
+                    text = json.dumps(record, separators=(',', ':')) + '\n'
+                else:
+                    text = json.dumps(summary, indent=None if compact else 2,
+                                      separators=(',', ':') if compact else None)
+                data = text.encode('utf-8')
+                entries[key].append((conv.get('update_time'), spools.append(key, data), len(data)))
+        finally:
+            spools.close()
+
+        stats_phase('write')
+        total = 0
+        for key, project, folder in targets.values():
+            project_dir = os.path.join(memory_dir, folder)
+            os.makedirs(project_dir, exist_ok=True)
+            output_path = os.path.join(project_dir, output_name)
+            write_project_from_spool(output_path, project, entries[key], spools.path(key),
+                                     compact=compact, output_format=output_format)
+            record_output(output_path)
+            total += len(entries[key])
+            print(f"  {folder}/{output_name}: {len(entries[key])} conversations ({format_file_size(output_path)})")
+
+    print(f"\nExported {total} conversations into {len(targets)} project folders")
+
+
+DEFAULT_CONTEXT_PROMPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate-context-prompt.md')
+DEFAULT_SUMMARIZER = 'claude -p'
+DEFAULT_CONTEXT_INPUT_BYTES = 200 * 1024
+DEFAULT_SUMMARIZER_TIMEOUT = 600
+
+# Written next to each generated context.md; holds the SHA-256 of the input it was generated from
+CONTEXT_HASH_FILE = '.context.sha256'
+CONTEXT_TRUNCATED = '\n\n[... older conversations omitted ...]\n'
+
+
+def load_context_prompt(prompt_path: str) -> str:
+    """
+    The summarizer instructions from generate-context-prompt.md: the text
+    between '## Prompt' and the next '---' line, or the whole file if it
+    has no such section.
+    """
+    with open(prompt_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    match = re.search(r'^## Prompt[ \t]*\n(.*?)^---[ \t]*$', text, re.S | re.M)
+    return (match.group(1) if match else text).strip()
+
+
+def conversation_transcript(conv: dict) -> str:
+    """A conversation's user and assistant messages as plain markdown"""
+    lines = [f"## {conv.get('title') or 'Untitled'} ({format_date(conv.get('update_time'))})"]
+    for msg in get_conversation_messages(resolve_conversation(conv)):
+        if msg['role'] in ('user', 'assistant'):
+            lines.append(f"**{msg['role']}:** {msg['content']}")
+    return '\n\n'.join(lines)
+
+
+def build_context_input(project: dict, convs: list, prompt: str, max_bytes: int) -> str:
+    """
+    The summarizer input for one project: the prompt, then the project's
+    conversations newest first, stopping once max_bytes (UTF-8) is reached
+    so large projects keep their most recent history. Only the
+    conversations that fit are read back from the export.
+    """
+    convs_sorted = sorted(convs, key=lambda c: (c.get('update_time') or 0, c.get('id') or ''), reverse=True)
+    header = (f"{prompt}\n\n---\n\n# Project: {project.get('name')}\n\n"
+              f"{len(convs)} conversations, newest first.")
+    parts = [header]
+    size = len(header.encode('utf-8'))
+    budget = max_bytes - len(CONTEXT_TRUNCATED.encode('utf-8'))
+
+    for conv in convs_sorted:
+        block = '\n\n' + conversation_transcript(conv)
+        encoded = block.encode('utf-8')
+        if size + len(encoded) > budget:
+            # Cut the first conversation that does not fit at a character boundary
+            parts.append(encoded[:max(0, budget - size)].decode('utf-8', 'ignore'))
+            parts.append(CONTEXT_TRUNCATED)
+            break
+        parts.append(block)
+        size += len(encoded)
+    return ''.join(parts)
+
+
+def context_input_hash(command: list, text: str) -> str:
+    """Content hash of a summarizer run: the command and its input"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(command).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def read_context_hash(project_dir: str):
+    try:
+        with open(os.path.join(project_dir, CONTEXT_HASH_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def run_summarizer(command: list, text: str, project: dict, timeout: float) -> str:
+    """
+    Run the summarizer command with the input on stdin and return its
+    stdout, the generated context.md. The project's name and ID are also
+    passed in MEMSPAN_PROJECT_NAME and MEMSPAN_PROJECT_ID.
+    """
+    env = dict(os.environ, MEMSPAN_PROJECT_NAME=project.get('name') or '',
+               MEMSPAN_PROJECT_ID=project.get('project_id') or '')
+    result = subprocess.run(command, input=text, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, encoding='utf-8', env=env, timeout=timeout)
+    if result.returncode != 0:
+        detail = result.stderr.strip().splitlines()
+        raise RuntimeError(f"exited with status {result.returncode}" + (f": {detail[-1]}" if detail else ''))
+    output = result.stdout.strip()
+    if not output:
+        raise RuntimeError('produced no output')
+    return output + '\n'
+
+
+def write_context(project_dir: str, content: str, input_hash: str):
+    """Replace context.md atomically, then record the hash of the input it came from"""
+    os.makedirs(project_dir, exist_ok=True)
+    for name, text in (('context.md', content), (CONTEXT_HASH_FILE, input_hash + '\n')):
+        path = os.path.join(project_dir, name)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def cmd_generate_contexts(projects: list, conversations_grouped: dict, memory_dir: str = DEFAULT_MEMORY_PROJECTS_DIR,
+                          summarizer: str = DEFAULT_SUMMARIZER, project_queries=None,
+                          prompt_path: str = DEFAULT_CONTEXT_PROMPT, max_input_bytes: int = DEFAULT_CONTEXT_INPUT_BYTES,
+                          concurrency: int = 4, timeout: float = DEFAULT_SUMMARIZER_TIMEOUT, force: bool = False,
+                          dry_run: bool = False):
+    """
+    Generate <memory_dir>/<project>/context.md for every project.
+
+    Inputs are prepared one project at a time and handed to a pool of
+    `concurrency` summarizer processes as soon as they are ready. A project
+    is skipped when the hash of its input (and the summarizer command)
+    matches the one recorded with its context.md, or when it has a
+    context.md that was not generated here, unless force is set.
+    """
+    command = shlex.split(summarizer)
+    if not command:
+        print("Error: --summarizer is empty.", file=sys.stderr)
+        sys.exit(1)
+    prompt = load_context_prompt(prompt_path)
+    selected = select_projects(project_queries, projects)
+
+    print(f"Generating context.md for {len(selected)} projects in {memory_dir}")
+    print(f"Summarizer: {summarizer} ({concurrency} at a time)\n")
+
+    counts = defaultdict(int)
+    failed = []
+
+    def finish(future, project, project_dir, input_hash, started):
+        try:
+            content = future.result()
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            failed.append(project)
+            counts['failed'] += 1
+            print(f"  failed     {project.get('name')}: {e}", flush=True)
+            return
+        write_context(project_dir, content, input_hash)
+        counts['generated'] += 1
+        print(f"  generated  {project.get('name')} ({len(content.encode('utf-8')) / 1024:.1f} KB, "
+              f"{time.monotonic() - started:.1f}s)", flush=True)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = {}
+        for project in selected:
+            convs = conversations_grouped.get(project['project_id'], [])
+            if not convs:
+                counts['empty'] += 1
+                continue
+            project_dir = os.path.join(memory_dir, safe_project_name(project))
+
+            text = build_context_input(project, convs, prompt, max_input_bytes)
+            input_hash = context_input_hash(command, text)
+            recorded = read_context_hash(project_dir)
+            has_context = os.path.exists(os.path.join(project_dir, 'context.md'))
+            if not force and has_context and recorded is None:
+                counts['kept'] += 1
+                print(f"  kept       {project.get('name')} (context.md not generated here; --force replaces it)")
+                continue
+            if not force and has_context and recorded == input_hash:
+                counts['unchanged'] += 1
+                continue
+            if dry_run:
+                counts['would_generate'] += 1
+                print(f"  would generate {project.get('name')} ({len(text.encode('utf-8')) / 1024:.1f} KB input)")
+                continue
+
+            future = pool.submit(run_summarizer, command, text, project, timeout)
+            pending[future] = (project, project_dir, input_hash, time.monotonic())
+            # Write results as they arrive, keeping at most a few prepared inputs waiting
+            while len(pending) >= concurrency * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    finish(f, *pending.pop(f))
+
+        for f in as_completed(list(pending)):
+            finish(f, *pending.pop(f))
+
+    if _run_stats is not None:
+        for name, n in counts.items():
+            _run_stats.counts[f'contexts_{name}'] = n
+
+    print()
+    print("Summary:")
+    for name in ('generated', 'would_generate', 'unchanged', 'kept', 'empty', 'failed'):
+        if counts[name]:
+            print(f"  {name.replace('_', ' ').capitalize()}: {counts[name]}")
+    if failed:
+        sys.exit(1)
+
+
+# Commands that can be answered from the sidecar index
+INDEXED_COMMANDS = ('list-projects', 'list', 'export', 'export-project', 'export-non-project', 'generate-contexts')
+
+
+def cmd_index(conversations_path: str, index_path: str):
+    """Build the sidecar index for conversations.json"""
+    print(f"Indexing: {conversations_path}")
+    count = build_conversation_index(conversations_path, index_path)
+    file_size = os.path.getsize(index_path)
+    if file_size > 1024 * 1024:
+        size_str = f"{file_size / (1024 * 1024):.1f} MB"
+    else:
+        size_str = f"{file_size / 1024:.1f} KB"
+    print(f"Indexed {count} conversations to: {index_path} ({size_str})")
+
+
+# IDs per query when looking conversations up in the index
+ID_LOOKUP_BATCH = 500
+
+
+def find_conversation_spans(conversations_path: str, ids: list, index=None) -> dict:
+    """
+    Find the byte spans of conversations by ID, as {id: (offset, length)}.
+
+    With the sidecar index this is a lookup per ID. Without it the export
+    is scanned until every requested ID has been seen.
+    """
+    spans = {}
+    if index is not None:
+        for start in range(0, len(ids), ID_LOOKUP_BATCH):
+            batch = ids[start:start + ID_LOOKUP_BATCH]
+            rows = index.execute(
+                f"SELECT id, offset, length FROM conversations WHERE id IN ({', '.join('?' * len(batch))})", batch
+            )
+            spans.update((conv_id, (offset, length)) for conv_id, offset, length in rows)
+        return spans
+
+    wanted = set(ids)
+    for offset, length, conv in iter_conversation_records(conversations_path):
+        if conv.get('id') in wanted:
+            spans[conv['id']] = (offset, length)
+            if len(spans) == len(wanted):
+                break
+    return spans
+
+
+def cmd_get(conversations_path: str, ids: list, index=None, output_path: str = None, raw: bool = False,
+            all_branches: bool = False, compact: bool = False, compress: str = None, compress_level: int = None):
+    """
+    Write the conversations with the given IDs as a JSON array.
+
+    Only the requested conversations are read from the memory-mapped
+    export. With raw, their original JSON is copied out without being
+    decoded at all; otherwise each is written as a summary with messages.
+    """
+    ids = list(dict.fromkeys(ids))
+    if output_path:
+        output_path = with_compression_suffix(output_path, compress)
+    spans = find_conversation_spans(conversations_path, ids, index)
+    for conv_id in ids:
+        if conv_id not in spans:
+            print(f"Warning: conversation '{conv_id}' not found", file=sys.stderr)
+    found = [conv_id for conv_id in ids if conv_id in spans]
+    if not found:
+        sys.exit(1)
+
+    if raw:
+        f = open_compressed(output_path, 'wb', level=compress_level) if output_path else sys.stdout.buffer
+        try:
+            f.write(b'[\n')
+            for i, conv_id in enumerate(found):
+                if i:
+                    f.write(b',\n')
+                f.write(read_conversation_bytes(conversations_path, *spans[conv_id]))
+            f.write(b'\n]\n')
+        finally:
+            if output_path:
+                f.close()
+    else:
+        f = open_compressed(output_path, 'wt', level=compress_level) if output_path else sys.stdout
+        try:
+            out = JsonStreamWriter(f, indent=None if compact else 2)
+            out.begin_array()
+            for conv_id in found:
+                conv = read_conversation_at(conversations_path, *spans[conv_id])
+                summary = extract_conversation_summary(conv, with_messages=True, all_branches=all_branches)
+                summary['gizmo_id'] = conv.get('gizmo_id')
+                out.value(summary)
+            out.end_array()
+            f.write('\n')
+        finally:
+            if output_path:
+                f.close()
+
+    if output_path:
+        record_output(output_path)
+        print(f"Exported {len(found)} conversations to: {output_path} ({format_file_size(output_path)})")
+    else:
+        sys.stdout.flush()
+
+
+# Bump when the search schema or tokenizer changes; older search indexes are rebuilt
+SEARCH_VERSION = 1
+
+
+def default_search_index_path(conversations_path: str) -> str:
+    """Full-text search index path for a conversations.json"""
+    return conversations_path + '.search.sqlite'
+
+
+def open_search_index(search_path: str, rebuild: bool = False):
+    """
+    Open (creating if needed) the full-text search index.
+
+    Messages of each conversation's current branch are stored in an FTS5
+    table; the messages and conversations tables hold the columns used for
+    filtering and display. An index from an older SEARCH_VERSION is rebuilt.
+    """
+    conn = sqlite3.connect(search_path)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if rebuild or version not in (0, SEARCH_VERSION):
+        conn.executescript('''
+            DROP TABLE IF EXISTS meta;
+            DROP TABLE IF EXISTS conversations;
+            DROP TABLE IF EXISTS messages;
+            DROP TABLE IF EXISTS messages_fts;
+        ''')
+    conn.executescript(f'''
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS conversations (
+            rowid INTEGER PRIMARY KEY,
+            id TEXT UNIQUE,
+            title TEXT,
+            gizmo_id TEXT,
+            default_model_slug TEXT,
+            create_time,
+            update_time
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            rowid INTEGER PRIMARY KEY,
+            conversation INTEGER NOT NULL,
+            position INTEGER,
+            role TEXT,
+            model TEXT,
+            create_time
+        );
+        CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation);
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, tokenize='porter unicode61');
+        PRAGMA user_version = {SEARCH_VERSION};
+    ''')
+    return conn
+
+
+def _remove_indexed_conversation(conn, rowid: int):
+    conn.execute('DELETE FROM messages_fts WHERE rowid IN (SELECT rowid FROM messages WHERE conversation = ?)',
+                 (rowid,))
+    conn.execute('DELETE FROM messages WHERE conversation = ?', (rowid,))
+    conn.execute('DELETE FROM conversations WHERE rowid = ?', (rowid,))
+
+
+def _index_conversation_messages(conn, conv: dict, rowid=None):
+    """Insert (or replace) one conversation and its current-branch messages in the search index"""
+    if rowid is not None:
+        _remove_indexed_conversation(conn, rowid)
+
+    cur = conn.execute(
+        'INSERT INTO conversations (rowid, id, title, gizmo_id, default_model_slug, create_time, update_time) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (rowid, conv.get('id'), conv.get('title'), conv.get('gizmo_id'), conv.get('default_model_slug'),
+         conv.get('create_time'), conv.get('update_time'))
+    )
+    conv_rowid = cur.lastrowid
+
+    messages = extract_messages_from_mapping(conv.get('mapping', {}), conv.get('current_node'))
+    for position, msg in enumerate(messages):
+        cur = conn.execute(
+            'INSERT INTO messages (conversation, position, role, model, create_time) VALUES (?, ?, ?, ?, ?)',
+            (conv_rowid, position, msg['role'], msg.get('model') or conv.get('default_model_slug'),
+             msg.get('create_time') or conv.get('create_time'))
+        )
+        conn.execute('INSERT INTO messages_fts (rowid, content) VALUES (?, ?)', (cur.lastrowid, msg['content']))
+
+
+def update_search_index(conn, conversations_path: str, index=None):
+    """
+    Bring the search index up to date with conversations.json.
+
+    Only conversations that are new or whose update_time changed are
+    (re-)indexed, and conversations missing from the export are removed.
+    Nothing is read when the export is unchanged since the last update.
+    When the sidecar index is available it supplies ids and update times,
+    so only changed conversations are decoded. Returns counts of what
+    changed, or None if the index was already up to date.
+    """
+    fingerprint = _source_fingerprint(conversations_path)
+    meta = dict(conn.execute('SELECT key, value FROM meta'))
+    if all(meta.get(k) == v for k, v in fingerprint.items()):
+        return None
+
+    existing = {conv_id: (rowid, update_time)
+                for rowid, conv_id, update_time in conn.execute('SELECT rowid, id, update_time FROM conversations')}
+    seen = set()
+    stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+
+    def changed(conv_id, update_time):
+        seen.add(conv_id)
+        known = existing.get(conv_id)
+        if known and known[1] == update_time:
+            stats['unchanged'] += 1
+            return False
+        stats['updated' if known else 'added'] += 1
+        return True
+
+    if index is not None:
+        rows = index.execute('SELECT id, update_time, offset, length FROM conversations ORDER BY seq').fetchall()
+        for conv_id, update_time, offset, length in rows:
+            if conv_id and changed(conv_id, update_time):
+                conv = read_conversation_at(conversations_path, offset, length)
+                _index_conversation_messages(conn, conv, existing.get(conv_id, (None,))[0])
+    else:
+        for conv in iter_conversations(conversations_path):
+            conv_id = conv.get('id')
+            if conv_id and changed(conv_id, conv.get('update_time')):
+                _index_conversation_messages(conn, conv, existing.get(conv_id, (None,))[0])
+
+    for conv_id, (rowid, _) in existing.items():
+        if conv_id not in seen:
+            _remove_indexed_conversation(conn, rowid)
+            stats['removed'] += 1
+
+    meta = dict(fingerprint, source_path=os.path.abspath(conversations_path), updated_at=datetime.now().isoformat())
+    conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', meta.items())
+    conn.commit()
+    return stats
+
+
+def parse_date_arg(value: str) -> float:
+    """Parse a YYYY-MM-DD (or ISO datetime) command-line date into a Unix timestamp"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (expected YYYY-MM-DD)")
+
+
+def fts_query(query: str) -> str:
+    """Quote each word so arbitrary text (C++, don't, a-b) is a valid FTS5 query"""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def search_conversations(conn, query: str, gizmo_id=None, role: str = None, model: str = None,
+                         since: float = None, until: float = None, limit: int = 20) -> list:
+    """
+    Run a ranked (BM25) full-text search, best match first.
+
+    Returns one result per conversation: its best-ranked message with a
+    highlighted snippet, and the number of matching messages. The query
+    uses FTS5 syntax (phrases, AND/OR/NOT, prefix*); text that is not
+    valid FTS5 syntax is searched as plain words.
+    """
+    conditions = ['messages_fts MATCH ?']
+    params = []
+    if gizmo_id is not None:
+        conditions.append('c.gizmo_id = ?')
+        params.append(gizmo_id)
+    if role:
+        conditions.append('m.role = ?')
+        params.append(role)
+    if model:
+        conditions.append('m.model = ?')
+        params.append(model)
+    if since is not None:
+        conditions.append('m.create_time >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('m.create_time < ?')
+        params.append(until)
+
+    # Bare columns next to MIN() come from the best-ranked message of each conversation
+    sql = (
+        'SELECT c.id, c.title, c.gizmo_id, m.rowid, m.role, m.model, m.create_time, '
+        'MIN(messages_fts.rank), COUNT(*) '
+        'FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid '
+        'JOIN conversations c ON c.rowid = m.conversation '
+        f"WHERE {' AND '.join(conditions)} "
+        'GROUP BY m.conversation ORDER BY MIN(messages_fts.rank) LIMIT ?'
+    )
+    try:
+        rows = conn.execute(sql, [query] + params + [limit]).fetchall()
+    except sqlite3.OperationalError:
+        query = fts_query(query)
+        rows = conn.execute(sql, [query] + params + [limit]).fetchall()
+
+    results = []
+    for conv_id, title, gizmo_id, msg_rowid, role, model, create_time, rank, hits in rows:
+        snippet = conn.execute(
+            "SELECT snippet(messages_fts, 0, '[', ']', '...', 24) FROM messages_fts "
+            'WHERE messages_fts MATCH ? AND rowid = ?',
+            (query, msg_rowid)
+        ).fetchone()[0]
+        results.append({
+            'id': conv_id,
+            'title': title,
+            'gizmo_id': gizmo_id,
+            'role': role,
+            'model': model,
+            'create_time': create_time,
+            'rank': rank,
+            'hits': hits,
+            'snippet': ' '.join(snippet.split()),
+        })
+    return results
+
+
+def cmd_search(query: str, projects: list, conversations_path: str, search_path: str, index=None,
+               project_query: str = None, role: str = None, model: str = None,
+               since: float = None, until: float = None, limit: int = 20, rebuild: bool = False):
+    """Search message text across all conversations"""
+    gizmo_id = None
+    if project_query:
+        project = find_project(project_query, projects)
+        if not project:
+            print(f"Error: Project '{project_query}' not found.", file=sys.stderr)
+            sys.exit(1)
+        gizmo_id = project.get('project_id')
+
+    conn = open_search_index(search_path, rebuild=rebuild)
+    try:
+        started = time.monotonic()
+        stats = update_search_index(conn, conversations_path, index=index)
+        if stats:
+            print(f"Updated search index: {stats['added']} added, {stats['updated']} changed, "
+                  f"{stats['removed']} removed, {stats['unchanged']} unchanged "
+                  f"({time.monotonic() - started:.1f}s)")
+            print()
+
+        started = time.monotonic()
+        results = search_conversations(conn, query, gizmo_id=gizmo_id, role=role, model=model,
+                                       since=since, until=until, limit=limit)
+        elapsed_ms = (time.monotonic() - started) * 1000
+    finally:
+        conn.close()
+
+    project_names = {p.get('project_id'): p.get('name') for p in projects}
+
+    print(f"Search: {query}  ({len(results)} conversations, {elapsed_ms:.0f} ms)")
+    print("-" * 80)
+    if not results:
+        print("  (no matches)")
+        return
+
+    for result in results:
+        title = (result['title'] or '(untitled)')[:50]
+        where = project_names.get(result['gizmo_id']) or result['gizmo_id'] or ''
+        print(f"  {title:<50} {result['hits']:>4} hits  {format_date(result['create_time'])}  {where[:30]}")
+        print(f"    ID: {result['id']}")
+        print(f"    [{result['role'].upper()}] {result['snippet']}")
+        print()
+
+
+# Bump when the archive schema or object encoding changes
+ARCHIVE_VERSION = 1
+DEFAULT_ARCHIVE_PATH = 'conversations.archive.sqlite'
+# zlib level for stored objects; they are read back far more often than written
+ARCHIVE_COMPRESS_LEVEL = 6
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+def open_archive(archive_path: str, create: bool = False):
+    """
+    Open the content-addressed snapshot archive.
+
+    Message objects (the 'message' of each mapping node) and conversation
+    skeletons (the conversation with every message replaced by its hash)
+    are stored once each, zlib-compressed and keyed by the SHA-256 of their
+    JSON. A snapshot is a manifest of conversation hashes in export order,
+    so an export that mostly repeats the previous one adds little more than
+    its manifest and the conversations that changed.
+    """
+    if not create and not os.path.exists(archive_path):
+        raise FileNotFoundError(f"No archive at {archive_path}; run 'archive add' first")
+    conn = sqlite3.connect(archive_path)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, ARCHIVE_VERSION):
+        conn.close()
+        print(f"Error: {archive_path} was written by an incompatible version (archive version {version})",
+              file=sys.stderr)
+        sys.exit(1)
+    conn.executescript(f'''
+        CREATE TABLE IF NOT EXISTS messages (hash BLOB PRIMARY KEY, data BLOB NOT NULL);
+        CREATE TABLE IF NOT EXISTS conversations (
+            hash BLOB PRIMARY KEY,
+            id TEXT,
+            update_time,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS conversations_id ON conversations (id);
+        CREATE TABLE IF NOT EXISTS snapshots (
+            seq INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            taken_at REAL,
+            added_at TEXT,
+            source_path TEXT,
+            manifest_hash BLOB,
+            conversation_count INTEGER,
+            new_conversations INTEGER,
+            new_messages INTEGER,
+            manifest BLOB NOT NULL
+        );
+        PRAGMA user_version = {ARCHIVE_VERSION};
+    ''')
+    return conn
+
+
+def _archive_dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _missing_hashes(conn, table: str, digests: list) -> set:
+    """The digests not yet stored in table"""
+    missing = set(digests)
+    for start in range(0, len(digests), ID_LOOKUP_BATCH):
+        batch = digests[start:start + ID_LOOKUP_BATCH]
+        rows = conn.execute(f"SELECT hash FROM {table} WHERE hash IN ({', '.join('?' * len(batch))})", batch)
+        missing.difference_update(row[0] for row in rows)
+    return missing
+
+
+def archive_conversation(conn, conv: dict) -> tuple:
+    """
+    Store one conversation, returning (digest, new_messages), where
+    new_messages is None when the conversation was already stored.
+
+    Messages are hashed first; the conversation skeleton references them
+    by hex digest, so an unchanged conversation hashes the same and nothing
+    of it is compressed or written again.
+    """
+    messages = {}
+    skeleton = conv
+    if isinstance(conv.get('mapping'), dict):
+        mapping = {}
+        for node_id, node in conv['mapping'].items():
+            message = node.get('message') if isinstance(node, dict) else None
+            if message is not None:
+                data = _archive_dumps(message)
+                digest = hashlib.sha256(data).digest()
+                messages[digest] = data
+                node = dict(node, message=digest.hex())
+            mapping[node_id] = node
+        skeleton = dict(conv, mapping=mapping)
+
+    data = _archive_dumps(skeleton)
+    digest = hashlib.sha256(data).digest()
+    if not _missing_hashes(conn, 'conversations', [digest]):
+        return digest, None
+
+    missing = _missing_hashes(conn, 'messages', list(messages))
+    conn.executemany('INSERT INTO messages (hash, data) VALUES (?, ?)',
+                     [(d, zlib.compress(messages[d], ARCHIVE_COMPRESS_LEVEL)) for d in missing])
+    conn.execute('INSERT INTO conversations (hash, id, update_time, data) VALUES (?, ?, ?, ?)',
+                 (digest, conv.get('id'), conv.get('update_time'), zlib.compress(data, ARCHIVE_COMPRESS_LEVEL)))
+    return digest, len(missing)
+
+
+def load_archived_conversation(conn, digest: bytes) -> dict:
+    """Rebuild a stored conversation from its skeleton and message objects"""
+    row = conn.execute('SELECT data FROM conversations WHERE hash = ?', (digest,)).fetchone()
+    if row is None:
+        raise KeyError(f"conversation object {digest.hex()} is missing from the archive")
+    conv = json.loads(zlib.decompress(row[0]))
+    mapping = conv.get('mapping')
+    if not isinstance(mapping, dict):
+        return conv
+
+    refs = defaultdict(list)
+    for node in mapping.values():
+        if isinstance(node, dict) and isinstance(node.get('message'), str):
+            refs[node['message']].append(node)
+    digests = [bytes.fromhex(ref) for ref in refs]
+    for start in range(0, len(digests), ID_LOOKUP_BATCH):
+        batch = digests[start:start + ID_LOOKUP_BATCH]
+        rows = conn.execute(f"SELECT hash, data FROM messages WHERE hash IN ({', '.join('?' * len(batch))})", batch)
+        for message_digest, data in rows:
+            text = zlib.decompress(data)
+            for node in refs.pop(message_digest.hex()):
+                node['message'] = json.loads(text)
+    if refs:
+        raise KeyError(f"{len(refs)} message object(s) of conversation {conv.get('id')} are missing from the archive")
+    return conv
+
+
+def snapshot_manifest(conn, seq: int) -> list:
+    """The conversation digests of a snapshot, in export order"""
+    data = zlib.decompress(conn.execute('SELECT manifest FROM snapshots WHERE seq = ?', (seq,)).fetchone()[0])
+    return [data[i:i + DIGEST_SIZE] for i in range(0, len(data), DIGEST_SIZE)]
+
+
+def find_snapshot(conn, name: str = None, as_of: float = None):
+    """
+    Find a snapshot as (seq, name, taken_at): by name, else the newest
+    taken on or before as_of, else the newest. None if there is none.
+    """
+    query, params = 'SELECT seq, name, taken_at FROM snapshots', ()
+    if name is not None:
+        query, params = query + ' WHERE name = ?', (name,)
+    elif as_of is not None:
+        query, params = query + ' WHERE taken_at <= ?', (as_of,)
+    return conn.execute(query + ' ORDER BY taken_at DESC, seq DESC LIMIT 1', params).fetchone()
+
+
+def parse_as_of_arg(value: str) -> float:
+    """Parse an --as-of date; a plain YYYY-MM-DD covers that whole day"""
+    ts = parse_date_arg(value)
+    if len(value) == 10:
+        ts += 86400 - 1e-6
+    return ts
+
+
+def cmd_archive_add(conversations_path: str, archive_path: str, name: str = None, taken_at: float = None):
+    """
+    Add conversations.json to the archive as a new snapshot.
+
+    The export is streamed once. Only conversations whose content changed
+    since any earlier snapshot are compressed and written, with only their
+    new messages. The snapshot is committed in a single transaction, so an
+    interrupted run leaves the archive as it was. An export identical to an
+    archived snapshot is not added again.
+    """
+    conn = open_archive(archive_path, create=True)
+    try:
+        manifest = []
+        newest = None
+        new_conversations = new_messages = 0
+        for conv in iter_conversations(conversations_path):
+            digest, added = archive_conversation(conn, conv)
+            manifest.append(digest)
+            if added is not None:
+                new_conversations += 1
+                new_messages += added
+            for ts in (conv.get('create_time'), conv.get('update_time')):
+                if isinstance(ts, (int, float)) and (newest is None or ts > newest):
+                    newest = ts
+
+        manifest_data = b''.join(manifest)
+        manifest_hash = hashlib.sha256(manifest_data).digest()
+        same = conn.execute('SELECT name FROM snapshots WHERE manifest_hash = ?', (manifest_hash,)).fetchone()
+        if same:
+            conn.rollback()
+            print(f"Unchanged: {conversations_path} matches snapshot '{same[0]}'; nothing added")
+            return
+
+        # An export is at least as new as its newest conversation
+        if taken_at is None:
+            taken_at = newest if newest is not None else time.time()
+        if name is None:
+            base = name = format_date(taken_at)
+            suffix = 1
+            while conn.execute('SELECT 1 FROM snapshots WHERE name = ?', (name,)).fetchone():
+                suffix += 1
+                name = f"{base}-{suffix}"
+        elif conn.execute('SELECT 1 FROM snapshots WHERE name = ?', (name,)).fetchone():
+            conn.rollback()
+            print(f"Error: a snapshot named '{name}' already exists", file=sys.stderr)
+            sys.exit(1)
+
+        conn.execute(
+            'INSERT INTO snapshots (name, taken_at, added_at, source_path, manifest_hash, conversation_count, '
+            'new_conversations, new_messages, manifest) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, taken_at, datetime.now().isoformat(), os.path.abspath(conversations_path), manifest_hash,
+             len(manifest), new_conversations, new_messages, zlib.compress(manifest_data, ARCHIVE_COMPRESS_LEVEL))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    if _run_stats is not None:
+        _run_stats.counts['conversations'] = len(manifest)
+        _run_stats.counts['conversations_archived'] = new_conversations
+        _run_stats.counts['messages_archived'] = new_messages
+    print(f"Archived snapshot '{name}' ({format_timestamp(taken_at)}): {len(manifest)} conversations, "
+          f"{new_conversations} new or changed, {new_messages} new messages")
+    print(f"Archive: {archive_path} ({format_file_size(archive_path)}; export {format_file_size(conversations_path)})")
+
+
+def cmd_archive_list(archive_path: str):
+    """List the snapshots in the archive"""
+    conn = open_archive(archive_path)
+    try:
+        rows = conn.execute(
+            'SELECT name, taken_at, conversation_count, new_conversations, new_messages, source_path '
+            'FROM snapshots ORDER BY taken_at, seq'
+        ).fetchall()
+        objects = [conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                   for table in ('conversations', 'messages')]
+    finally:
+        conn.close()
+
+    print(f"Archive: {archive_path} ({format_file_size(archive_path)})")
+    print(f"{len(rows)} snapshots; {objects[0]} conversation versions and {objects[1]} messages stored")
+    print("-" * 80)
+    for name, taken_at, count, new_conversations, new_messages, source_path in rows:
+        print(f"  {name:<20} {format_timestamp(taken_at)}  {count:>6} conversations  "
+              f"+{new_conversations} changed  +{new_messages} messages")
+        print(f"    From: {source_path}")
+
+
+def _open_snapshot(conn, archive_path: str, name: str = None, as_of: float = None):
+    snapshot = find_snapshot(conn, name, as_of)
+    if snapshot is None:
+        if name is not None:
+            print(f"Error: no snapshot named '{name}' in {archive_path}", file=sys.stderr)
+        elif as_of is not None:
+            print(f"Error: no snapshot in {archive_path} was taken on or before {format_date(as_of)}",
+                  file=sys.stderr)
+        else:
+            print(f"Error: {archive_path} has no snapshots", file=sys.stderr)
+        conn.close()
+        sys.exit(1)
+    return snapshot
+
+
+def cmd_archive_restore(archive_path: str, name: str = None, as_of: float = None, output_path: str = None,
+                        compress: str = None, compress_level: int = None):
+    """
+    Rebuild a snapshot's conversations.json from the archive.
+
+    Conversations are rebuilt and written one at a time in their original
+    order, so memory use does not grow with the snapshot. The result holds
+    the same JSON values as the archived export (formatting may differ).
+    """
+    conn = open_archive(archive_path)
+    try:
+        seq, name, _ = _open_snapshot(conn, archive_path, name, as_of)
+        output_path = with_compression_suffix(output_path or f"conversations-{name}.json", compress)
+        manifest = snapshot_manifest(conn, seq)
+        tmp_path = output_path + '.tmp'
+        with open_compressed(tmp_path, 'wt', level=compress_level, codec=compression_of(output_path)) as f:
+            f.write('[')
+            for i, digest in enumerate(manifest):
+                if i:
+                    f.write(', ')
+                f.write(json.dumps(load_archived_conversation(conn, digest)))
+            f.write(']')
+        os.replace(tmp_path, output_path)
+    finally:
+        conn.close()
+
+    record_output(output_path)
+    if _run_stats is not None:
+        _run_stats.counts['conversations'] = len(manifest)
+    print(f"Restored snapshot '{name}': {len(manifest)} conversations to: {output_path} "
+          f"({format_file_size(output_path)})")
+
+
+def cmd_archive_get(archive_path: str, ids: list, name: str = None, as_of: float = None, output_path: str = None,
+                    compress: str = None, compress_level: int = None):
+    """
+    Write conversations as they were in a snapshot (by default the newest,
+    or the newest taken on or before as_of), as a JSON array of their
+    original conversation objects.
+
+    Each conversation is looked up among its stored versions by ID and
+    matched against the snapshot's manifest, so only those conversations
+    are decompressed.
+    """
+    ids = list(dict.fromkeys(ids))
+    conn = open_archive(archive_path)
+    try:
+        seq, name, _ = _open_snapshot(conn, archive_path, name, as_of)
+        manifest = set(snapshot_manifest(conn, seq))
+        found = []
+        for conv_id in ids:
+            versions = [row[0] for row in conn.execute('SELECT hash FROM conversations WHERE id = ?', (conv_id,))]
+            digest = next((d for d in versions if d in manifest), None)
+            if digest is None:
+                print(f"Warning: conversation '{conv_id}' is not in snapshot '{name}'", file=sys.stderr)
+            else:
+                found.append(load_archived_conversation(conn, digest))
+    finally:
+        conn.close()
+    if not found:
+        sys.exit(1)
+
+    if output_path:
+        output_path = with_compression_suffix(output_path, compress)
+    f = open_compressed(output_path, 'wt', level=compress_level) if output_path else sys.stdout
+    try:
+        f.write('[\n')
+        f.write(',\n'.join(json.dumps(conv) for conv in found))
+        f.write('\n]\n')
+    finally:
+        if output_path:
+            f.close()
+
+    if output_path:
+        record_output(output_path)
+        print(f"Exported {len(found)} conversations from snapshot '{name}' to: {output_path} "
+              f"({format_file_size(output_path)})")
+    else:
+        sys.stdout.flush()
+
+
+# Conversation fields compared separately, or that change whenever messages do
+DIFF_SEPARATE_FIELDS = ('mapping', 'title', 'gizmo_id', 'update_time', 'current_node')
+DIFF_DIGEST_SIZE = 16
+
+
+def message_digests(conv: dict) -> dict:
+    """Hash the message of every mapping node, as {node_id: digest} (key order does not matter)"""
+    digests = {}
+    for node_id, node in (conv.get('mapping') or {}).items():
+        message = node.get('message') if isinstance(node, dict) else None
+        if message is not None:
+            digests[node_id] = hashlib.blake2b(json.dumps(message, separators=(',', ':'), sort_keys=True).encode('utf-8'),
+                                               digest_size=DIFF_DIGEST_SIZE).digest()
+    return digests
+
+
+def conversation_digest(conv: dict, messages: dict) -> bytes:
+    """
+    Hash a conversation's metadata (every field but the mapping) and its
+    message digests. Neither key order nor node order changes the hash.
+    """
+    h = hashlib.blake2b(digest_size=DIFF_DIGEST_SIZE)
+    h.update(json.dumps({k: v for k, v in conv.items() if k != 'mapping'}, separators=(',', ':'),
+                        sort_keys=True).encode('utf-8'))
+    for node_id in sorted(messages):
+        h.update(node_id.encode('utf-8'))
+        h.update(messages[node_id])
+    return h.digest()
+
+
+def compare_conversations(old: dict, new: dict) -> list:
+    """
+    The change records between two versions of a conversation: retitled,
+    moved (gizmo_id changed), grew (messages added), edited (messages
+    changed or removed) and updated (any other field). Empty if only
+    the formatting differs.
+    """
+    conv_id, title = new.get('id'), new.get('title')
+    changes = []
+    if old.get('title') != title:
+        changes.append({'record': 'retitled', 'id': conv_id, 'title': title, 'old_title': old.get('title')})
+    if old.get('gizmo_id') != new.get('gizmo_id'):
+        changes.append({'record': 'moved', 'id': conv_id, 'title': title, 'gizmo_id': new.get('gizmo_id'),
+                        'old_gizmo_id': old.get('gizmo_id')})
+
+    old_messages, new_messages = message_digests(old), message_digests(new)
+    added = sum(1 for node_id in new_messages if node_id not in old_messages)
+    removed = sum(1 for node_id in old_messages if node_id not in new_messages)
+    edited = sum(1 for node_id, digest in new_messages.items()
+                 if node_id in old_messages and old_messages[node_id] != digest)
+    if added:
+        changes.append({'record': 'grew', 'id': conv_id, 'title': title, 'messages_added': added,
+                        'message_count': len(new_messages)})
+    if edited or removed:
+        changes.append({'record': 'edited', 'id': conv_id, 'title': title, 'messages_edited': edited,
+                        'messages_removed': removed})
+
+    fields = [k for k in dict.fromkeys(list(old) + list(new))
+              if k not in DIFF_SEPARATE_FIELDS and old.get(k) != new.get(k)]
+    if fields:
+        changes.append({'record': 'updated', 'id': conv_id, 'title': title, 'fields': fields})
+    return changes
+
+
+def diff_exports(old_path: str, new_path: str, counts: dict):
+    """
+    Stream the change records from one export to the next.
+
+    Both exports are streamed once, and each conversation is reduced to a
+    hash of its metadata and per-node message hashes. Only the old
+    export's hashes and byte spans are kept, so memory grows with the
+    number of conversations and not with their content. A conversation
+    whose hash differs is compared field by field and node by node, with
+    the old version read back from its span. Records follow the new
+    export's order, and deletions come last. counts is filled in with the
+    number of conversations of each kind.
+    """
+    stats_phase('old')
+    old_spans = {}
+    for offset, length, conv in iter_conversation_records(old_path):
+        conv_id = conv.get('id')
+        if conv_id is not None:
+            old_spans[conv_id] = (offset, length, conversation_digest(conv, message_digests(conv)))
+
+    stats_phase('new')
+    for _, _, conv in iter_conversation_records(new_path, track_offsets=False):
+        conv_id = conv.get('id')
+        if conv_id is None:
+            continue
+        messages = message_digests(conv)
+        old = old_spans.pop(conv_id, None)
+        if old is None:
+            counts['added'] += 1
+            yield {'record': 'added', 'id': conv_id, 'title': conv.get('title'), 'gizmo_id': conv.get('gizmo_id'),
+                   'message_count': len(messages)}
+            continue
+        if old[2] == conversation_digest(conv, messages):
+            counts['unchanged'] += 1
+            continue
+        changes = compare_conversations(read_conversation_at(old_path, old[0], old[1]), conv)
+        counts['changed' if changes else 'unchanged'] += 1
+        for change in changes:
+            counts[change['record']] += 1
+            yield change
+
+    stats_phase('deleted')
+    for conv_id, (offset, length, _) in old_spans.items():
+        conv = read_conversation_at(old_path, offset, length)
+        counts['deleted'] += 1
+        yield {'record': 'deleted', 'id': conv_id, 'title': conv.get('title'), 'gizmo_id': conv.get('gizmo_id'),
+               'message_count': len(message_digests(conv))}
+
+
+DIFF_COUNTS = ('added', 'deleted', 'changed', 'unchanged', 'retitled', 'moved', 'grew', 'edited', 'updated')
+
+
+def cmd_diff(old_path: str, new_path: str, output_path: str = None, compress: str = None,
+             compress_level: int = None):
+    """
+    Write a JSON Lines change report between two exports: a header line,
+    one line per change, and a summary line with the counts.
+    """
+    for path in (old_path, new_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No such file: '{path}'")
+    if output_path:
+        output_path = with_compression_suffix(output_path, compress)
+
+    counts = dict.fromkeys(DIFF_COUNTS, 0)
+    f = open_compressed(output_path, 'wt', level=compress_level) if output_path else sys.stdout
+    try:
+        out = JsonLinesWriter(f)
+        out.write({'record': 'header', 'generated_at': datetime.now().isoformat(),
+                   'old': os.path.abspath(old_path), 'new': os.path.abspath(new_path)})
+        for change in diff_exports(old_path, new_path, counts):
+            out.write(change)
+        out.write(dict(record='summary', **counts))
+    finally:
+        if output_path:
+            f.close()
+
+    if _run_stats is not None:
+        _run_stats.counts['conversations'] = counts['added'] + counts['changed'] + counts['unchanged']
+    summary = (f"{counts['added']} added, {counts['deleted']} deleted, {counts['changed']} changed "
+               f"({counts['retitled']} retitled, {counts['moved']} moved, {counts['grew']} grew, "
+               f"{counts['edited']} edited, {counts['updated']} updated), {counts['unchanged']} unchanged")
+    if output_path:
+        record_output(output_path)
+        print(f"Diff: {summary}")
+        print(f"Written to: {output_path} ({format_file_size(output_path)})")
+    else:
+        sys.stdout.flush()
+        print(f"Diff: {summary}", file=sys.stderr)
+
+
+PROFILE_TOP_FUNCTIONS = 20
+
+
+def format_seconds(timings: dict) -> str:
+    return '  '.join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+
+
+def finish_run_stats(command: str, stats_file: str = None, profiler=None, profile_file: str = None):
+    """
+    Report the collected stats on stderr and save them.
+
+    The JSON stats file and the cProfile dump go next to the first output
+    file (<output>.stats.json, <output>.prof) unless paths are given;
+    commands without an output file only write the profile
+    (chatgpt_<command>.prof) and any explicit --stats-file.
+    """
+    report = _run_stats.report(command)
+    output = _run_stats.outputs[0] if _run_stats.outputs else None
+
+    if profiler is not None:
+        profile_file = profile_file or (output or f"chatgpt_{command}") + '.prof'
+        profiler.dump_stats(profile_file)
+        report['profile'] = profile_file
+
+    counts = report['counts']
+    print(f"\nStats for {command}: {report['wall_s']:.2f}s wall, peak RSS {report['peak_rss_mb']} MB"
+          + (f" (workers {report['peak_rss_children_mb']} MB)" if report['workers_s'] else ''), file=sys.stderr)
+    print(f"  Phases:  {format_seconds(report['phases_s'])}", file=sys.stderr)
+    if report['inside_s']:
+        print(f"  Inside:  {format_seconds(report['inside_s'])}", file=sys.stderr)
+    if report['workers_s']:
+        print(f"  Workers: {format_seconds(report['workers_s'])} (summed across processes)", file=sys.stderr)
+    print('  Counts:  ' + ', '.join(f"{name.replace('_', ' ')} {n:,}" for name, n in counts.items()), file=sys.stderr)
+
+    if profiler is not None:
+        print(f"\nTop {PROFILE_TOP_FUNCTIONS} functions by cumulative time (full profile: {profile_file}):",
+              file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+
+    stats_file = stats_file or (output + '.stats.json' if output else None)
+    if stats_file:
+        with open(stats_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Stats written to: {stats_file}", file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='ChatGPT Project Conversations Tool',
@@ -577,9 +3252,137 @@ def main():
         default='conversations.json',
         help='Path to conversations.json (default: conversations.json)'
     )
+    parser.add_argument(
+        '--stream',
+        dest='stream',
+        action='store_const',
+        const=True,
+        default=None,
+        help='Stream conversations.json one conversation at a time '
+             f'(default: on for files of {STREAM_THRESHOLD_BYTES // (1024 * 1024)} MB or more)'
+    )
+    parser.add_argument(
+        '--no-stream',
+        dest='stream',
+        action='store_const',
+        const=False,
+        help='Always load conversations.json in full'
+    )
+    parser.add_argument(
+        '--index-file',
+        default=None,
+        help='Path to the sidecar index (default: <conversations-file>.index.sqlite)'
+    )
+    parser.add_argument(
+        '--no-index',
+        action='store_true',
+        help='Ignore the sidecar index even if it is up to date'
+    )
+    parser.add_argument(
+        '--columns',
+        action='store_true',
+        help='Write the list-projects column cache if it is missing or out of date '
+             '(an up-to-date cache is always used; nothing is written without this flag)'
+    )
+    parser.add_argument(
+        '--columns-file',
+        default=None,
+        help='Path to the list-projects column cache (default: <conversations-file>.columns)'
+    )
+    parser.add_argument(
+        '--no-columns',
+        action='store_true',
+        help='Do not use or write the column cache; list-projects scans the conversations instead'
+    )
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='Memory-map the export and decode only the conversations a command needs, '
+             'building the sidecar index first if it is missing or out of date'
+    )
+    parser.add_argument(
+        '--compress',
+        choices=sorted(COMPRESSION_SUFFIXES),
+        default=None,
+        help='Compress the output of export, export-project, export-non-project, get -o and archive restore/get, '
+             'adding .gz or .zst to the file name (an output path ending in .gz or .zst is always compressed)'
+    )
+    parser.add_argument(
+        '--compress-level',
+        type=int,
+        default=None,
+        help='Compression level for compressed output (default: 6 for gzip, 3 for zstd)'
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Report phase times, peak RSS and counts, and save them to <output>.stats.json'
+    )
+    parser.add_argument(
+        '--stats-file',
+        default=None,
+        help='Where to save the --stats JSON (implies --stats; default: <output>.stats.json)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Run under cProfile and save the profile to <output>.prof (implies --stats)'
+    )
+    parser.add_argument(
+        '--profile-file',
+        default=None,
+        help='Where to save the cProfile dump (implies --profile)'
+    )
 
     subparsers = parser.add_subparsers(dest='command', help='Commands')
 
+    # index command
+    subparsers.add_parser('index', help='Build the sidecar index used to answer the other commands quickly')
+
+    # search command
+    search_parser = subparsers.add_parser('search', help='Full-text search of message content')
+    search_parser.add_argument('query', help='Words or FTS5 query ("exact phrase", a OR b, prefix*)')
+    search_parser.add_argument('--project', '-p', help='Only conversations in this project (name or ID)')
+    search_parser.add_argument('--role', help='Only messages from this role (user, assistant, tool, ...)')
+    search_parser.add_argument('--model', help='Only messages from this model (e.g. gpt-4o)')
+    search_parser.add_argument('--since', type=parse_date_arg, help='Only messages on or after this date (YYYY-MM-DD)')
+    search_parser.add_argument('--until', type=parse_date_arg, help='Only messages before this date (YYYY-MM-DD)')
+    search_parser.add_argument('--limit', '-n', type=int, default=20, help='Maximum conversations to show (default: 20)')
+    search_parser.add_argument(
+        '--search-file',
+        default=None,
+        help='Path to the search index (default: <conversations-file>.search.sqlite)'
+    )
+    search_parser.add_argument(
+        '--rebuild',
+        action='store_true',
+        help='Rebuild the search index from scratch instead of updating it'
+    )
+
+    # get command
+    get_parser = subparsers.add_parser('get', help='Print conversations by ID, reading only those conversations')
+    get_parser.add_argument('ids', nargs='+', metavar='ID', help='Conversation ID(s)')
+    get_parser.add_argument(
+        '--output', '-o',
+        default=None,
+        help='Output file path (default: stdout)'
+    )
+    get_parser.add_argument(
+        '--raw',
+        action='store_true',
+        help='Write the original conversation JSON (full mapping) without decoding it'
+    )
+    get_parser.add_argument(
+        '--all-branches',
+        action='store_true',
+        help='Also include messages from abandoned branches (regenerations, edits) as a compact tree'
+    )
+    get_parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Write JSON without indentation or whitespace (smaller output)'
+    )
+
     # list-projects command
     subparsers.add_parser('list-projects', help='List all projects with conversation counts')
 
@@ -591,19 +3394,50 @@ def main():
         action='store_true',
         help='Include full message content (truncated for display)'
     )
+    add_filter_arguments(list_parser)
 
     # export command
     export_parser = subparsers.add_parser('export', help='Export project_conversations.json')
     export_parser.add_argument(
         '--output', '-o',
-        default='project_conversations.json',
-        help='Output file path (default: project_conversations.json)'
+        default=None,
+        help='Output file path (default: project_conversations.json, or .jsonl with --format jsonl)'
     )
     export_parser.add_argument(
         '--with-messages', '-m',
         action='store_true',
         help='Include full message content (warning: large output file)'
     )
+    export_parser.add_argument(
+        '--all-branches',
+        action='store_true',
+        help='Also include messages from abandoned branches (regenerations, edits) as a compact tree'
+    )
+    export_parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Write JSON without indentation or whitespace (smaller output)'
+    )
+    export_parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only re-extract conversations changed since the last run (tracked in <output>.manifest.sqlite)'
+    )
+    export_parser.add_argument(
+        '--format',
+        choices=('json', 'jsonl'),
+        default='json',
+        help='Output format: a single JSON document, or JSON Lines with a header line '
+             'and one conversation per line (default: json)'
+    )
+    export_parser.add_argument(
+        '--workers', '-j',
+        type=int,
+        default=1,
+        help='Decode, extract and serialize conversations in N worker processes, building the sidecar index '
+             'first if it is missing or out of date (default: 1)'
+    )
+    add_filter_arguments(export_parser)
 
     # export-project command
     export_project_parser = subparsers.add_parser('export-project', help='Export a single project with full messages')
@@ -613,30 +3447,459 @@ def main():
         default=None,
         help='Output file path (default: <project_name>_conversations.json)'
     )
+    export_project_parser.add_argument(
+        '--all-branches',
+        action='store_true',
+        help='Also include messages from abandoned branches (regenerations, edits) as a compact tree'
+    )
+    export_project_parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Write JSON without indentation or whitespace (smaller output)'
+    )
+    export_project_parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only re-extract conversations changed since the last run (tracked in <output>.manifest.sqlite)'
+    )
+    export_project_parser.add_argument(
+        '--format',
+        choices=('json', 'jsonl'),
+        default='json',
+        help='Output format: a single JSON document, or JSON Lines with a header line '
+             'and one conversation per line (default: json)'
+    )
+
+    add_filter_arguments(export_project_parser)
 
     # export-non-project command
     export_non_project_parser = subparsers.add_parser('export-non-project', help='Export all conversations that don\'t belong to any project')
     export_non_project_parser.add_argument(
         '--output', '-o',
-        default='non_project_conversations.json',
-        help='Output file path (default: non_project_conversations.json)'
+        default=None,
+        help='Output file path (default: non_project_conversations.json, or .jsonl with --format jsonl)'
     )
     export_non_project_parser.add_argument(
         '--with-messages', '-m',
         action='store_true',
         help='Include full message content (warning: large output file)'
     )
+    export_non_project_parser.add_argument(
+        '--all-branches',
+        action='store_true',
+        help='Also include messages from abandoned branches (regenerations, edits) as a compact tree'
+    )
+    export_non_project_parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Write JSON without indentation or whitespace (smaller output)'
+    )
+    export_non_project_parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only re-extract conversations changed since the last run (tracked in <output>.manifest.sqlite)'
+    )
+    export_non_project_parser.add_argument(
+        '--format',
+        choices=('json', 'jsonl'),
+        default='json',
+        help='Output format: a single JSON document, or JSON Lines with a header line '
+             'and one conversation per line (default: json)'
+    )
+    export_non_project_parser.add_argument(
+        '--workers', '-j',
+        type=int,
+        default=1,
+        help='Decode, extract and serialize conversations in N worker processes, building the sidecar index '
+             'first if it is missing or out of date (default: 1)'
+    )
+    add_filter_arguments(export_non_project_parser)
+
+    # export-all-projects command
+    export_all_parser = subparsers.add_parser(
+        'export-all-projects', help='Export every project into its memory folder in a single pass')
+    export_all_parser.add_argument(
+        '--project', '-p',
+        action='append',
+        help='Only this project (name or ID; repeatable). Default: all projects'
+    )
+    export_all_parser.add_argument(
+        '--memory-dir',
+        default=DEFAULT_MEMORY_PROJECTS_DIR,
+        help='Project memory directory; writes <memory-dir>/<project>/conversations.json '
+             '(default: claude-memory/memory/projects)'
+    )
+    export_all_parser.add_argument(
+        '--all-branches',
+        action='store_true',
+        help='Also include messages from abandoned branches (regenerations, edits) as a compact tree'
+    )
+    export_all_parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Write JSON without indentation or whitespace (smaller output)'
+    )
+    export_all_parser.add_argument(
+        '--format',
+        choices=('json', 'jsonl'),
+        default='json',
+        help='Output format, as for export-project; jsonl writes conversations.jsonl (default: json)'
+    )
+    export_all_parser.add_argument(
+        '--max-open-files',
+        type=int,
+        default=DEFAULT_MAX_OPEN_FILES,
+        help=f'Project files kept open at once while scanning (default: {DEFAULT_MAX_OPEN_FILES})'
+    )
+    add_filter_arguments(export_all_parser)
+
+    # generate-contexts command
+    contexts_parser = subparsers.add_parser(
+        'generate-contexts', help='Generate context.md for every project with a summarizer command')
+    contexts_parser.add_argument(
+        '--summarizer',
+        default=DEFAULT_SUMMARIZER,
+        help='Command that reads the prompt and conversations on stdin and writes context.md to stdout '
+             f'(default: "{DEFAULT_SUMMARIZER}")'
+    )
+    contexts_parser.add_argument(
+        '--project', '-p',
+        action='append',
+        help='Only this project (name or ID; repeatable). Default: all projects'
+    )
+    contexts_parser.add_argument(
+        '--memory-dir',
+        default=DEFAULT_MEMORY_PROJECTS_DIR,
+        help='Project memory directory; writes <memory-dir>/<project>/context.md '
+             '(default: claude-memory/memory/projects)'
+    )
+    contexts_parser.add_argument(
+        '--prompt-file',
+        default=DEFAULT_CONTEXT_PROMPT,
+        help='Prompt given to the summarizer (default: the "## Prompt" section of generate-context-prompt.md)'
+    )
+    contexts_parser.add_argument(
+        '--max-input-bytes',
+        type=int,
+        default=DEFAULT_CONTEXT_INPUT_BYTES,
+        help='Summarizer input size limit; older conversations beyond it are left out '
+             f'(default: {DEFAULT_CONTEXT_INPUT_BYTES})'
+    )
+    contexts_parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=4,
+        help='Summarizer processes run at once (default: 4)'
+    )
+    contexts_parser.add_argument(
+        '--timeout',
+        type=float,
+        default=DEFAULT_SUMMARIZER_TIMEOUT,
+        help=f'Seconds before a summarizer run is abandoned (default: {DEFAULT_SUMMARIZER_TIMEOUT})'
+    )
+    contexts_parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Regenerate every project, including unchanged ones and hand-written context.md files'
+    )
+    contexts_parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Show which projects would be generated without running the summarizer'
+    )
+
+    # diff command
+    diff_parser = subparsers.add_parser('diff', help='Report what changed between two exports, as JSON Lines')
+    diff_parser.add_argument('old', help='The earlier conversations.json')
+    diff_parser.add_argument('new', help='The later conversations.json')
+    diff_parser.add_argument(
+        '--output', '-o',
+        default=None,
+        help='Output file path (default: stdout)'
+    )
+
+    # archive command
+    archive_parser = subparsers.add_parser(
+        'archive', help='Keep every export in a deduplicated snapshot archive and restore from it')
+    archive_parser.add_argument(
+        '--archive-file',
+        default=DEFAULT_ARCHIVE_PATH,
+        help=f'Path to the snapshot archive (default: {DEFAULT_ARCHIVE_PATH})'
+    )
+    archive_subparsers = archive_parser.add_subparsers(dest='archive_command', help='Archive commands')
+    archive_add_parser = archive_subparsers.add_parser(
+        'add', help='Add --conversations-file to the archive as a new snapshot')
+    archive_add_parser.add_argument(
+        '--name',
+        default=None,
+        help="Snapshot name (default: the snapshot's date, YYYY-MM-DD)"
+    )
+    archive_add_parser.add_argument(
+        '--date',
+        type=parse_date_arg,
+        default=None,
+        help='When the export was taken (YYYY-MM-DD; default: its newest conversation update)'
+    )
+    archive_subparsers.add_parser('list', help='List archived snapshots')
+    archive_restore_parser = archive_subparsers.add_parser(
+        'restore', help='Rebuild the conversations.json of a snapshot')
+    archive_restore_parser.add_argument(
+        'snapshot', nargs='?', default=None, help='Snapshot name (default: the newest, or see --as-of)')
+    archive_restore_parser.add_argument(
+        '--as-of', type=parse_as_of_arg, default=None, help='The newest snapshot taken on or before this date')
+    archive_restore_parser.add_argument(
+        '--output', '-o',
+        default=None,
+        help='Output file path (default: conversations-<snapshot>.json)'
+    )
+    archive_get_parser = archive_subparsers.add_parser(
+        'get', help='Print conversations by ID as they were in a snapshot')
+    archive_get_parser.add_argument('ids', nargs='+', metavar='ID', help='Conversation ID(s)')
+    archive_get_parser.add_argument(
+        '--snapshot', default=None, help='Snapshot name (default: the newest, or see --as-of)')
+    archive_get_parser.add_argument(
+        '--as-of', type=parse_as_of_arg, default=None, help='The newest snapshot taken on or before this date')
+    archive_get_parser.add_argument(
+        '--output', '-o',
+        default=None,
+        help='Output file path (default: stdout)'
+    )
 
     args = parser.parse_args()
 
     if not args.command:
         parser.print_help()
         sys.exit(1)
+    if args.command == 'archive' and not args.archive_command:
+        archive_parser.print_help()
+        sys.exit(1)
+
+    if getattr(args, 'incremental', False) and getattr(args, 'workers', 1) > 1:
+        parser.error('--incremental cannot be combined with --workers')
+    if getattr(args, 'incremental', False) and args.stream is False:
+        parser.error('--incremental cannot be combined with --no-stream')
+    if getattr(args, 'workers', 1) > 1 and args.stream is False:
+        parser.error('--workers cannot be combined with --no-stream')
+    if args.mmap and args.no_index:
+        parser.error('--mmap cannot be combined with --no-index')
+    if args.columns and args.no_columns:
+        parser.error('--columns cannot be combined with --no-columns')
+    if zstandard is None and (args.compress == 'zstd' or any(
+            compression_of(path or '') == 'zstd'
+            for path in (args.conversations_file, args.projects_file, getattr(args, 'output', None),
+                         getattr(args, 'old', None), getattr(args, 'new', None)))):
+        parser.error('.zst files and --compress zstd need the zstandard package (pip install zstandard)')
+    if getattr(args, 'max_open_files', 1) < 1:
+        parser.error('--max-open-files must be at least 1')
+    if getattr(args, 'concurrency', 1) < 1:
+        parser.error('--concurrency must be at least 1')
+    if getattr(args, 'workers', 1) < 1:
+        parser.error('--workers must be at least 1')
+
+    global _run_stats
+    profiler = None
+    if args.profile or args.profile_file:
+        profiler = cProfile.Profile()
+    if args.stats or args.stats_file or profiler is not None:
+        _run_stats = RunStats()
+
+    if profiler is not None:
+        profiler.enable()
+    run_command(args)
+    if profiler is not None:
+        profiler.disable()
+
+    if _run_stats is not None:
+        finish_run_stats(args.command, args.stats_file, profiler, args.profile_file)
+
+
+def run_command(args):
+    """Load the data a command needs and run it"""
+    index_path = args.index_file or default_index_path(args.conversations_file)
+
+    if args.command == 'index':
+        stats_phase('index')
+        try:
+            cmd_index(args.conversations_file, index_path)
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.command == 'get':
+        stats_phase('command')
+        try:
+            index = None if args.no_index else open_conversation_index(
+                index_path, args.conversations_file, build=args.mmap)
+            cmd_get(args.conversations_file, args.ids, index=index, output_path=args.output, raw=args.raw,
+                    all_branches=args.all_branches, compact=args.compact, compress=args.compress,
+                    compress_level=args.compress_level)
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.command == 'export-all-projects':
+        stats_phase('scan')
+        try:
+            projects = load_projects(args.projects_file)
+            index = None if args.no_index else open_conversation_index(
+                index_path, args.conversations_file, build=args.mmap)
+            cmd_export_all_projects(projects, args.conversations_file, index=index, memory_dir=args.memory_dir,
+                                    project_queries=args.project, all_branches=args.all_branches,
+                                    compact=args.compact, output_format=args.format,
+                                    max_open_files=args.max_open_files,
+                                    conv_filter=ConversationFilter.from_args(args))
+            if index is not None:
+                index.close()
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.command == 'diff':
+        try:
+            cmd_diff(args.old, args.new, output_path=args.output, compress=args.compress,
+                     compress_level=args.compress_level)
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.command == 'archive':
+        stats_phase('archive')
+        try:
+            if args.archive_command == 'add':
+                cmd_archive_add(args.conversations_file, args.archive_file, name=args.name, taken_at=args.date)
+            elif args.archive_command == 'list':
+                cmd_archive_list(args.archive_file)
+            elif args.archive_command == 'restore':
+                cmd_archive_restore(args.archive_file, name=args.snapshot, as_of=args.as_of, output_path=args.output,
+                                    compress=args.compress, compress_level=args.compress_level)
+            elif args.archive_command == 'get':
+                cmd_archive_get(args.archive_file, args.ids, name=args.snapshot, as_of=args.as_of,
+                                output_path=args.output, compress=args.compress, compress_level=args.compress_level)
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.command == 'search':
+        stats_phase('search')
+        try:
+            # Project names are only needed for --project and display
+            projects = load_projects(args.projects_file) if os.path.exists(args.projects_file) else []
+            index = None if args.no_index else open_conversation_index(
+                index_path, args.conversations_file, build=args.mmap)
+            cmd_search(args.query, projects, args.conversations_file,
+                       args.search_file or default_search_index_path(args.conversations_file), index=index,
+                       project_query=args.project, role=args.role, model=args.model,
+                       since=args.since, until=args.until, limit=args.limit, rebuild=args.rebuild)
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.command == 'list-projects' and not args.no_columns:
+        # Counts and date ranges come from the column cache, not conversation dicts
+        stats_phase('load')
+        try:
+            projects = load_projects(args.projects_file)
+            index = None if args.no_index else open_conversation_index(
+                index_path, args.conversations_file, build=args.mmap)
+            columns = load_conversation_columns(
+                args.conversations_file, args.columns_file or default_columns_path(args.conversations_file), index,
+                save=args.columns)
+            if index is not None:
+                index.close()
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}", file=sys.stderr)
+            sys.exit(1)
+        stats_phase('command')
+        if _run_stats is not None:
+            _run_stats.counts['conversations'] = len(columns)
+        cmd_list_projects(projects, aggregates=columns.project_aggregates())
+        return
 
     # Load data
+    stats_phase('load')
+    conv_filter = ConversationFilter.from_args(args)
     try:
         projects = load_projects(args.projects_file)
-        conversations = load_conversations(args.conversations_file)
+
+        stream = args.stream
+        if stream is None:
+            stream = os.path.getsize(args.conversations_file) >= STREAM_THRESHOLD_BYTES
+        workers = getattr(args, 'workers', 1)
+        if getattr(args, 'incremental', False) or workers > 1:
+            # Incremental exports identify unchanged conversations by their raw bytes, and
+            # workers are sent them; both need each conversation's span
+            stream = True
+
+        index = None
+        if args.command in INDEXED_COMMANDS and not args.no_index:
+            # Workers get their spans from the index, so the parent never decodes the export
+            index = open_conversation_index(index_path, args.conversations_file, build=args.mmap or workers > 1)
+
+        # Streamed and indexed conversations are re-read for their messages while writing
+        with_messages = args.command in ('export-project', 'generate-contexts') or getattr(args, 'with_messages', False)
+
+        if index is not None:
+            # Answer from the index, reading back only the needed conversations
+            if args.command in ('list', 'export-project'):
+                project = find_project(args.project, projects)
+                conversations = []
+                if project and project.get('project_id'):
+                    conversations = load_indexed_conversations(
+                        index, args.conversations_file,
+                        gizmo_id=project.get('project_id'), with_spans=with_messages)
+            elif args.command == 'export-non-project':
+                conversations = load_indexed_conversations(
+                    index, args.conversations_file, gizmo_id=None, with_spans=with_messages)
+            else:
+                conversations = load_indexed_conversations(
+                    index, args.conversations_file, with_spans=with_messages)
+        elif stream:
+            keep = None
+            if args.command in ('list', 'export-project'):
+                # Only the requested project's conversations are kept
+                project = find_project(args.project, projects)
+                pid = project.get('project_id') if project else None
+                keep = lambda conv: pid is not None and conv.get('gizmo_id') == pid
+            elif args.command == 'generate-contexts':
+                pids = {p['project_id'] for p in select_projects(args.project, projects)}
+                keep = lambda conv: conv.get('gizmo_id') in pids
+            if conv_filter is not None:
+                # Rejected conversations are dropped while scanning
+                project_keep = keep
+                keep = lambda conv: (project_keep is None or project_keep(conv)) and conv_filter.accepts(conv)
+            conversations = stream_conversations(args.conversations_file, keep=keep, with_spans=with_messages)
+        else:
+            conversations = load_conversations(args.conversations_file)
+
+        if index is not None:
+            index.close()
     except FileNotFoundError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -644,19 +3907,51 @@ def main():
         print(f"Error parsing JSON: {e}", file=sys.stderr)
         sys.exit(1)
 
+    if conv_filter is not None:
+        # Loaded and indexed conversations are filtered before any messages are extracted
+        conversations = [conv for conv in conversations if conv_filter.accepts(conv)]
+
+    stats_phase('group')
     conversations_grouped = group_conversations_by_project(conversations)
+    if _run_stats is not None:
+        _run_stats.counts['conversations'] = len(conversations)
 
     # Execute command
+    stats_phase('command')
+    if getattr(args, 'workers', 1) > 1 and with_messages:
+        with SummaryPool(args.workers) as pool:
+            execute_command(args, projects, conversations, conversations_grouped, conv_filter, pool)
+    else:
+        execute_command(args, projects, conversations, conversations_grouped, conv_filter, None)
+
+
+def execute_command(args, projects: list, conversations: list, conversations_grouped: dict, conv_filter, pool):
+    """Run a command that works on loaded conversations"""
     if args.command == 'list-projects':
         cmd_list_projects(projects, conversations_grouped)
     elif args.command == 'list':
-        cmd_list_conversations(args.project, projects, conversations_grouped, with_messages=args.with_messages)
+        cmd_list_conversations(args.project, projects, conversations_grouped, with_messages=args.with_messages,
+                               conv_filter=conv_filter)
     elif args.command == 'export':
-        cmd_export(projects, conversations, conversations_grouped, args.output, with_messages=args.with_messages)
+        cmd_export(projects, conversations, conversations_grouped, args.output, with_messages=args.with_messages,
+                   all_branches=args.all_branches, compact=args.compact, output_format=args.format,
+                   incremental=args.incremental, conv_filter=conv_filter, compress=args.compress,
+                   compress_level=args.compress_level, pool=pool)
     elif args.command == 'export-project':
-        cmd_export_project(args.project, projects, conversations_grouped, args.output)
+        cmd_export_project(args.project, projects, conversations_grouped, args.output, all_branches=args.all_branches,
+                           compact=args.compact, output_format=args.format, incremental=args.incremental,
+                           conv_filter=conv_filter, compress=args.compress, compress_level=args.compress_level)
     elif args.command == 'export-non-project':
-        cmd_export_non_project(conversations_grouped, args.output, with_messages=args.with_messages)
+        cmd_export_non_project(conversations_grouped, args.output, with_messages=args.with_messages,
+                               all_branches=args.all_branches, compact=args.compact, output_format=args.format,
+                               incremental=args.incremental, conv_filter=conv_filter, compress=args.compress,
+                               compress_level=args.compress_level, pool=pool)
+    elif args.command == 'generate-contexts':
+        cmd_generate_contexts(projects, conversations_grouped, memory_dir=args.memory_dir,
+                              summarizer=args.summarizer, project_queries=args.project,
+                              prompt_path=args.prompt_file, max_input_bytes=args.max_input_bytes,
+                              concurrency=args.concurrency, timeout=args.timeout, force=args.force,
+                              dry_run=args.dry_run)
 
 
 if __name__ == '__main__':
@@ -10,18 +10,43 @@ Usage:
   3) Run:
        python3 chatgpt_projects_dump.py --curl-file curl.txt
 
+  4) Optionally also fetch each project's conversation list:
+       python3 chatgpt_projects_dump.py --curl-file curl.txt --fetch-conversations
+  5) Or download full conversation bodies for a project straight into
+     claude-memory/memory/projects/<name>/conversations.json:
+       python3 chatgpt_projects_dump.py --curl-file curl.txt --fetch-bodies --project "Research"
+
 Outputs:
-  - projects_raw.json  (full API responses merged)
-  - projects.json      (flattened list of projects + lightweight metadata)
+  - projects_raw.json            (full API responses merged)
+  - projects.json                (flattened list of projects + lightweight metadata)
+  - projects_conversations.json  (with --fetch-conversations: conversations per project)
+
+Progress is checkpointed to projects.checkpoint.json after every page, so an
+interrupted run picks up where it stopped. Pass --fresh to start over.
+
+With --compress gzip (or zstd) the outputs and the body cache are written
+compressed (projects.json.gz, ...); chatgpt_project_conversations.py reads
+them as they are.
 """
 
 import argparse
+import asyncio
 import json
+import os
+import random
 import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from chatgpt_project_conversations import (
+    COMPRESSION_SUFFIXES, DEFAULT_MEMORY_PROJECTS_DIR, cmd_export_project, compression_of, open_compressed,
+    safe_project_name, select_projects, with_compression_suffix, zstandard
+)
 
 
 def parse_curl(curl_text: str):
@@ -98,6 +123,290 @@ def extract_projects_from_payload(payload: dict):
     return projects
 
 
+def next_cursor_from_payload(payload: dict):
+    # Cursor / pagination fields vary; try common possibilities
+    return (
+        payload.get("next_cursor")
+        or payload.get("cursor")
+        or (payload.get("pagination") or {}).get("next_cursor")
+        or (payload.get("data") or {}).get("next_cursor")
+    )
+
+
+# HTTP statuses worth retrying: rate limiting and server-side hiccups
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """A request that failed permanently (or ran out of retries)."""
+
+    def __init__(self, message: str, body: str = ""):
+        super().__init__(message)
+        self.body = body
+
+
+def fetch_json(session, url: str, headers: dict, retries: int = 5, backoff: float = 1.0, timeout: float = 60):
+    """
+    GET a JSON document, retrying connection errors, timeouts, 429 and 5xx
+    with exponential backoff (plus jitter). Honors Retry-After when present.
+    """
+    for attempt in range(retries + 1):
+        try:
+            resp = session.get(url, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise FetchError(f"Request failed after {retries + 1} attempts: {e}") from e
+            reason, delay = type(e).__name__, None
+        else:
+            if resp.status_code == 200:
+                return resp.json()
+            if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                raise FetchError(f"Request failed: HTTP {resp.status_code}", resp.text[:2000])
+            reason = f"HTTP {resp.status_code}"
+            try:
+                delay = float(resp.headers.get("Retry-After", ""))
+            except ValueError:
+                delay = None
+
+        if delay is None:
+            delay = backoff * (2 ** attempt) * (1 + random.random() / 2)
+        print(f"  {reason}, retrying in {delay:.1f}s ({attempt + 1}/{retries})", file=sys.stderr)
+        time.sleep(delay)
+
+
+def make_session(pool_size: int = 10):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+CHECKPOINT_VERSION = 1
+
+
+def write_json_atomic(path: str, data, level: int = None):
+    tmp = f"{path}.tmp"
+    with open_compressed(tmp, "wt", level=level, codec=compression_of(path)) as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str, first_url: str):
+    """Load a checkpoint left by an interrupted run, if it belongs to the same request."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable checkpoint {path}: {e}", file=sys.stderr)
+        return None
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("first_url") != first_url:
+        print(f"Warning: {path} is from a different request; starting over", file=sys.stderr)
+        return None
+    return checkpoint
+
+
+def write_raw_json(raw_log_path: str, out_path: str, level: int = None):
+    """Turn the JSONL page log into the projects_raw.json array, one page in memory at a time."""
+    with open(raw_log_path, "r", encoding="utf-8") as src, open_compressed(out_path, "wt", level=level) as out:
+        out.write("[")
+        first = True
+        for line in src:
+            if not line.strip():
+                continue
+            page = json.dumps(json.loads(line), indent=2)
+            out.write("\n  " if first else ",\n  ")
+            out.write(page.replace("\n", "\n  "))
+            first = False
+        out.write("]" if first else "\n]")
+
+
+def backend_url(base_url: str, path: str, params: dict = None):
+    """Build another /backend-api/ URL on the same host as the copied cURL request."""
+    parsed = urlparse(base_url)
+    return urlunparse((parsed.scheme, parsed.netloc, path, "", urlencode(params or {}), ""))
+
+
+def fetch_project_conversations(session, base_url: str, headers: dict, project_id: str,
+                                max_pages: int, retries: int, backoff: float):
+    """Fetch every conversation listed for one project (/backend-api/gizmos/<id>/conversations)."""
+    items = []
+    cursor = "0"
+    for _ in range(max_pages):
+        url = backend_url(base_url, f"/backend-api/gizmos/{project_id}/conversations", {"cursor": cursor})
+        payload = fetch_json(session, url, headers, retries, backoff)
+        items.extend(payload.get("items", []) or [])
+        cursor = next_cursor_from_payload(payload)
+        if not cursor:
+            break
+    return items
+
+
+class RateLimiter:
+    """
+    Spaces request starts at least 1/rate seconds apart (rate <= 0 means unlimited).
+
+    Create it inside the event loop that uses it: before Python 3.10 an
+    asyncio.Lock is bound to the loop current when it is made.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+CACHE_SUFFIXES = (".json",) + tuple(".json" + suffix for suffix in COMPRESSION_SUFFIXES.values())
+
+
+def conversation_cache_path(cache_dir: str, conversation_id: str, update_time, compress: str = None):
+    """Cache file for one version of a conversation: <id>-<update_time>.json (.gz/.zst when compressed)"""
+    stamp = re.sub(r"[^0-9A-Za-z.]+", "-", str(update_time)).strip("-")
+    return with_compression_suffix(os.path.join(cache_dir, f"{conversation_id}-{stamp}.json"), compress)
+
+
+def find_cached_conversation(path: str):
+    """The cached copy of path, compressed or not (a cache survives toggling --compress), or None"""
+    base = path[:path.rindex(".json")]
+    for suffix in CACHE_SUFFIXES:
+        if os.path.exists(base + suffix):
+            return base + suffix
+    return None
+
+
+class BodyFetcher:
+    """
+    Downloads full conversation bodies (/backend-api/conversation/<id>).
+    asyncio schedules the blocking `requests` calls on a thread pool, at
+    most `concurrency` at a time, started no faster than `rate` per second. Bodies are cached on disk keyed
+    by conversation id and update_time, so unchanged conversations are never
+    downloaded twice.
+    """
+
+    def __init__(self, session, base_url: str, headers: dict, cache_dir: str,
+                 concurrency: int, rate: float, retries: int, backoff: float, max_pages: int,
+                 compress: str = None, compress_level: int = None):
+        self.session = session
+        self.base_url = base_url
+        self.headers = headers
+        self.cache_dir = cache_dir
+        self.concurrency = concurrency
+        self.rate = rate
+        # Made in projects(), inside the running loop (see RateLimiter)
+        self.semaphore = None
+        self.limiter = None
+        self.executor = None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pages = max_pages
+        self.compress = compress
+        self.compress_level = compress_level
+        self.downloaded = 0
+        self.cached = 0
+
+    async def get(self, url: str):
+        async with self.semaphore:
+            await self.limiter.wait()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fetch_json, self.session, url, self.headers,
+                                              self.retries, self.backoff)
+
+    async def list_conversations(self, project_id: str):
+        items = []
+        cursor = "0"
+        for _ in range(self.max_pages):
+            url = backend_url(self.base_url, f"/backend-api/gizmos/{project_id}/conversations", {"cursor": cursor})
+            payload = await self.get(url)
+            items.extend(payload.get("items", []) or [])
+            cursor = next_cursor_from_payload(payload)
+            if not cursor:
+                break
+        return items
+
+    async def conversation(self, item: dict):
+        conversation_id = item.get("id") or item.get("conversation_id")
+        update_time = item.get("update_time")
+        path = conversation_cache_path(self.cache_dir, conversation_id, update_time, self.compress) if update_time else None
+
+        cached = find_cached_conversation(path) if path else None
+        if cached:
+            with open_compressed(cached, "rt") as f:
+                self.cached += 1
+                return json.load(f)
+
+        body = await self.get(backend_url(self.base_url, f"/backend-api/conversation/{conversation_id}"))
+        # The bulk export has both keys; the API body only has conversation_id
+        body.setdefault("id", conversation_id)
+        body.setdefault("conversation_id", conversation_id)
+        self.downloaded += 1
+
+        if path:
+            # Drop older versions of this conversation before caching the new one
+            prefix = f"{conversation_id}-"
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(prefix) and name.endswith(CACHE_SUFFIXES):
+                    os.remove(os.path.join(self.cache_dir, name))
+            write_json_atomic(path, body, self.compress_level)
+        return body
+
+    async def project(self, project_id: str):
+        items = await self.list_conversations(project_id)
+        return await asyncio.gather(*(self.conversation(item) for item in items))
+
+    async def projects(self, project_ids: list):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.limiter = RateLimiter(self.rate)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            results = await asyncio.gather(*(self.project(pid) for pid in project_ids))
+        finally:
+            self.executor.shutdown()
+        return dict(zip(project_ids, results))
+
+    def run(self, project_ids: list) -> dict:
+        """Fetch the bodies of the given projects, as {project_id: [conversation, ...]}"""
+        return asyncio.run(self.projects(project_ids))
+
+
+def fetch_bodies(args, session, base_url: str, headers: dict, projects: list):
+    """--fetch-bodies: write each selected project's conversations.json under the memory directory."""
+    selected = select_projects(args.project, projects)
+
+    cache_dir = args.cache_dir or f"{args.out_prefix}_cache"
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fetcher = BodyFetcher(session, base_url, headers, cache_dir, args.concurrency, args.rate,
+                          args.retries, args.backoff, args.max_pages, args.compress, args.compress_level)
+    print(f"\nFetching conversation bodies for {len(selected)} projects "
+          f"({args.concurrency} at a time{f', {args.rate:g}/s' if args.rate > 0 else ''})...")
+    started = time.monotonic()
+    bodies = fetcher.run([p["project_id"] for p in selected])
+    print(f"Fetched {fetcher.downloaded} conversations, {fetcher.cached} from cache "
+          f"({time.monotonic() - started:.1f}s)\n")
+
+    written = []
+    for project in selected:
+        pid = project["project_id"]
+        project_dir = os.path.join(args.memory_dir, safe_project_name(project))
+        os.makedirs(project_dir, exist_ok=True)
+        output_path = os.path.join(project_dir, "conversations.json")
+        cmd_export_project(pid, projects, {pid: bodies[pid]}, output_path=output_path)
+        written.append(output_path)
+    return written
+
 
 def main():
     ap = argparse.ArgumentParser()
@@ -106,8 +415,35 @@ def main():
     ap.add_argument("--conversations-per-project", type=int, default=0, help="Set conversations_per_gizmo (0 is smallest)")
     ap.add_argument("--max-pages", type=int, default=50, help="Safety limit for pagination pages")
     ap.add_argument("--out-prefix", default="projects", help="Output file prefix (default: projects)")
+    ap.add_argument("--fresh", action="store_true", help="Ignore any checkpoint from an interrupted run and start over")
+    ap.add_argument("--retries", type=int, default=5, help="Retries for timeouts, 429 and 5xx responses (default: 5)")
+    ap.add_argument("--backoff", type=float, default=1.0, help="Initial retry delay in seconds, doubled each attempt (default: 1.0)")
+    ap.add_argument("--fetch-conversations", action="store_true",
+                    help="Also fetch each project's full conversation list into <prefix>_conversations.json")
+    ap.add_argument("--concurrency", type=int, default=4,
+                    help="Parallel requests (and pooled connections) for --fetch-conversations/--fetch-bodies (default: 4)")
+    ap.add_argument("--fetch-bodies", action="store_true",
+                    help="Download full conversation bodies into <memory-dir>/<project>/conversations.json")
+    ap.add_argument("--project", action="append",
+                    help="Limit --fetch-bodies to this project (name or ID; repeatable). Default: all projects")
+    ap.add_argument("--rate", type=float, default=0,
+                    help="Maximum requests per second for --fetch-bodies (default: unlimited)")
+    ap.add_argument("--cache-dir", default=None,
+                    help="Conversation body cache for --fetch-bodies (default: <prefix>_cache)")
+    ap.add_argument("--memory-dir", default=DEFAULT_MEMORY_PROJECTS_DIR,
+                    help="Project memory directory for --fetch-bodies (default: claude-memory/memory/projects)")
+    ap.add_argument("--compress", choices=sorted(COMPRESSION_SUFFIXES), default=None,
+                    help="Compress the output files and the body cache, adding .gz or .zst to their names "
+                         "(files in --memory-dir stay plain for claude-memory)")
+    ap.add_argument("--compress-level", type=int, default=None,
+                    help="Compression level (default: 6 for gzip, 3 for zstd)")
     args = ap.parse_args()
 
+    if args.concurrency < 1:
+        ap.error("--concurrency must be at least 1")
+    if args.compress == "zstd" and zstandard is None:
+        ap.error("--compress zstd needs the zstandard package (pip install zstandard)")
+
     curl_text = open(args.curl_file, "r", encoding="utf-8").read()
     base_url, headers = parse_curl(curl_text)
 
@@ -121,64 +457,144 @@ def main():
     }
     if args.owned_only:
         params["owned_only"] = "true"
-
-    next_cursor = None
-    all_payloads = []
-    all_projects = []
-    seen_project_ids = set()
-
-    session = requests.Session()
-
-    for page in range(1, args.max_pages + 1):
-        page_params = dict(params)
-        if next_cursor:
-            page_params["cursor"] = next_cursor
-
-        url = rebuild_url_with_params(base_url, page_params)
-
-        resp = session.get(url, headers=headers, timeout=60)
-        if resp.status_code != 200:
-            print(f"Request failed: HTTP {resp.status_code}", file=sys.stderr)
-            print(resp.text[:2000], file=sys.stderr)
-            sys.exit(2)
-
-        payload = resp.json()
-        all_payloads.append(payload)
-
-        projects = extract_projects_from_payload(payload)
-        for p in projects:
-            pid = p.get("project_id")
-            if pid and pid not in seen_project_ids:
-                seen_project_ids.add(pid)
-                all_projects.append(p)
-
-        # Cursor / pagination fields vary; try common possibilities
-        next_cursor = (
-            payload.get("next_cursor")
-            or payload.get("cursor")
-            or payload.get("pagination", {}).get("next_cursor")
-            or payload.get("data", {}).get("next_cursor")
-        )
-
-        print(f"Page {page}: +{len(projects)} (unique total: {len(all_projects)}) cursor={bool(next_cursor)}")
-
-        if not next_cursor:
-            break
+    first_url = rebuild_url_with_params(base_url, dict(params, cursor=None))
+
+    checkpoint_path = f"{args.out_prefix}.checkpoint.json"
+    raw_log_path = f"{args.out_prefix}_raw.jsonl.partial"
+
+    checkpoint = None if args.fresh else load_checkpoint(checkpoint_path, first_url)
+    if checkpoint and (not os.path.exists(raw_log_path) or os.path.getsize(raw_log_path) < checkpoint["raw_bytes"]):
+        # Truncating a missing or short log would pad it with NUL bytes
+        print(f"Warning: {raw_log_path} is missing or shorter than {checkpoint_path} records; starting over",
+              file=sys.stderr)
+        checkpoint = None
+    if checkpoint:
+        # Drop any page appended after the last checkpoint was written
+        with open(raw_log_path, "a", encoding="utf-8") as f:
+            f.truncate(checkpoint["raw_bytes"])
+        print(f"Resuming from {checkpoint_path}: {checkpoint['pages']} pages, "
+              f"{len(checkpoint['projects'])} projects, {len(checkpoint['conversations'])} conversation lists")
+    else:
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "first_url": first_url,
+            "pages": 0,
+            "cursor": None,
+            "sidebar_done": False,
+            "raw_bytes": 0,
+            "projects": [],
+            "conversations": {},
+        }
+        open(raw_log_path, "w", encoding="utf-8").close()
+        write_json_atomic(checkpoint_path, checkpoint)
+
+    all_projects = checkpoint["projects"]
+    seen_project_ids = {p.get("project_id") for p in all_projects}
+
+    session = make_session(args.concurrency)
+
+    try:
+        with open(raw_log_path, "a", encoding="utf-8") as raw_log:
+            while not checkpoint["sidebar_done"] and checkpoint["pages"] < args.max_pages:
+                page = checkpoint["pages"] + 1
+                page_params = dict(params)
+                if checkpoint["cursor"]:
+                    page_params["cursor"] = checkpoint["cursor"]
+
+                url = rebuild_url_with_params(base_url, page_params)
+                payload = fetch_json(session, url, headers, args.retries, args.backoff)
+
+                raw_log.write(json.dumps(payload) + "\n")
+                raw_log.flush()
+
+                projects = extract_projects_from_payload(payload)
+                for p in projects:
+                    pid = p.get("project_id")
+                    if pid and pid not in seen_project_ids:
+                        seen_project_ids.add(pid)
+                        all_projects.append(p)
+
+                next_cursor = next_cursor_from_payload(payload)
+                checkpoint.update(
+                    pages=page,
+                    cursor=next_cursor,
+                    sidebar_done=not next_cursor,
+                    raw_bytes=raw_log.tell(),
+                )
+                write_json_atomic(checkpoint_path, checkpoint)
+
+                print(f"Page {page}: +{len(projects)} (unique total: {len(all_projects)}) cursor={bool(next_cursor)}")
+
+        conversations = checkpoint["conversations"]
+        if args.fetch_conversations:
+            pending = [p["project_id"] for p in all_projects
+                       if p.get("project_id") and p["project_id"] not in conversations]
+            if pending:
+                print(f"\nFetching conversations for {len(pending)} projects ({args.concurrency} at a time)...")
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                futures = {
+                    pool.submit(fetch_project_conversations, session, base_url, headers, pid,
+                                args.max_pages, args.retries, args.backoff): pid
+                    for pid in pending
+                }
+                for future in as_completed(futures):
+                    pid = futures[future]
+                    items = future.result()
+                    # Only this (main) thread updates the checkpoint; workers just return their lists
+                    conversations[pid] = items
+                    write_json_atomic(checkpoint_path, checkpoint)
+                    print(f"  {pid}: {len(items)} conversations")
+    except FetchError as e:
+        print(str(e), file=sys.stderr)
+        if e.body:
+            print(e.body, file=sys.stderr)
+        print(f"Progress saved to {checkpoint_path}; re-run the same command to resume.", file=sys.stderr)
+        sys.exit(2)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Progress saved to {checkpoint_path}; re-run the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+
+    raw_path = with_compression_suffix(f"{args.out_prefix}_raw.json", args.compress)
+    projects_path = with_compression_suffix(f"{args.out_prefix}.json", args.compress)
+    conversations_path = with_compression_suffix(f"{args.out_prefix}_conversations.json", args.compress)
 
     # Save raw merged payloads
-    with open(f"{args.out_prefix}_raw.json", "w", encoding="utf-8") as f:
-        json.dump(all_payloads, f, indent=2)
+    write_raw_json(raw_log_path, raw_path, args.compress_level)
 
     # Save flattened projects list (still keeps raw objects inside each entry)
-    with open(f"{args.out_prefix}.json", "w", encoding="utf-8") as f:
+    with open_compressed(projects_path, "wt", level=args.compress_level) as f:
         json.dump(all_projects, f, indent=2)
 
+    written = [raw_path, projects_path]
+    if args.fetch_conversations:
+        with open_compressed(conversations_path, "wt", level=args.compress_level) as f:
+            json.dump(
+                [{"project_id": p["project_id"], "name": p.get("name"), "conversations": conversations[p["project_id"]]}
+                 for p in all_projects if p.get("project_id") in conversations],
+                f,
+                indent=2,
+            )
+        written.append(conversations_path)
+
+    os.remove(checkpoint_path)
+    os.remove(raw_log_path)
+
+    if args.fetch_bodies:
+        try:
+            written += fetch_bodies(args, session, base_url, headers, all_projects)
+        except FetchError as e:
+            print(str(e), file=sys.stderr)
+            if e.body:
+                print(e.body, file=sys.stderr)
+            print("Bodies downloaded so far are cached; re-run the same command to continue.", file=sys.stderr)
+            sys.exit(2)
+
     # Print a small human summary
     print("\nProjects:")
     for p in all_projects:
         print(f"- {p.get('name') or '(no name)'}  [{p.get('project_id')}]")
 
-    print(f"\nWrote: {args.out_prefix}_raw.json and {args.out_prefix}.json")
+    print(f"\nWrote: {', '.join(written[:-1])} and {written[-1]}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""
+Checks for the benchmark suite in benchmarks/
+
+The generator must be deterministic for baselines to be comparable, and
+bench.py is run end to end on a tiny dataset.
+
+Usage:
+  python3 -m pytest -q export-chatgpt-conversations/tests
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.join(TOOL_DIR, 'benchmarks', 'bench.py')
+sys.path.insert(0, os.path.join(TOOL_DIR, 'benchmarks'))
+
+from generate_export import ensure_export, generate_export
+
+SIZE = {'projects': 3, 'conversations': 30, 'nodes': 10, 'branching': 0.3, 'message_size': 60}
+TINY = ['--projects', '2', '--conversations', '10', '--nodes', '6', '--message-size', '40']
+
+
+def read_bytes(directory) -> dict:
+    return {name: (directory / name).read_bytes() for name in ('conversations.json', 'projects.json')}
+
+
+def test_generator_is_deterministic(tmp_path):
+    generate_export(str(tmp_path / 'a'), seed=7, **SIZE)
+    generate_export(str(tmp_path / 'b'), seed=7, **SIZE)
+    generate_export(str(tmp_path / 'c'), seed=8, **SIZE)
+    assert read_bytes(tmp_path / 'a') == read_bytes(tmp_path / 'b')
+    assert read_bytes(tmp_path / 'a')['conversations.json'] != read_bytes(tmp_path / 'c')['conversations.json']
+
+    conversations = json.loads((tmp_path / 'a' / 'conversations.json').read_text(encoding='utf-8'))
+    assert len(conversations) == SIZE['conversations']
+    # Newest first, as in a real export
+    times = [c['update_time'] for c in conversations]
+    assert times == sorted(times, reverse=True)
+    for conv in conversations:
+        assert conv['current_node'] in conv['mapping']
+
+
+def test_ensure_export_reuses_matching_dataset(tmp_path):
+    ensure_export(str(tmp_path), seed=1, **SIZE)
+    path = tmp_path / 'conversations.json'
+    mtime = os.stat(path).st_mtime_ns
+    ensure_export(str(tmp_path), seed=1, **SIZE)
+    assert os.stat(path).st_mtime_ns == mtime
+    ensure_export(str(tmp_path), seed=2, **SIZE)
+    assert json.loads((tmp_path / 'synthetic.json').read_text(encoding='utf-8'))['seed'] == 2
+
+
+def test_bench_save_and_compare(tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    args = [sys.executable, BENCH, '--data-dir', str(tmp_path / 'data'), *TINY, '--repeat', '1',
+            '--case', 'load_conversations', '--case', 'cmd_export']
+    result = subprocess.run([*args, '--save', str(baseline)], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(baseline.read_text(encoding='utf-8'))
+    assert sorted(report['results']) == ['cmd_export', 'load_conversations']
+    assert report['dataset']['conversations'] == 10
+    for case in report['results'].values():
+        assert case['best_s'] >= 0 and case['peak_alloc_mb'] >= 0
+
+    # Against an impossibly fast cmd_export baseline the current run is a regression
+    report['results']['cmd_export']['best_s'] = -1.0
+    baseline.write_text(json.dumps(report), encoding='utf-8')
+    result = subprocess.run([*args, '--compare', str(baseline)], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True)
+    assert result.returncode == 1
+    assert 'cmd_export: best_s -1.000' in result.stdout
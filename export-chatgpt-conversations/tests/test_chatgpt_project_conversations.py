@@ -0,0 +1,648 @@
+"""
+Regression checks for chatgpt_project_conversations.py
+
+Each check runs the tool as a subprocess on a small synthetic export (see
+benchmarks/generate_export.py), so nothing is shared between runs.
+
+Usage:
+  python3 -m pytest -q export-chatgpt-conversations/tests
+"""
+
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL = os.path.join(TOOL_DIR, 'chatgpt_project_conversations.py')
+sys.path.insert(0, os.path.join(TOOL_DIR, 'benchmarks'))
+
+from generate_export import generate_export
+
+sys.path.insert(0, TOOL_DIR)
+import chatgpt_project_conversations as tool
+
+SIZE = {'projects': 3, 'conversations': 20, 'nodes': 12, 'branching': 0.2, 'message_size': 80}
+
+
+def run(cwd, *args) -> str:
+    result = subprocess.run([sys.executable, TOOL, *args], cwd=cwd, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def load_output(path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data.pop('generated_at', None)
+    return data
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    generate_export(str(tmp_path), seed=1, **SIZE)
+    return tmp_path
+
+
+def first_project_id(export_dir) -> str:
+    with open(export_dir / 'projects.json', 'r', encoding='utf-8') as f:
+        return json.load(f)[0]['project_id']
+
+
+def conversations(export_dir) -> list:
+    with open(export_dir / 'conversations.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_crlf_export_spans_match_full_load(export_dir):
+    # Indented with CRLF line endings: every byte offset after the first
+    # line break differs from the same text read with universal newlines
+    convs = conversations(export_dir)
+    with open(export_dir / 'conversations.json', 'w', encoding='utf-8', newline='\r\n') as f:
+        json.dump(convs, f, indent=1)
+
+    run(export_dir, '--no-stream', 'export', '-m', '-o', 'full.json')
+    run(export_dir, '--stream', '--no-index', 'export', '-m', '-o', 'stream.json')
+    run(export_dir, 'index')
+    run(export_dir, 'export', '-m', '-o', 'indexed.json')
+    expected = load_output(export_dir / 'full.json')
+    assert load_output(export_dir / 'stream.json') == expected
+    assert load_output(export_dir / 'indexed.json') == expected
+
+    target = convs[-1]
+    raw = json.loads(run(export_dir, 'get', target['id'], '--raw'))
+    assert raw == [target]
+    summary = json.loads(run(export_dir, 'get', target['id']))
+    assert [conv['id'] for conv in summary] == [target['id']]
+
+
+@pytest.mark.parametrize('options', [[], ['--compact'], ['--format', 'jsonl']])
+def test_incremental_export_survives_metadata_only_run(export_dir, options):
+    first = run(export_dir, 'export', '-m', '--incremental', '-o', 'out.json', *options)
+    extracted = int(re.search(r'Incremental: (\d+) re-extracted, 0 reused', first).group(1))
+    assert extracted > 0
+
+    # Without messages there is nothing to reuse, and the manifest must be left alone
+    run(export_dir, 'export', '--incremental', '-o', 'out.json', *options)
+    again = run(export_dir, 'export', '-m', '--incremental', '-o', 'out.json', *options)
+    assert f"0 re-extracted, {extracted} reused" in again
+
+    run(export_dir, 'export', '-m', '-o', 'full.json', *options)
+    with open(export_dir / 'out.json', encoding='utf-8') as a, open(export_dir / 'full.json', encoding='utf-8') as b:
+        assert [line for line in a if 'generated_at' not in line] == [line for line in b if 'generated_at' not in line]
+
+
+@pytest.mark.parametrize('command', ['export', 'export-non-project'])
+def test_workers_match_single_process(export_dir, command):
+    run(export_dir, command, '-m', '-o', 'serial.json')
+    run(export_dir, command, '-m', '--workers', '2', '-o', 'workers.json')
+    assert load_output(export_dir / 'workers.json') == load_output(export_dir / 'serial.json')
+
+
+@pytest.mark.parametrize('workers', ['0', '-2'])
+def test_workers_must_be_positive(export_dir, workers):
+    result = subprocess.run([sys.executable, TOOL, 'export', '-m', '--workers', workers], cwd=export_dir,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 2
+    assert '--workers must be at least 1' in result.stderr
+
+
+def reorder_keys(value):
+    """The same JSON value with every object's keys in reverse order"""
+    if isinstance(value, dict):
+        return {k: reorder_keys(value[k]) for k in reversed(list(value))}
+    if isinstance(value, list):
+        return [reorder_keys(item) for item in value]
+    return value
+
+
+def test_diff_ignores_key_order(export_dir):
+    convs = conversations(export_dir)
+    with open(export_dir / 'reordered.json', 'w', encoding='utf-8') as f:
+        json.dump(reorder_keys(convs), f)
+
+    output = run(export_dir, 'diff', 'conversations.json', 'reordered.json')
+    records = [json.loads(line) for line in output.splitlines()]
+    assert [r['record'] for r in records] == ['header', 'summary']
+    assert records[-1]['unchanged'] == len(convs)
+
+    # A real edit is still reported
+    node = next(node for node in convs[0]['mapping'].values() if node.get('message'))
+    node['message']['content'] = {'content_type': 'text', 'parts': ['changed']}
+    with open(export_dir / 'edited.json', 'w', encoding='utf-8') as f:
+        json.dump(reorder_keys(convs), f)
+    output = run(export_dir, 'diff', 'conversations.json', 'edited.json')
+    records = [json.loads(line) for line in output.splitlines()]
+    assert [r['record'] for r in records if r['record'] not in ('header', 'summary')] == ['edited']
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_export_all_projects_matches_export_project(export_dir, indexed):
+    if indexed:
+        run(export_dir, 'index')
+    run(export_dir, 'export-all-projects', '--memory-dir', 'memory')
+    exported = {}
+    for folder in os.listdir(export_dir / 'memory'):
+        data = load_output(export_dir / 'memory' / folder / 'conversations.json')
+        exported[data['project']['project_id']] = data
+    assert len(exported) > 1
+
+    for project_id, data in exported.items():
+        run(export_dir, 'export-project', project_id, '-o', 'single.json')
+        assert data == load_output(export_dir / 'single.json')
+
+
+def test_stream_gives_up_on_malformed_conversation(tmp_path, monkeypatch):
+    # The second element never closes its string, so it only "ends" at EOF
+    path = tmp_path / 'conversations.json'
+    path.write_text('[{"id": "a"}, {"id": "b", "title": "' + 'x' * 1000000 + '}, {"id": "c"}]', encoding='utf-8')
+    read_sizes = []
+    open_compressed = tool.open_compressed
+
+    def counting_open(*args, **kwargs):
+        f = open_compressed(*args, **kwargs)
+        read = f.read
+        f.read = lambda size=-1: read_sizes.append(size) or read(size)
+        return f
+
+    monkeypatch.setattr(tool, 'open_compressed', counting_open)
+    records = tool.iter_conversation_records(str(path), chunk_size=1024, max_record_size=10000)
+    assert next(records)[2] == {'id': 'a'}
+    with pytest.raises(json.JSONDecodeError, match='Conversation 2 is not valid JSON within 10,000 characters'):
+        next(records)
+    assert sum(read_sizes) < 50000
+
+    # A conversation larger than the read buffer but within the limit still decodes
+    path.write_text('[{"id": "a"}, {"id": "b", "title": "' + 'x' * 5000 + '"}]', encoding='utf-8')
+    assert [conv['id'] for _, _, conv in tool.iter_conversation_records(str(path), chunk_size=1024,
+                                                                       max_record_size=10000)] == ['a', 'b']
+
+
+def exported_conversations(data) -> list:
+    """Every conversation summary in an export, project or not"""
+    convs = [conv for project in data['projects'] for conv in project['conversations']]
+    for group in data['non_project_conversations'].values():
+        convs.extend(group['conversations'])
+    convs.extend((data.get('orphaned_project_conversations') or {}).get('conversations', []))
+    return convs
+
+
+def node(node_id, parent, children, role=None, text=None) -> dict:
+    message = None
+    if role:
+        message = {'id': node_id, 'author': {'role': role}, 'create_time': 0,
+                   'content': {'content_type': 'text', 'parts': [text]}}
+    return {'id': node_id, 'parent': parent, 'children': children, 'message': message}
+
+
+# u1 was answered twice (a1, then the regeneration a1b); the user went on from a1b
+BRANCHED = {
+    'root': node('root', None, ['u1']),
+    'u1': node('u1', 'root', ['a1', 'a1b'], 'user', 'question'),
+    'a1': node('a1', 'u1', [], 'assistant', 'first answer'),
+    'a1b': node('a1b', 'u1', ['u2'], 'assistant', 'second answer'),
+    'u2': node('u2', 'a1b', [], 'user', 'thanks'),
+}
+
+
+def test_current_branch_selection():
+    ids = lambda messages: [m['id'] for m in messages]
+    assert tool.find_current_branch(BRANCHED, 'u2') == ['root', 'u1', 'a1b', 'u2']
+    assert ids(tool.extract_messages_from_mapping(BRANCHED, 'u2')) == ['u1', 'a1b', 'u2']
+    # current_node on the abandoned branch selects that branch instead
+    assert ids(tool.extract_messages_from_mapping(BRANCHED, 'a1')) == ['u1', 'a1']
+    # Without current_node, the latest child is followed from the root
+    assert ids(tool.extract_messages_from_mapping(BRANCHED)) == ['u1', 'a1b', 'u2']
+
+    branches = tool.extract_message_branches(BRANCHED, 'u2')
+    assert [(m['id'], m['parent']) for m in branches] == [('a1', 'u1')]
+
+
+def test_current_branch_of_a_deep_tree():
+    # Far deeper than the recursion limit
+    depth = 20000
+    mapping = {'n0': node('n0', None, ['n1'])}
+    for i in range(1, depth):
+        mapping[f"n{i}"] = node(f"n{i}", f"n{i - 1}", [f"n{i + 1}"] if i < depth - 1 else [],
+                                'user' if i % 2 else 'assistant', f"message {i}")
+    assert len(tool.extract_messages_from_mapping(mapping, f"n{depth - 1}")) == depth - 1
+    assert tool.extract_message_branches(mapping, f"n{depth - 1}") == []
+
+
+def test_all_branches_export_covers_every_message(export_dir):
+    run(export_dir, 'export', '-m', '--all-branches', '-o', 'branches.json')
+    exported = {conv['id']: conv for conv in exported_conversations(load_output(export_dir / 'branches.json'))}
+    assert any(conv['branches'] for conv in exported.values())
+
+    raw = {conv['id']: conv for conv in conversations(export_dir)}
+    for conv_id, summary in exported.items():
+        conv = raw[conv_id]
+        mapping = conv['mapping']
+        texts = {nid for nid, n in mapping.items() if n['message'] and n['message']['content']['parts'][0]}
+        current = []
+        node_id = conv['current_node']
+        while node_id:
+            current.append(node_id)
+            node_id = mapping[node_id]['parent']
+        expected = [mapping[nid]['message']['id'] for nid in reversed(current) if nid in texts]
+
+        assert [m['id'] for m in summary['messages']] == expected
+        branch_ids = {m['id'] for m in summary['branches']}
+        assert branch_ids == {mapping[nid]['message']['id'] for nid in texts} - set(expected)
+        known = set(expected) | branch_ids
+        assert all(m['parent'] is None or m['parent'] in known for m in summary['branches'])
+
+
+@pytest.mark.parametrize('indent', [2, None])
+def test_stream_writer_matches_json_dumps(indent):
+    doc = {'a': 1, 'empty': {}, 'none': [], 'items': [{'x': [1, 2, {'y': 'z'}]}, 'text', {'nested': {'k': [True, None]}}]}
+    f = io.StringIO()
+    out = tool.JsonStreamWriter(f, indent=indent)
+    out.begin_object()
+    out.value(doc['a'], key='a')
+    out.begin_object('empty')
+    out.end_object()
+    out.begin_array('none')
+    out.end_array()
+    out.begin_array('items')
+    out.raw(out.serialize(doc['items'][0]))
+    out.value(doc['items'][1])
+    out.begin_object()
+    out.value(doc['items'][2]['nested'], key='nested')
+    out.end_object()
+    out.end_array()
+    out.end_object()
+    separators = None if indent else (',', ':')
+    assert f.getvalue() == json.dumps(doc, indent=indent, separators=separators)
+
+
+@pytest.mark.parametrize('name', ['export', 'export-non-project', 'export-project'])
+def test_streamed_output_matches_full_load(export_dir, name):
+    command = [name, first_project_id(export_dir)] if name == 'export-project' else [name, '-m']
+    run(export_dir, '--no-stream', *command, '-o', 'full.json')
+    run(export_dir, '--stream', '--no-index', *command, '-o', 'stream.json')
+    run(export_dir, '--stream', '--no-index', *command, '--compact', '-o', 'compact.json')
+    with open(export_dir / 'full.json', encoding='utf-8') as a, open(export_dir / 'stream.json', encoding='utf-8') as b:
+        assert [line for line in a if 'generated_at' not in line] == [line for line in b if 'generated_at' not in line]
+    with open(export_dir / 'compact.json', encoding='utf-8') as f:
+        assert '\n' not in f.read().strip()
+    assert load_output(export_dir / 'compact.json') == load_output(export_dir / 'full.json')
+
+
+def test_jsonl_export_matches_json_export(export_dir):
+    run(export_dir, 'export', '-m', '-o', 'out.json')
+    run(export_dir, 'export', '-m', '--format', 'jsonl', '-o', 'out.jsonl')
+    data = load_output(export_dir / 'out.json')
+    with open(export_dir / 'out.jsonl', 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+
+    assert records[0]['record'] == 'header'
+    assert records[0]['summary'] == data['summary']
+    convs = [r for r in records[1:] if r['record'] == 'conversation']
+    assert len(convs) == len(records) - 1
+    categories = {r['category'] for r in convs}
+    assert {'project', 'regular', 'orphaned_project'} <= categories
+
+    by_project = {project['project_id']: project for project in data['projects']}
+    for r in convs:
+        if r['category'] == 'project':
+            assert r['id'] in {conv['id'] for conv in by_project[r.pop('project_id')]['conversations']}
+        del r['record'], r['category']
+    assert convs == exported_conversations(data)
+
+
+def test_jsonl_export_project_matches_json(export_dir):
+    project_id = first_project_id(export_dir)
+    run(export_dir, 'export-project', project_id, '-o', 'out.json')
+    run(export_dir, 'export-project', project_id, '--format', 'jsonl', '-o', 'out.jsonl')
+    data = load_output(export_dir / 'out.json')
+    with open(export_dir / 'out.jsonl', 'r', encoding='utf-8') as f:
+        header, *records = [json.loads(line) for line in f]
+    assert header['project'] == data['project']
+    for r in records:
+        assert (r.pop('record'), r.pop('category'), r.pop('project_id')) == ('conversation', 'project', project_id)
+    assert records == data['conversations']
+
+
+def plant_word(export_dir, index, text) -> str:
+    """Put text into the first user message of conversation index, as an edit would; returns its ID"""
+    convs = conversations(export_dir)
+    conv = convs[index]
+    message = next(n['message'] for n in conv['mapping'].values()
+                   if n['message'] and n['message']['author']['role'] == 'user')
+    message['content']['parts'] = [text]
+    conv['update_time'] += 1
+    with open(export_dir / 'conversations.json', 'w', encoding='utf-8') as f:
+        json.dump(convs, f)
+    return conv['id']
+
+
+def test_search_plain_and_invalid_queries(export_dir):
+    first = plant_word(export_dir, 0, 'a quasar named zyxwvut appears')
+    output = run(export_dir, 'search', 'zyxwvut')
+    assert 'Updated search index: 20 added' in output
+    assert first in output and '[zyxwvut]' in output
+
+    # Not valid FTS5 syntax: searched as plain words instead of failing
+    for query in ('"zyxwvut', 'quasar zyxwvut)', 'zyxwvut*:'):
+        output = run(export_dir, 'search', query)
+        assert 'Updated search index' not in output
+        assert first in output, query
+    assert '(no matches)' in run(export_dir, 'search', 'NEAR(')
+
+    # Only the changed conversation is re-indexed
+    second = plant_word(export_dir, 1, 'zyxwvut again')
+    output = run(export_dir, 'search', 'zyxwvut')
+    assert 'Updated search index: 0 added, 1 changed, 0 removed, 19 unchanged' in output
+    assert first in output and second in output
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_stats_do_not_change_output(export_dir, workers):
+    run(export_dir, 'export', '-m', '--workers', workers, '-o', 'plain.json')
+    run(export_dir, '--stats', 'export', '-m', '--workers', workers, '-o', 'stats.json')
+    assert load_output(export_dir / 'stats.json') == load_output(export_dir / 'plain.json')
+    assert not os.path.exists(export_dir / 'plain.json.stats.json')
+
+    with open(export_dir / 'stats.json.stats.json', 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    for key in ('version', 'command', 'argv', 'started_at', 'wall_s', 'phases_s', 'inside_s', 'workers_s',
+                'counts', 'outputs', 'peak_rss_mb', 'python'):
+        assert key in report, key
+    assert report['command'] == 'export'
+    assert report['outputs'] == ['stats.json']
+    assert report['counts']['bytes_written'] == os.path.getsize(export_dir / 'stats.json')
+    assert report['counts']['conversations_decoded'] > 0
+    assert bool(report['workers_s']) == (workers != '1')
+
+
+def test_profile_writes_stats_and_profile(export_dir):
+    run(export_dir, '--profile', 'export', '-o', 'out.json')
+    assert os.path.getsize(export_dir / 'out.json.prof') > 0
+    with open(export_dir / 'out.json.stats.json', 'r', encoding='utf-8') as f:
+        assert json.load(f)['profile'] == 'out.json.prof'
+
+
+@pytest.mark.parametrize('name', ['export', 'export-non-project', 'export-project'])
+def test_mmap_output_matches_streamed(export_dir, name):
+    command = [name, first_project_id(export_dir)] if name == 'export-project' else [name, '-m']
+    run(export_dir, '--no-index', *command, '-o', 'stream.json')
+    # --mmap builds the index on first use, then reuses it
+    run(export_dir, '--mmap', *command, '-o', 'mmap.json')
+    assert os.path.exists(export_dir / 'conversations.json.index.sqlite')
+    run(export_dir, '--mmap', *command, '-o', 'mmap-again.json')
+    expected = load_output(export_dir / 'stream.json')
+    assert load_output(export_dir / 'mmap.json') == expected
+    assert load_output(export_dir / 'mmap-again.json') == expected
+
+    # A stale index is rebuilt rather than read at old offsets
+    convs = conversations(export_dir)
+    convs[0]['title'] = 'Renamed ' + 'x' * 100
+    with open(export_dir / 'conversations.json', 'w', encoding='utf-8') as f:
+        json.dump(convs, f, indent=1)
+    run(export_dir, '--no-index', *command, '-o', 'stream.json')
+    run(export_dir, '--mmap', *command, '-o', 'mmap.json')
+    assert load_output(export_dir / 'mmap.json') == load_output(export_dir / 'stream.json')
+
+
+def test_get_reads_conversations_by_span(export_dir):
+    convs = conversations(export_dir)
+    wanted = [convs[-1], convs[0], convs[len(convs) // 2]]
+    ids = [conv['id'] for conv in wanted]
+    raw = json.loads(run(export_dir, '--mmap', 'get', *ids, '--raw'))
+    assert raw == wanted
+
+    summaries = json.loads(run(export_dir, '--mmap', 'get', *ids))
+    run(export_dir, '--no-index', 'export', '-m', '-o', 'all.json')
+    exported = {conv['id']: conv for conv in exported_conversations(load_output(export_dir / 'all.json'))}
+    assert [summary['id'] for summary in summaries] == ids
+    # Custom GPT conversations are not in the export; the rest must read the same either way
+    compared = [summary for summary in summaries if summary['id'] in exported]
+    assert compared
+    for summary in compared:
+        assert summary['messages'] == exported[summary['id']]['messages']
+
+
+def test_column_cache_matches_scan(export_dir):
+    expected = run(export_dir, '--no-columns', 'list-projects')
+    assert run(export_dir, '--columns', 'list-projects') == expected
+    cache = export_dir / 'conversations.json.columns'
+    mtime = os.stat(cache).st_mtime_ns
+    assert run(export_dir, '--columns', 'list-projects') == expected
+    assert os.stat(cache).st_mtime_ns == mtime
+    # Built from the sidecar index instead of the export, the columns are the same
+    run(export_dir, 'index')
+    assert run(export_dir, '--no-columns', 'list-projects') == expected
+    assert run(export_dir, '--columns', '--columns-file', 'indexed.columns', 'list-projects') == expected
+
+    # Moving conversations between projects makes the cache stale; it is rebuilt, not reused
+    convs = conversations(export_dir)
+    project_id = first_project_id(export_dir)
+    moved = [conv for conv in convs if conv.get('gizmo_id') == project_id][:2]
+    for conv in moved:
+        conv['gizmo_id'] = None
+    with open(export_dir / 'conversations.json', 'w', encoding='utf-8') as f:
+        json.dump(convs, f)
+    changed = run(export_dir, '--no-columns', '--no-index', 'list-projects')
+    assert changed != expected
+    assert run(export_dir, '--columns', 'list-projects') == changed
+    assert os.stat(cache).st_mtime_ns != mtime
+    assert run(export_dir, 'list-projects') == changed
+
+
+SUMMARIZER = '''
+import os, sys
+text = sys.stdin.read()
+if os.environ['MEMSPAN_PROJECT_NAME'] == os.environ.get('FAIL_PROJECT'):
+    sys.exit('summarizer failed')
+print(f"# {os.environ['MEMSPAN_PROJECT_NAME']}")
+print(f"{len(text.encode('utf-8'))} bytes, truncated: {'older conversations omitted' in text}")
+'''
+
+
+def generate_contexts(export_dir, *args, env=None) -> subprocess.CompletedProcess:
+    summarizer = export_dir / 'summarize.py'
+    summarizer.write_text(SUMMARIZER, encoding='utf-8')
+    return subprocess.run([sys.executable, TOOL, 'generate-contexts', '--memory-dir', 'memory',
+                           '--summarizer', f"{sys.executable} {summarizer}", *args],
+                          cwd=export_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                          env=dict(os.environ, **(env or {})))
+
+
+def test_generate_contexts_skips_unchanged_projects(export_dir):
+    with open(export_dir / 'projects.json', 'r', encoding='utf-8') as f:
+        projects = {p['project_id']: p for p in json.load(f)}
+    active = {conv['gizmo_id'] for conv in conversations(export_dir) if conv.get('gizmo_id') in projects}
+
+    result = generate_contexts(export_dir)
+    assert result.returncode == 0, result.stderr
+    assert f"Generated: {len(active)}" in result.stdout
+    contexts = {path.parent.name: path.read_text(encoding='utf-8')
+                for path in (export_dir / 'memory').glob('*/context.md')}
+    assert len(contexts) == len(active)
+    for name, text in contexts.items():
+        assert text.startswith('# ') and 'truncated: False' in text
+
+    result = generate_contexts(export_dir)
+    assert f"Unchanged: {len(active)}" in result.stdout and 'Generated' not in result.stdout
+
+    # Only the project whose conversations changed is regenerated
+    convs = conversations(export_dir)
+    target = next(conv for conv in convs if conv.get('gizmo_id') in active)
+    target['title'] = 'Retitled'
+    target['update_time'] += 1
+    with open(export_dir / 'conversations.json', 'w', encoding='utf-8') as f:
+        json.dump(convs, f)
+    result = generate_contexts(export_dir)
+    assert 'Generated: 1' in result.stdout and f"Unchanged: {len(active) - 1}" in result.stdout
+    assert f"generated  {projects[target['gizmo_id']]['name']}" in result.stdout
+
+    # A smaller input limit changes every input; the newest history is kept and the rest cut
+    result = generate_contexts(export_dir, '--max-input-bytes', '2000')
+    assert f"Generated: {len(active)}" in result.stdout
+    for path in (export_dir / 'memory').glob('*/context.md'):
+        size = int(path.read_text(encoding='utf-8').splitlines()[1].split()[0])
+        assert size <= 2000
+
+
+def test_generate_contexts_keeps_hand_written_and_reports_failures(export_dir):
+    assert generate_contexts(export_dir).returncode == 0
+    context, other = sorted((export_dir / 'memory').glob('*/context.md'))[:2]
+    os.remove(context.parent / '.context.sha256')
+    context.write_text('Hand-written.\n', encoding='utf-8')
+    result = generate_contexts(export_dir)
+    assert 'Kept: 1' in result.stdout
+    assert context.read_text(encoding='utf-8') == 'Hand-written.\n'
+
+    # A failing summarizer leaves that project's context.md alone and fails the run
+    before = other.read_text(encoding='utf-8')
+    result = generate_contexts(export_dir, '--force', env={'FAIL_PROJECT': before.splitlines()[0][2:]})
+    assert result.returncode == 1
+    assert 'Failed: 1' in result.stdout and 'summarizer failed' in result.stdout
+    assert other.read_text(encoding='utf-8') == before
+    # --force replaced the hand-written one
+    assert context.read_text(encoding='utf-8') != 'Hand-written.\n'
+
+
+def filter_conversations(data, since=None, until=None, role=None, model=None, title=None) -> dict:
+    """Apply the filters to an unfiltered export -m output, conversation by conversation"""
+    kept = {}
+    for conv in exported_conversations(data):
+        if since is not None and (conv['update_time'] or conv['create_time'] or 0) < since:
+            continue
+        if until is not None and (conv['create_time'] or 0) >= until:
+            continue
+        if title is not None and not re.search(title, conv['title'] or '', re.IGNORECASE):
+            continue
+        messages = []
+        for msg in conv['messages']:
+            created = msg['create_time'] or conv['create_time'] or 0
+            if ((role is None or msg['role'] == role) and (model is None or (msg['model'] or conv['model']) == model)
+                    and (since is None or created >= since) and (until is None or created < until)):
+                messages.append(msg)
+        kept[conv['id']] = messages
+    return kept
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_filters_match_filtering_the_full_export(export_dir, indexed):
+    if indexed:
+        run(export_dir, 'index')
+    run(export_dir, 'export', '-m', '-o', 'all.json')
+    full = load_output(export_dir / 'all.json')
+    total = sum(len(conv['messages']) for conv in exported_conversations(full))
+
+    # Dates inside the history, so each bound drops some conversations
+    times = sorted(conv['create_time'] for conv in exported_conversations(full))
+    start, end = (tool.datetime.fromtimestamp(t).strftime('%Y-%m-%d') for t in (times[5], times[-5]))
+    cases = [
+        (['--role', 'user'], {'role': 'user'}),
+        (['--model', 'gpt-4o'], {'model': 'gpt-4o'}),
+        (['--title', '^(memory|data)'], {'title': '^(memory|data)'}),
+        (['--since', start], {'since': tool.parse_date_arg(start)}),
+        (['--since', start, '--until', end, '--role', 'assistant'],
+         {'since': tool.parse_date_arg(start), 'until': tool.parse_date_arg(end), 'role': 'assistant'}),
+    ]
+    for args, options in cases:
+        run(export_dir, 'export', '-m', *args, '-o', 'filtered.json')
+        filtered = {conv['id']: conv['messages']
+                    for conv in exported_conversations(load_output(export_dir / 'filtered.json'))}
+        assert filtered == filter_conversations(full, **options), args
+        assert filtered and sum(map(len, filtered.values())) < total, args
+
+
+def compress_file(path, codec):
+    """Write path + .gz/.zst next to path and return the new path"""
+    target = path.parent / (path.name + tool.COMPRESSION_SUFFIXES[codec])
+    with open(path, 'rb') as src, tool.open_compressed(str(target), 'wb', codec=codec) as dst:
+        dst.write(src.read())
+    return target
+
+
+@pytest.mark.parametrize('codec', ['gzip', 'zstd'])
+def test_compressed_input_and_output_round_trip(export_dir, codec):
+    if codec == 'zstd':
+        pytest.importorskip('zstandard')
+    for name in ('conversations.json', 'projects.json'):
+        compress_file(export_dir / name, codec)
+    suffix = tool.COMPRESSION_SUFFIXES[codec]
+    inputs = ['--conversations-file', f"conversations.json{suffix}", '--projects-file', f"projects.json{suffix}"]
+
+    run(export_dir, 'export', '-m', '-o', 'plain.json')
+    run(export_dir, *inputs, '--compress', codec, 'export', '-m', '-o', 'packed.json')
+    with tool.open_compressed(str(export_dir / f"packed.json{suffix}"), 'rt') as f:
+        data = json.load(f)
+    data.pop('generated_at')
+    assert data == load_output(export_dir / 'plain.json')
+    assert not os.path.exists(export_dir / 'packed.json')
+
+    # Random access decompresses once, then reads spans like an uncompressed export
+    convs = conversations(export_dir)
+    ids = [convs[-1]['id'], convs[0]['id']]
+    assert json.loads(run(export_dir, *inputs, '--mmap', 'get', *ids, '--raw')) == [convs[-1], convs[0]]
+
+
+def test_zstd_without_package_is_a_usage_error(export_dir):
+    if tool.zstandard is not None:
+        pytest.skip('zstandard is installed')
+    result = subprocess.run([sys.executable, TOOL, '--compress', 'zstd', 'export', '-o', 'out.json'], cwd=export_dir,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 2
+    assert 'need the zstandard package' in result.stderr
+    assert not os.path.exists(export_dir / 'out.json.zst')
+
+
+def test_archive_round_trip_and_dedupe(export_dir):
+    original = conversations(export_dir)
+    messages = sum(1 for conv in original for node in conv['mapping'].values() if node['message'])
+    output = run(export_dir, 'archive', 'add', '--name', 'v1', '--date', '2025-01-01')
+    assert f"{len(original)} conversations, {len(original)} new or changed, {messages} new messages" in output
+    assert 'nothing added' in run(export_dir, 'archive', 'add', '--name', 'again')
+
+    # Edit one message and re-indent the file: only that conversation and message are new
+    edited = json.loads(json.dumps(original))
+    target = edited[3]
+    node = next(n for n in target['mapping'].values() if n['message'])
+    node['message']['content']['parts'] = ['edited']
+    with open(export_dir / 'edited.json', 'w', encoding='utf-8') as f:
+        json.dump(edited, f, indent=2)
+    output = run(export_dir, '--conversations-file', 'edited.json', 'archive', 'add', '--name', 'v2',
+                 '--date', '2025-02-01')
+    assert f"{len(original)} conversations, 1 new or changed, 1 new messages" in output
+    stored = f"2 snapshots; {len(original) + 1} conversation versions and {messages + 1} messages stored"
+    assert stored in run(export_dir, 'archive', 'list')
+
+    run(export_dir, 'archive', 'restore', 'v1', '-o', 'v1.json')
+    run(export_dir, 'archive', 'restore', '--as-of', '2025-01-31', '-o', 'as-of.json')
+    run(export_dir, 'archive', 'restore', '-o', 'newest.json')
+    for name, expected in (('v1.json', original), ('as-of.json', original), ('newest.json', edited)):
+        with open(export_dir / name, 'r', encoding='utf-8') as f:
+            assert json.load(f) == expected, name
+
+    assert json.loads(run(export_dir, 'archive', 'get', target['id'], '--snapshot', 'v1')) == [original[3]]
+    assert json.loads(run(export_dir, 'archive', 'get', target['id'])) == [target]
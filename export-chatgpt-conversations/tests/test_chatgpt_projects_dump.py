@@ -0,0 +1,255 @@
+"""
+Checks for chatgpt_projects_dump.py against a local stub of the ChatGPT backend API
+
+The stub serves the sidebar, per-project conversation lists and
+conversation bodies from http.server on localhost, and can be told to fail
+chosen requests first. Each check runs the dump script as a subprocess.
+
+Usage:
+  python3 -m pytest -q export-chatgpt-conversations/tests
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip('requests')
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DUMP = os.path.join(TOOL_DIR, 'chatgpt_projects_dump.py')
+
+PROJECTS = 5
+PROJECTS_PER_PAGE = 2
+CONVERSATIONS = 3
+CONVERSATIONS_PER_PAGE = 2
+
+
+class StubAPI(ThreadingHTTPServer):
+    """
+    The three backend endpoints the dump script uses, paginated with
+    numeric cursors. failures maps a request path (with query) to the HTTP
+    statuses to answer it with before it succeeds; requests records
+    (time, path) for every request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.latency = latency
+        self.failures = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, path: str) -> int:
+        return sum(1 for _, p in self.requests if p == path)
+
+    def respond(self, path: str):
+        """(status, headers, payload) for a request"""
+        with self.lock:
+            self.requests.append((time.monotonic(), path))
+            statuses = self.failures.get(path)
+            if statuses:
+                status = statuses.pop(0)
+                return status, {'Retry-After': '0'} if status == 429 else {}, {'detail': 'stub failure'}
+
+        url = urlparse(path)
+        cursor = int(parse_qs(url.query).get('cursor', ['0'])[0])
+        parts = url.path.strip('/').split('/')
+        if url.path == '/backend-api/gizmos/snorlax/sidebar':
+            ids = range(cursor * PROJECTS_PER_PAGE, min(PROJECTS, (cursor + 1) * PROJECTS_PER_PAGE))
+            more = (cursor + 1) * PROJECTS_PER_PAGE < PROJECTS
+            return 200, {}, {
+                'items': [{'gizmo': {'gizmo': {'id': f"g-p-{i}", 'display': {'name': f"Project {i}"}}},
+                           'conversations': {'items': []}} for i in ids],
+                'cursor': str(cursor + 1) if more else None,
+            }
+        if parts[:2] == ['backend-api', 'gizmos'] and parts[3:] == ['conversations']:
+            ids = range(cursor * CONVERSATIONS_PER_PAGE, min(CONVERSATIONS, (cursor + 1) * CONVERSATIONS_PER_PAGE))
+            more = (cursor + 1) * CONVERSATIONS_PER_PAGE < CONVERSATIONS
+            return 200, {}, {
+                'items': [{'id': f"{parts[2]}-c{i}", 'title': f"Conversation {i}", 'update_time': 1700000000 + i,
+                           'gizmo_id': parts[2]} for i in ids],
+                'cursor': str(cursor + 1) if more else None,
+            }
+        if parts[:2] == ['backend-api', 'conversation']:
+            conv_id = parts[2]
+            return 200, {}, {
+                'conversation_id': conv_id, 'title': conv_id, 'gizmo_id': conv_id.rsplit('-', 1)[0],
+                'create_time': 1700000000, 'update_time': 1700000001, 'current_node': 'n1',
+                'mapping': {
+                    'n0': {'id': 'n0', 'parent': None, 'children': ['n1'], 'message': None},
+                    'n1': {'id': 'n1', 'parent': 'n0', 'children': [], 'message': {
+                        'id': 'n1', 'author': {'role': 'user'}, 'create_time': 1700000001,
+                        'content': {'content_type': 'text', 'parts': [f"hello from {conv_id}"]}}},
+                },
+            }
+        return 404, {}, {'detail': 'not found'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(random.random() * self.server.latency)
+        status, headers, payload = self.server.respond(self.path)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(latency: float = 0) -> StubAPI:
+    server = StubAPI(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def stub():
+    server = start_stub()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def sidebar_path(cursor=None) -> str:
+    return '/backend-api/gizmos/snorlax/sidebar?conversations_per_gizmo=0' + (f"&cursor={cursor}" if cursor else '')
+
+
+def dump(directory, server, *args) -> subprocess.CompletedProcess:
+    curl = directory / 'curl.txt'
+    if not curl.exists():
+        curl.write_text(f"curl '{server.base_url}/backend-api/gizmos/snorlax/sidebar' -H 'authorization: Bearer x'\n",
+                        encoding='utf-8')
+    return subprocess.run([sys.executable, DUMP, '--curl-file', str(curl), '--backoff', '0.05', *args],
+                          cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_retries_throttled_and_failing_requests(tmp_path, stub):
+    stub.failures[sidebar_path()] = [429, 503]
+    stub.failures['/backend-api/gizmos/g-p-0/conversations?cursor=0'] = [502]
+    result = dump(tmp_path, stub, '--fetch-conversations')
+    assert result.returncode == 0, result.stderr
+    assert 'HTTP 429, retrying in 0.0s' in result.stderr
+    assert 'HTTP 503, retrying' in result.stderr
+
+    times = [t for t, path in stub.requests if path == sidebar_path()]
+    assert len(times) == 3
+    # Retry-After: 0 is honoured; the 503 waits out the backoff (0.05s doubled, plus jitter)
+    assert times[2] - times[1] >= 0.1
+    assert stub.count('/backend-api/gizmos/g-p-0/conversations?cursor=0') == 2
+
+    lists = {p['project_id']: p['conversations'] for p in json.loads(read(tmp_path / 'projects_conversations.json'))}
+    assert len(lists) == PROJECTS
+    assert all(len(items) == CONVERSATIONS for items in lists.values())
+
+
+def test_gives_up_after_retries(tmp_path, stub):
+    stub.failures[sidebar_path()] = [503, 503, 503]
+    result = dump(tmp_path, stub, '--retries', '2')
+    assert result.returncode == 2
+    assert 'HTTP 503' in result.stderr
+    assert stub.count(sidebar_path()) == 3
+
+
+@pytest.mark.parametrize('raw_log', ['kept', 'missing', 'short'])
+def test_resume_after_interrupted_page(tmp_path, stub, raw_log):
+    reference = tmp_path / 'reference'
+    reference.mkdir()
+    assert dump(reference, stub).returncode == 0
+
+    run_dir = tmp_path / 'run'
+    run_dir.mkdir()
+    stub.requests.clear()
+    stub.failures[sidebar_path(2)] = [400]
+    result = dump(run_dir, stub)
+    assert result.returncode == 2
+    assert 'Progress saved to projects.checkpoint.json' in result.stderr
+    assert json.loads(read(run_dir / 'projects.checkpoint.json'))['pages'] == 2
+
+    partial = run_dir / 'projects_raw.jsonl.partial'
+    if raw_log == 'missing':
+        partial.unlink()
+    elif raw_log == 'short':
+        partial.write_text(read(partial)[:10], encoding='utf-8')
+
+    result = dump(run_dir, stub)
+    assert result.returncode == 0, result.stderr
+    if raw_log == 'kept':
+        assert 'Resuming from projects.checkpoint.json: 2 pages' in result.stdout
+        assert stub.count(sidebar_path()) == 1
+    else:
+        assert 'starting over' in result.stderr
+        assert stub.count(sidebar_path()) == 2
+
+    for name in ('projects.json', 'projects_raw.json'):
+        assert read(run_dir / name) == read(reference / name)
+    assert not os.path.exists(run_dir / 'projects.checkpoint.json')
+    assert not os.path.exists(partial)
+
+
+def test_concurrent_conversation_lists_match_serial(tmp_path):
+    # Random latency makes the parallel requests complete out of order
+    server = start_stub(latency=0.02)
+    try:
+        outputs = []
+        for concurrency in ('1', '4'):
+            run_dir = tmp_path / f"c{concurrency}"
+            run_dir.mkdir()
+            result = dump(run_dir, server, '--fetch-conversations', '--concurrency', concurrency)
+            assert result.returncode == 0, result.stderr
+            outputs.append(read(run_dir / 'projects_conversations.json'))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert outputs[0] == outputs[1]
+
+
+def test_body_fetcher_rate_limit_and_cache(tmp_path, stub):
+    sys.path.insert(0, TOOL_DIR)
+    from chatgpt_projects_dump import BodyFetcher, make_session
+
+    rate = 20
+    project_ids = ['g-p-0', 'g-p-1']
+    fetcher = BodyFetcher(make_session(4), stub.base_url, {}, str(tmp_path), concurrency=4, rate=rate,
+                          retries=0, backoff=0, max_pages=10)
+    bodies = fetcher.run(project_ids)
+    assert [len(bodies[pid]) for pid in project_ids] == [CONVERSATIONS, CONVERSATIONS]
+    assert bodies['g-p-1'][0]['id'] == 'g-p-1-c0'
+    assert (fetcher.downloaded, fetcher.cached) == (2 * CONVERSATIONS, 0)
+
+    # 4 list pages and 6 bodies started 1/rate seconds apart (arrival jitter can bunch two, not the whole run)
+    starts = sorted(t for t, _ in stub.requests)
+    assert len(starts) == 4 + 2 * CONVERSATIONS
+    assert starts[-1] - starts[0] >= 0.9 * (len(starts) - 1) / rate
+
+    stub.requests.clear()
+    again = BodyFetcher(make_session(4), stub.base_url, {}, str(tmp_path), concurrency=4, rate=0,
+                        retries=0, backoff=0, max_pages=10)
+    assert again.run(project_ids) == bodies
+    assert (again.downloaded, again.cached) == (0, 2 * CONVERSATIONS)
+    assert not any('/backend-api/conversation/' in path for _, path in stub.requests)